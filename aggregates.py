@@ -0,0 +1,138 @@
+# aggregates.py
+
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import config
+from analysis import CourseCatalog, QEBenchmarks, QEHistogram, get_course_hits
+
+MANIFEST_FILE = "manifest.json"
+COURSE_HITS_FILE = "ce_course_hits.feather"
+QE_HISTOGRAMS_FILE = "qe_histograms.npz"
+QE_BENCHMARKS_FILE = "qe_benchmarks.npz"
+CATALOG_FILE = "catalog.feather"
+LOOKUPS_FILE = "lookups.json"
+
+class AggregateStore:
+    """
+    Repositório de agregados pré-calculados a partir dos microdados: participantes e acertos
+    por posição do gabarito de cada curso, histogramas de respostas do QE por curso e o
+    cadastro de cursos de todas as IES. Pode substituir `Enade_2023` e `QE_data_2023` nas
+    funções de `analysis.py`.
+    """
+
+    def __init__(self, manifest: dict, course_hits: pd.DataFrame, qe_histogram: QEHistogram,
+                 catalog: CourseCatalog, hei_dict: dict, qe_benchmarks: QEBenchmarks | None = None):
+        self.manifest = manifest
+        self.course_hits = course_hits
+        self.qe_histogram = qe_histogram
+        self.qe_benchmarks = qe_benchmarks
+        self.catalog = catalog
+        self.hei_dict = hei_dict
+        # Linhas de cada grupo na tabela de acertos: consultar um grupo não percorre a tabela
+        self._group_positions = course_hits.groupby("CO_GRUPO", sort=False).indices
+
+    @property
+    def data_version(self) -> str:
+        return self.manifest["data_version"]
+
+    def get_course_hits(self, group_code: int) -> pd.DataFrame:
+        """Tabela de acertos por curso de um grupo, na mesma ordem dos microdados."""
+        return self.course_hits.iloc[self._group_positions.get(group_code, np.array([], dtype=np.int64))]
+
+    def get_qe_histogram(self, course_code: int, questions_list) -> np.ndarray | None:
+        """Matriz questões × alternativas (0 a 8) de um curso, ou None se o curso não tiver respostas."""
+        return self.qe_histogram.get_qe_histogram(course_code, questions_list)
+
+    def as_dataset(self, ies_code: int | None = None) -> tuple:
+        """Retorna os dados da instituição `ies_code` (por padrão, config.DEFAULT_IES_CODE) no mesmo formato de `data_loader.load_data`."""
+        ies_courses, course_codes = self.catalog.get_institution(ies_code or config.DEFAULT_IES_CODE)
+        return self, self, ies_courses, course_codes, self.hei_dict
+
+    @classmethod
+    def load(cls, path) -> "AggregateStore":
+        """Carrega um repositório gravado por `build_aggregate_store`."""
+        path = Path(path)
+        manifest = json.loads((path / MANIFEST_FILE).read_text())
+        if manifest.get("format") != config.AGGREGATE_STORE_FORMAT:
+            raise ValueError(f"Formato de agregados incompatível: {manifest.get('format')}")
+
+        course_hits = pd.read_feather(path / COURSE_HITS_FILE).set_index("CO_CURSO")
+        with np.load(path / QE_HISTOGRAMS_FILE) as qe:
+            qe_histogram = QEHistogram(qe["courses"], qe["questions"].tolist(), qe["counts"], manifest["data_version"])
+        qe_benchmarks = None
+        if (path / QE_BENCHMARKS_FILE).exists():  # Ausente em repositórios gerados antes das referências
+            with np.load(path / QE_BENCHMARKS_FILE) as qb:
+                qe_benchmarks = QEBenchmarks(
+                    qb["groups"], qb["questions"].tolist(), qb["national_counts"], qb["public_counts"], manifest["data_version"]
+                )
+        catalog = CourseCatalog(pd.read_feather(path / CATALOG_FILE))
+        lookups = json.loads((path / LOOKUPS_FILE).read_text())
+        hei_dict = dict(lookups["hei_dict"])
+        return cls(manifest, course_hits, qe_histogram, catalog, hei_dict, qe_benchmarks)
+
+def _to_python(value):
+    """Converte escalares NumPy em tipos nativos para serialização em JSON."""
+    return value.item() if isinstance(value, np.generic) else value
+
+def build_aggregate_store(output_dir=config.AGGREGATE_STORE_DIR) -> Path:
+    """Gera o repositório de agregados a partir das saídas de `data_loader.load_data`."""
+    from data_loader import DATASETS, get_data_version, load_data
+
+    Enade_2023, QE_histogram, _, _, hei_dict = load_data()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    course_hits = get_course_hits(Enade_2023)
+    course_hits.reset_index().to_feather(output_dir / COURSE_HITS_FILE, compression="zstd")
+
+    np.savez_compressed(
+        output_dir / QE_HISTOGRAMS_FILE, courses=QE_histogram.courses,
+        questions=np.array(QE_histogram.questions), counts=QE_histogram.counts
+    )
+
+    qe_benchmarks = DATASETS["qe_benchmarks"]()
+    np.savez_compressed(
+        output_dir / QE_BENCHMARKS_FILE, groups=qe_benchmarks.groups, questions=np.array(qe_benchmarks.questions),
+        national_counts=qe_benchmarks.national_counts, public_counts=qe_benchmarks.public_counts
+    )
+
+    DATASETS["catalog"]().courses.to_feather(output_dir / CATALOG_FILE)
+
+    lookups = {"hei_dict": [[_to_python(k), _to_python(v)] for k, v in hei_dict.items()]}
+    (output_dir / LOOKUPS_FILE).write_text(json.dumps(lookups, ensure_ascii=False))
+
+    manifest = {
+        "format": config.AGGREGATE_STORE_FORMAT,
+        "data_version": get_data_version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "courses": int(len(course_hits)),
+        "participants": int(course_hits["NU_PARTICIPANTES"].sum()),
+    }
+    (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    return output_dir
+
+def load_aggregate_store(path=config.AGGREGATE_STORE_DIR) -> AggregateStore | None:
+    """Carrega o repositório de agregados, se existir e for compatível; caso contrário, None."""
+    if not (Path(path) / MANIFEST_FILE).exists():
+        return None
+    try:
+        return AggregateStore.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o repositório de agregados do ENADE a partir dos microdados.")
+    parser.add_argument("--output", default=config.AGGREGATE_STORE_DIR, help="Diretório de saída dos agregados.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    output_dir = build_aggregate_store(args.output)
+    size = sum(f.stat().st_size for f in output_dir.iterdir() if f.is_file())
+    print(f"Agregados gravados em {output_dir} ({size / 1e6:.1f} MB) em {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 # analysis.py
 
+import threading
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FormatStrFormatter
+from io import BytesIO
 from textwrap import fill
-import tempfile
 import config # Importa as constantes
+import instrumentation
+from chart_cache import chart_cache, frame_digest, make_chart_key
+from render import ChartJob
+from questions_subjects import get_questions_subjects
+from utils import answer_columns, decode_answer_keys
+
+SUBJECT_COLUMNS = ["FIRST_SUBJECT", "SECOND_SUBJECT", "THIRD_SUBJECT"]
 
 # --- Funções de Análise (Componente Específico) ---
 
@@ -27,20 +35,41 @@ def get_invalid_subjects(questions_subjects_df: pd.DataFrame) -> list:
     invalid_subjects = questions_subjects_df.groupby("FIRST_SUBJECT")["VALIDITY"].any()
     return invalid_subjects[~invalid_subjects].index.tolist()
 
+def get_subjects(questions_subjects_df: pd.DataFrame) -> np.ndarray:
+    """Retorna os temas distintos associados às questões, em ordem alfabética."""
+    subjects = pd.unique(questions_subjects_df[SUBJECT_COLUMNS].values.ravel('K'))
+    return pd.Series(subjects).dropna().sort_values().unique()
+
+def get_answer_matrix(df: pd.DataFrame) -> np.ndarray:
+    """
+    Retorna a matriz uint8 participantes × posições do gabarito. Usa as colunas decodificadas
+    na carga dos dados e, na ausência delas, decodifica DS_VT_ACE_OCE.
+    """
+    columns = [col for col in df.columns if str(col).startswith(config.ANSWER_COLUMN_PREFIX)]
+    if columns:
+        return df[columns].to_numpy(dtype=np.uint8)
+    return decode_answer_keys(df["DS_VT_ACE_OCE"])
+
+def get_subject_incidence(questions_subjects_df: pd.DataFrame, subjects, n_positions: int) -> np.ndarray:
+    """Monta a matriz de incidência (posições do gabarito × temas) a partir de FIRST/SECOND/THIRD_SUBJECT."""
+    subject_index = {subject: i for i, subject in enumerate(subjects)}
+    incidence = np.zeros((n_positions, len(subject_index)), dtype=np.int64)
+    for position, row in zip(questions_subjects_df.index, questions_subjects_df[SUBJECT_COLUMNS].values):
+        # Questões além do tamanho do gabarito não somam acertos
+        if position < n_positions:
+            for subject in pd.Series(row).dropna():
+                incidence[position, subject_index[subject]] = 1
+    return incidence
+
+@instrumentation.instrumented(rows=len)
 def get_score_per_subject(questions_subjects_df: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
     """Calcula a pontuação (percentual de acerto) por tema para um dado DataFrame."""
-    subjects = pd.unique(questions_subjects_df[["FIRST_SUBJECT", "SECOND_SUBJECT", "THIRD_SUBJECT"]].values.ravel('K'))
-    subjects = pd.Series(subjects).dropna().sort_values().unique()
-
-    subjects_score = pd.DataFrame({"Conteúdo": subjects, "Acertos": 0})
-    marked_keys = df["DS_VT_ACE_OCE"]
+    subjects = get_subjects(questions_subjects_df)
 
-    for index, row in questions_subjects_df.iterrows():
-        subjects_to_update = row[["FIRST_SUBJECT", "SECOND_SUBJECT", "THIRD_SUBJECT"]].dropna().values
-        # Garante que a string tem o tamanho esperado para evitar erros de índice
-        if marked_keys.str.len().max() > index:
-            result = marked_keys[marked_keys.str[index] == '1'].shape[0]
-            subjects_score.loc[subjects_score["Conteúdo"].isin(subjects_to_update), "Acertos"] += result
+    answers = get_answer_matrix(df)
+    incidence = get_subject_incidence(questions_subjects_df, subjects, answers.shape[1])
+    hits_per_position = answers.sum(axis=0, dtype=np.int64)
+    subjects_score = pd.DataFrame({"Conteúdo": subjects, "Acertos": hits_per_position @ incidence})
 
     total_participants = df.shape[0]
     if total_participants > 0:
@@ -55,89 +84,564 @@ def get_score_per_subject(questions_subjects_df: pd.DataFrame, df: pd.DataFrame)
 
     return subjects_score
 
-# --- Funções de Plotagem (Componente Específico) ---
-
-def plot_performance_graph(Enade_2023, COURSE_CODES, group_code: int, course_code: int):
-    """Gera e salva os gráficos de desempenho (Razão e Percentual Absoluto)."""
-    fig1_img, fig2_img = None, None
-
-    sk_national_df = Enade_2023[Enade_2023["CO_GRUPO"] == group_code]
-    sk_ufpa_df = sk_national_df[sk_national_df["CO_CURSO"] == course_code]
-    
-    # Adicionado tratamento de erro para curso sem dados
-    if sk_ufpa_df.empty:
-        return None, None, None, None
-
-    questions_subjects_df = pd.read_csv(
-        config.QUESTIONS_SUBJECTS_BASE_URL + COURSE_CODES[course_code][2] + "_questions_subjects.csv", sep=";"
-    )
-
-    subject_score_ufpa = get_score_per_subject(questions_subjects_df, sk_ufpa_df)
-    subject_score_national = get_score_per_subject(questions_subjects_df, sk_national_df)
+# --- Agregação por Curso (Componente Específico) ---
+
+COURSE_INFO_COLUMNS = ["CO_IES", "CO_GRUPO", "CO_CATEGAD", "CO_ORGACAD"]
+
+@instrumentation.instrumented(rows=lambda course_hits: int(course_hits["NU_PARTICIPANTES"].sum()))
+def get_course_hits(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega, em uma única passagem, o número de participantes e os acertos por posição do
+    gabarito de todos os cursos do DataFrame (somas por segmento sobre a matriz de respostas).
+    Os cursos ficam na ordem em que aparecem pela primeira vez nos dados.
+    """
+    answers = get_answer_matrix(df)
+    codes, courses = pd.factorize(df["CO_CURSO"], sort=False, use_na_sentinel=False)
+    participants = np.bincount(codes, minlength=len(courses))
+
+    hits = np.zeros((len(courses), answers.shape[1]), dtype=np.int64)
+    if len(courses) and answers.shape[1]:
+        order = np.argsort(codes, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(participants)[:-1]))
+        hits = np.add.reduceat(answers[order], starts, axis=0, dtype=np.int64)
+
+    info_columns = [col for col in COURSE_INFO_COLUMNS if col in df.columns]
+    course_info = df.loc[~df["CO_CURSO"].duplicated(), ["CO_CURSO"] + info_columns].set_index("CO_CURSO")
+    course_hits = pd.DataFrame(hits, index=course_info.index, columns=answer_columns(hits.shape[1]))
+    course_hits.insert(0, "NU_PARTICIPANTES", participants)
+    return pd.concat([course_info, course_hits], axis=1)
+
+def get_subject_scores(questions_subjects_df: pd.DataFrame, course_hits: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula o percentual de acerto por tema (colunas, apenas temas válidos) para cada curso
+    de uma tabela produzida por `get_course_hits`, com um único produto matricial.
+    """
+    subjects = get_subjects(questions_subjects_df)
+    hit_columns = [col for col in course_hits.columns if str(col).startswith(config.ANSWER_COLUMN_PREFIX)]
+    hits = course_hits[hit_columns].to_numpy(dtype=np.int64)
+    participants = course_hits["NU_PARTICIPANTES"].to_numpy(dtype=np.int64)
+
+    incidence = get_subject_incidence(questions_subjects_df, subjects, hits.shape[1])
+    subject_hits = hits @ incidence
+    subjects_per_question = get_subjects_per_question(questions_subjects_df)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (subject_hits * 100) / (subjects_per_question * participants[:, None])
+    scores = np.where(participants[:, None] > 0, scores.round(2), 0.0)
+
+    scores_df = pd.DataFrame(scores, index=course_hits.index, columns=subjects)
+    invalid_subjects = get_invalid_subjects(questions_subjects_df)
+    return scores_df.loc[:, ~scores_df.columns.isin(invalid_subjects)]
+
+def get_group_rows(Enade_2023: pd.DataFrame, group_code: int) -> pd.DataFrame:
+    """
+    Participantes de um grupo. Nos microdados ordenados por CO_GRUPO (attrs['sorted_by'], ver
+    `data_loader.build_ce_data`), o intervalo de linhas do grupo é encontrado por busca binária,
+    sem percorrer o DataFrame; subconjuntos filtrados continuam ordenados.
+    """
+    if Enade_2023.attrs.get("sorted_by") == "CO_GRUPO":
+        groups = Enade_2023["CO_GRUPO"].to_numpy()
+        start, stop = np.searchsorted(groups, group_code, "left"), np.searchsorted(groups, group_code, "right")
+        return Enade_2023.iloc[start:stop]
+    return Enade_2023[Enade_2023["CO_GRUPO"] == group_code]
+
+def get_group_course_hits(Enade_2023, group_code: int) -> pd.DataFrame:
+    """
+    Retorna a tabela de acertos por curso (ver `get_course_hits`) de um grupo. Aceita tanto o
+    DataFrame de microdados quanto um repositório de agregados (ver `aggregates.py`).
+    """
+    if not isinstance(Enade_2023, pd.DataFrame):
+        return Enade_2023.get_course_hits(group_code)
+    return get_course_hits(get_group_rows(Enade_2023, group_code))
+
+def filter_public_courses(course_hits: pd.DataFrame) -> pd.DataFrame:
+    """Mantém apenas os cursos de IES públicas federais em uma tabela de acertos por curso."""
+    return course_hits[
+        (course_hits["CO_CATEGAD"] == config.PUBLIC_ADMIN_CATEGORY) &
+        (course_hits["CO_ORGACAD"] == config.FEDERAL_ORG_CATEGORY)
+    ]
+
+def get_performance_scores(Enade_2023, questions_subjects_df: pd.DataFrame, group_code: int, course_code: int,
+                           course_hits: pd.DataFrame | None = None) -> pd.DataFrame | None:
+    """
+    Calcula, por tema, o percentual de acerto do curso, o nacional (todos os cursos do grupo)
+    e a razão entre eles. Retorna None se o curso não tiver participantes. Aceita a tabela de
+    acertos do grupo já calculada em `course_hits`. Com os microdados por participante em
+    `Enade_2023`, acrescenta os intervalos de confiança bootstrap (ver `get_bootstrap_intervals`).
+    """
+    if course_hits is None:
+        course_hits = get_group_course_hits(Enade_2023, group_code)
+    if course_code not in course_hits.index:
+        return None
+
+    counts = course_hits.drop(columns=[col for col in COURSE_INFO_COLUMNS if col in course_hits.columns])
+    national_counts = counts.sum()
+    merged_score_df = merge_performance_scores(questions_subjects_df, counts.loc[course_code], national_counts)
+    if config.BOOTSTRAP_REPLICATES and isinstance(Enade_2023, pd.DataFrame):
+        group_rows = get_group_rows(Enade_2023, group_code)
+        course_answers = get_answer_matrix(group_rows[group_rows["CO_CURSO"] == course_code])
+        intervals = get_bootstrap_intervals(course_answers, questions_subjects_df, national_counts, seed=(config.BOOTSTRAP_SEED, int(course_code)))
+        merged_score_df = merged_score_df.join(intervals)
+    return merged_score_df
+
+def merge_performance_scores(questions_subjects_df: pd.DataFrame, course_counts: pd.Series, national_counts: pd.Series) -> pd.DataFrame:
+    """Percentuais por tema do curso e nacionais (a partir das somas de participantes e acertos) e a razão entre eles."""
+    pair = pd.DataFrame([course_counts, national_counts], index=["Curso", "Enade"])
+    scores = get_subject_scores(questions_subjects_df, pair)
 
     merged_score_df = pd.DataFrame({
-        "Nota UFPA (%)": subject_score_ufpa["Nota (%)"],
-        "Nota Enade (%)": subject_score_national["Nota (%)"]
-    }).set_index(subject_score_national["Conteúdo"])
-    
-    ratio = lambda col: (col["Nota UFPA (%)"] / col["Nota Enade (%)"]).round(2) if col["Nota Enade (%)"] != 0 else 0
+        "Nota Curso (%)": scores.loc["Curso"],
+        "Nota Enade (%)": scores.loc["Enade"]
+    })
+    ratio = lambda col: (col["Nota Curso (%)"] / col["Nota Enade (%)"]).round(2) if col["Nota Enade (%)"] != 0 else 0
     merged_score_df["Razão"] = merged_score_df.apply(ratio, axis=1)
+    return merged_score_df
+
+INTERVAL_COLUMNS = ["Curso IC inf (%)", "Curso IC sup (%)", "Razão IC inf", "Razão IC sup", "Significativo"]
+
+@instrumentation.instrumented(rows=len)
+def get_bootstrap_intervals(course_answers: np.ndarray, questions_subjects_df: pd.DataFrame, national_counts: pd.Series,
+                            replicates: int | None = None, confidence: float | None = None, seed=None) -> pd.DataFrame:
+    """
+    Intervalos de confiança bootstrap (percentis) do percentual de acerto do curso e da razão
+    curso/nacional, por tema válido, e se a razão difere de 1,0 (intervalo sem o 1,0). Os
+    participantes do curso (linhas de `course_answers`) são reamostrados com reposição em lotes:
+    os sorteios de todas as réplicas do lote viram, com um único `np.bincount`, a matriz de
+    contagens réplicas × participantes, e os acertos por tema saem de um único produto matricial
+    (réplicas × participantes) @ (participantes × temas).
+    Os acertos dos demais cursos ficam fixos no total nacional (`national_counts`, somas como as
+    de `get_course_hits`): com milhares de participantes, sua variação é desprezível diante da do curso.
+    Cursos com menos de BOOTSTRAP_MIN_PARTICIPANTS participantes ficam sem intervalos (NaN).
+    """
+    replicates = replicates or config.BOOTSTRAP_REPLICATES
+    confidence = confidence or config.BOOTSTRAP_CONFIDENCE
+    subjects = get_subjects(questions_subjects_df)
+    subjects_per_question = get_subjects_per_question(questions_subjects_df)
+    n_participants = course_answers.shape[0]
+    intervals = pd.DataFrame(np.nan, index=pd.Index(subjects), columns=INTERVAL_COLUMNS[:-1])
+    intervals["Significativo"] = False
+
+    if n_participants >= config.BOOTSTRAP_MIN_PARTICIPANTS:
+        student_hits = course_answers.astype(np.float64) @ get_subject_incidence(
+            questions_subjects_df, subjects, course_answers.shape[1]
+        )
+        hit_columns = [col for col in national_counts.index if str(col).startswith(config.ANSWER_COLUMN_PREFIX)]
+        national_hits = national_counts[hit_columns].to_numpy(dtype=np.float64) @ get_subject_incidence(
+            questions_subjects_df, subjects, len(hit_columns)
+        )
+        other_hits = national_hits - student_hits.sum(axis=0)
+
+        rng = np.random.default_rng(seed)
+        batch = max(1, config.BOOTSTRAP_BATCH_ELEMENTS // n_participants)
+        replicate_hits = np.empty((replicates, len(subjects)))
+        for start in range(0, replicates, batch):
+            size = min(batch, replicates - start)
+            draws = rng.integers(0, n_participants, (size, n_participants))
+            draws += np.arange(size)[:, None] * n_participants  # índice único por (réplica, participante)
+            weights = np.bincount(draws.ravel(), minlength=size * n_participants).reshape(size, n_participants)
+            replicate_hits[start:start + size] = weights @ student_hits
+
+        course_scores = replicate_hits * 100 / (subjects_per_question * n_participants)
+        national_scores = (other_hits + replicate_hits) * 100 / (subjects_per_question * float(national_counts["NU_PARTICIPANTES"]))
+        ratios = np.divide(course_scores, national_scores, out=np.zeros_like(course_scores), where=national_scores != 0)
+
+        tail = (1 - confidence) / 2 * 100
+        course_low, course_high = np.percentile(course_scores, [tail, 100 - tail], axis=0)
+        ratio_low, ratio_high = np.percentile(ratios, [tail, 100 - tail], axis=0)
+        intervals[INTERVAL_COLUMNS[:-1]] = np.column_stack([course_low, course_high, ratio_low, ratio_high]).round(2)
+        intervals["Significativo"] = (ratio_low > 1) | (ratio_high < 1)
+
+    invalid_subjects = get_invalid_subjects(questions_subjects_df)
+    return intervals.loc[~intervals.index.isin(invalid_subjects)]
+
+def significance_label(merged_score_df: pd.DataFrame) -> pd.Series:
+    """Diferença em relação ao Brasil, por tema: acima/abaixo quando significativa (ver `get_bootstrap_intervals`)."""
+    if "Significativo" not in merged_score_df.columns:
+        return pd.Series("Sem intervalo", index=merged_score_df.index)
+    # Um intervalo significativo fica todo de um lado do 1,0, assim como o seu centro
+    above = (merged_score_df["Razão IC inf"] + merged_score_df["Razão IC sup"]) / 2 > 1
+    labels = np.where(merged_score_df["Razão IC inf"].isna(), "Sem intervalo", "Não significativa")
+    labels = np.where(merged_score_df["Significativo"], np.where(above, "Acima do Brasil", "Abaixo do Brasil"), labels)
+    return pd.Series(labels, index=merged_score_df.index)
+
+# --- Rótulos da Instituição Selecionada ---
+
+# Colunas do curso da instituição selecionada (nomes internos neutros) -> rótulo exibido com o nome da IES
+INSTITUTION_COLUMN_LABELS = {
+    "Nota Curso (%)": "Nota {ies} (%)",
+    "Curso IC inf (%)": "{ies} IC inf (%)",
+    "Curso IC sup (%)": "{ies} IC sup (%)",
+    "Curso (%)": "{ies} (%)",
+    "Razão Curso/Brasil": "Razão {ies}/Brasil",
+    "Posição do curso": "Posição {ies}",
+    "Percentil do curso": "Percentil {ies}",
+}
+
+def institution_name(hei_dict: dict, ies_code: int) -> str:
+    """Nome da IES usado nos rótulos (o do dicionário de IES ou, na falta dele, o código)."""
+    return hei_dict.get(ies_code, f"IES Cód: {ies_code}")
+
+def label_institution_columns(df: pd.DataFrame, ies_name: str) -> pd.DataFrame:
+    """Renomeia, para exibição, as colunas do curso da instituição selecionada com o nome da IES."""
+    return df.rename(columns={col: label.format(ies=ies_name) for col, label in INSTITUTION_COLUMN_LABELS.items()})
 
-    # Gráfico de Razão
+# --- Funções de Plotagem (Componente Específico) ---
+
+def get_source_version(source) -> str | None:
+    """Versão dos dados de um DataFrame (definida em `load_data`) ou de um repositório de agregados."""
+    if isinstance(source, pd.DataFrame):
+        return source.attrs.get("data_version")
+    return getattr(source, "data_version", None)
+
+def figure_to_png(fig) -> bytes:
+    """Salva a figura em PNG na memória e a fecha, liberando os recursos do matplotlib."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=150)
+    plt.close(fig)
+    return buffer.getvalue()
+
+def interval_errors(values: pd.Series, low: pd.Series, high: pd.Series) -> np.ndarray:
+    """Distâncias (2 × n) do valor aos limites do intervalo, no formato de `xerr`; 0 onde não há intervalo."""
+    return np.nan_to_num(np.vstack([values - low, high - values]).clip(min=0))
+
+def render_ratio_graph(merged_score_df: pd.DataFrame, course_name: str, ies_name: str = "IES") -> bytes:
+    """
+    Desenha o gráfico de Razão do percentual de acerto e retorna o PNG. Com os intervalos de
+    confiança (ver `get_bootstrap_intervals`), desenha as barras de erro e, em cinza, os temas
+    cuja razão não difere significativamente de 1,0.
+    """
     fig1, ax1 = plt.subplots(figsize=(8, 8))
     merged_score_df_sorted = merged_score_df.sort_values(by=["Razão"]).dropna(subset=['Razão'])
     labels1 = [fill(x, 40) for x in merged_score_df_sorted.index]
-    ax1.barh(labels1, merged_score_df_sorted["Razão"], color='k', height=0.6)
+    if "Razão IC inf" in merged_score_df_sorted.columns:
+        significant = merged_score_df_sorted["Significativo"].fillna(False).astype(bool)
+        no_interval = merged_score_df_sorted["Razão IC inf"].isna()
+        ax1.barh(labels1, merged_score_df_sorted["Razão"], height=0.6,
+                 color=np.where(significant | no_interval, 'k', 'darkgray'),
+                 xerr=interval_errors(merged_score_df_sorted["Razão"], merged_score_df_sorted["Razão IC inf"],
+                                      merged_score_df_sorted["Razão IC sup"]),
+                 error_kw={"ecolor": "dimgray", "capsize": 3, "elinewidth": 1})
+        ax1.set_xlabel(
+            f"Razão do percentual de acerto ({ies_name} / Brasil)\n"
+            f"Barras de erro: IC {config.BOOTSTRAP_CONFIDENCE:.0%} (bootstrap); em cinza, diferença não significativa"
+        )
+    else:
+        ax1.barh(labels1, merged_score_df_sorted["Razão"], color='k', height=0.6)
+        ax1.set_xlabel(f"Razão do percentual de acerto ({ies_name} / Brasil)")
     ax1.axvline(x=1.0, color="red", linestyle='--')
-    ax1.set_xlabel("Razão do percentual de acerto (UFPA / Brasil)")
-    ax1.set_title(f"Razão de Acertos: {COURSE_CODES[course_code][1]}", loc='left')
-    plt.tight_layout()
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_img1:
-        fig1.savefig(tmp_img1.name, dpi=150)
-        fig1_img = tmp_img1.name
-
-    # Gráfico de Percentual Absoluto
+    ax1.set_title(f"Razão de Acertos: {course_name}", loc='left')
+    fig1.tight_layout()
+    return figure_to_png(fig1)
+
+def render_percent_graph(merged_score_df: pd.DataFrame, course_name: str, ies_name: str = "IES") -> bytes:
+    """Desenha o gráfico de Percentual de acertos por tema (IES × Brasil) e retorna o PNG."""
     fig2, ax2 = plt.subplots(figsize=(8, 8))
-    merged_score_df_sorted = merged_score_df.sort_values(by=["Nota UFPA (%)"], ascending=False)
+    merged_score_df_sorted = merged_score_df.sort_values(by=["Nota Curso (%)"], ascending=False)
     ind = np.arange(merged_score_df_sorted.shape[0])
     width = 0.4
     labels2 = [fill(x, 40) for x in merged_score_df_sorted.index]
-    ax2.barh(ind - width/2, merged_score_df_sorted["Nota UFPA (%)"], width, color='dodgerblue', label="UFPA")
+    course_errors = None
+    if "Curso IC inf (%)" in merged_score_df_sorted.columns:
+        course_errors = interval_errors(merged_score_df_sorted["Nota Curso (%)"], merged_score_df_sorted["Curso IC inf (%)"],
+                                        merged_score_df_sorted["Curso IC sup (%)"])
+    ax2.barh(ind - width/2, merged_score_df_sorted["Nota Curso (%)"], width, color='dodgerblue', label=ies_name,
+             xerr=course_errors, error_kw={"ecolor": "navy", "capsize": 2, "elinewidth": 1})
     ax2.barh(ind + width/2, merged_score_df_sorted["Nota Enade (%)"], width, color='mediumspringgreen', label="Brasil")
     ax2.set(yticks=ind, yticklabels=labels2, xlim=(0, 100))
     ax2.legend()
-    ax2.set_xlabel("Percentual de acerto (%)")
-    ax2.set_title(f"Percentual de Acertos por Tema: {COURSE_CODES[course_code][1]}", loc='left')
-    plt.tight_layout()
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_img2:
-        fig2.savefig(tmp_img2.name, dpi=150)
-        fig2_img = tmp_img2.name
+    ax2.set_xlabel("Percentual de acerto (%)" + (
+        f"\nBarras de erro ({ies_name}): IC {config.BOOTSTRAP_CONFIDENCE:.0%} (bootstrap)" if course_errors is not None else ""
+    ))
+    ax2.set_title(f"Percentual de Acertos por Tema: {course_name}", loc='left')
+    fig2.tight_layout()
+    return figure_to_png(fig2)
+
+def run_chart_job(job: ChartJob) -> bytes | None:
+    """Renderiza um ChartJob no próprio processo, reaproveitando o cache de gráficos."""
+    with instrumentation.stage("run_chart_job", cached=True, render=getattr(job.render, "__name__", None)):
+        png = chart_cache.get(job.key) if job.key else None
+        if png is None:
+            instrumentation.cache_miss()
+            args = job.prepare()
+            if args is None:
+                return None
+            png = job.render(*args)
+            if job.key:
+                chart_cache.put(job.key, png)
+    return png
+
+def performance_graph_jobs(Enade_2023, COURSE_CODES, group_code: int, course_code: int, group_hits: pd.DataFrame | None = None,
+                           merged_score_df: pd.DataFrame | None = None, ies_name: str = "IES") -> tuple:
+    """
+    Monta os ChartJob dos gráficos de Razão e Percentual, rotulados com o nome da IES `ies_name`.
+    Os percentuais (ou `merged_score_df`, se já calculados) são obtidos uma única vez, e apenas
+    se algum dos gráficos não estiver no cache; as chaves incluem o conteúdo do arquivo de temas.
+    """
+    course_name = COURSE_CODES[course_code][1]
+    version = get_source_version(Enade_2023)
+    questions_subjects_df = get_questions_subjects(COURSE_CODES[course_code][2])
+    subjects = frame_digest(questions_subjects_df)
+    scores = {} if merged_score_df is None else {"merged": merged_score_df}
+
+    def prepare():
+        if "merged" not in scores:
+            scores["merged"] = get_performance_scores(Enade_2023, questions_subjects_df, group_code, course_code, group_hits)
+        # Adicionado tratamento de erro para curso sem dados
+        return None if scores["merged"] is None else (scores["merged"], course_name, ies_name)
+
+    def key(name):
+        # Os parâmetros do bootstrap mudam as barras de erro dos gráficos
+        bootstrap = (config.BOOTSTRAP_REPLICATES, config.BOOTSTRAP_CONFIDENCE, config.BOOTSTRAP_SEED)
+        return make_chart_key(name, course_code, group_code, course_name, ies_name, version, subjects, bootstrap) if version else None
+
+    return ChartJob(key("ratio"), render_ratio_graph, prepare), ChartJob(key("percent"), render_percent_graph, prepare)
+
+def plot_performance_graph(Enade_2023, COURSE_CODES, group_code: int, course_code: int, ies_name: str = "IES"):
+    """Gera os gráficos de desempenho (Razão e Percentual Absoluto) em PNG, reaproveitando o cache de gráficos."""
+    ratio_job, percent_job = performance_graph_jobs(Enade_2023, COURSE_CODES, group_code, course_code, ies_name=ies_name)
+    return run_chart_job(ratio_job), run_chart_job(percent_job)
+
+# --- Cadastro de Cursos (todas as IES) ---
+
+CATALOG_COLUMNS = ["CO_CURSO", "CO_IES", "CO_GRUPO", "NOME_CURSO", "NOME_MUNIC_CURSO", "FILE_NAME"]
+
+class CourseCatalog:
+    """
+    Cursos com participantes de todas as IES (um por linha, com o arquivo de temas do grupo ou
+    None), indexados por CO_IES: trocar de instituição é uma consulta ao índice. Os cursos e o
+    COURSE_CODES de cada instituição são montados na primeira consulta e reaproveitados.
+    """
+
+    def __init__(self, courses: pd.DataFrame):
+        self.courses = courses[CATALOG_COLUMNS].reset_index(drop=True)
+        # Grupos sem arquivo de temas: None (e não NaN), inclusive após a leitura em Feather
+        file_names = self.courses["FILE_NAME"]
+        self.courses["FILE_NAME"] = file_names.astype(object).where(file_names.notna(), None)
+        self._positions = self.courses.groupby("CO_IES", sort=True).indices
+        self._institutions = {}
+        self._lock = threading.Lock()
+
+    def institutions(self, allowed=None) -> list:
+        """Códigos das IES com cursos no cadastro (apenas os de `allowed`, se informado), em ordem crescente."""
+        codes = [int(code) for code in self._positions]
+        if allowed is None:
+            return codes
+        allowed = set(allowed)
+        return [code for code in codes if code in allowed]
+
+    def get_institution(self, ies_code: int) -> tuple:
+        """
+        Cursos da instituição (CO_CURSO, CO_GRUPO, NOME_CURSO, NOME_MUNIC_CURSO...) e seu COURSE_CODES:
+        código do curso -> [grupo, nome, arquivo de temas (ou None), município]. Vazios se a IES não tiver cursos.
+        """
+        with self._lock:
+            if ies_code not in self._institutions:
+                positions = self._positions.get(ies_code, np.array([], dtype=np.int64))
+                ies_courses = self.courses.iloc[positions].reset_index(drop=True)
+                course_codes = {
+                    row.CO_CURSO: [row.CO_GRUPO, row.NOME_CURSO, row.FILE_NAME, row.NOME_MUNIC_CURSO]
+                    for row in ies_courses.itertuples(index=False)
+                }
+                self._institutions[ies_code] = (ies_courses, course_codes)
+            return self._institutions[ies_code]
+
+# --- Visão Institucional (todos os cursos da IES) ---
+
+@instrumentation.instrumented(rows=len)
+def get_institution_scores(Enade_2023, COURSE_CODES, get_group_hits=None) -> pd.DataFrame:
+    """
+    Percentuais por tema (do curso e nacional) e razão de todos os cursos de COURSE_CODES, em
+    formato longo. Apenas os grupos da instituição são agregados, cada um uma única vez;
+    `get_group_hits(código do grupo)`, se informado, fornece a tabela de acertos do grupo já
+    calculada (ex.: de um cache por grupo). Cursos sem arquivo de temas ficam de fora.
+    """
+    if get_group_hits is None:
+        get_group_hits = lambda group_code: get_group_course_hits(Enade_2023, group_code)
+    group_counts = {}
+
+    frames = []
+    for course_code, (group_code, course_name, file_name, municipality) in COURSE_CODES.items():
+        if file_name is None:
+            continue
+        if group_code not in group_counts:
+            course_hits = get_group_hits(group_code)
+            group_counts[group_code] = course_hits.drop(columns=[col for col in COURSE_INFO_COLUMNS if col in course_hits.columns])
+        counts = group_counts[group_code]
+        if course_code not in counts.index:
+            continue
+        merged_score_df = merge_performance_scores(
+            get_questions_subjects(file_name), counts.loc[course_code], counts.sum()
+        )
+        frames.append(merged_score_df.rename_axis("Tema").reset_index().assign(
+            CO_CURSO=course_code, Curso=f"{course_name} ({municipality})"
+        ))
+    if not frames:
+        return pd.DataFrame(columns=["CO_CURSO", "Curso", "Tema", "Nota Curso (%)", "Nota Enade (%)", "Razão"])
+    scores = pd.concat(frames, ignore_index=True)
+    return scores[["CO_CURSO", "Curso", "Tema", "Nota Curso (%)", "Nota Enade (%)", "Razão"]]
+
+def get_weakest_subjects(institution_scores: pd.DataFrame, per_course: int = 3) -> pd.DataFrame:
+    """Os `per_course` temas de menor razão de cada curso, do mais fraco para o mais forte."""
+    ranked = institution_scores.sort_values(["Razão", "CO_CURSO"], kind="stable")
+    return ranked.groupby("CO_CURSO", sort=False).head(per_course).reset_index(drop=True)
+
+def render_ratio_heatmap(institution_scores: pd.DataFrame, ies_name: str = "IES") -> bytes:
+    """Desenha o mapa de calor da razão IES/Brasil (cursos × temas; vazio se o tema não é do curso) e retorna o PNG."""
+    from matplotlib.colors import TwoSlopeNorm
+
+    # Um mesmo rótulo pode nomear dois cursos (mesmo grupo e município): a tabela é indexada por
+    # CO_CURSO e os rótulos repetidos recebem o código do curso
+    matrix = institution_scores.pivot(index="CO_CURSO", columns="Tema", values="Razão")
+    matrix = matrix.loc[institution_scores["CO_CURSO"].unique(), institution_scores["Tema"].unique()]
+    labels = institution_scores.drop_duplicates("CO_CURSO").set_index("CO_CURSO")["Curso"].loc[matrix.index]
+    repeated = labels.duplicated(keep=False)
+    matrix.index = labels.where(~repeated, labels + " (" + labels.index.astype(str) + ")")
+    values = np.ma.masked_invalid(matrix.to_numpy(dtype=float))
+
+    n_courses, n_subjects = matrix.shape
+    fig, ax = plt.subplots(figsize=(max(8, 0.35 * n_subjects + 4), max(4, 0.4 * n_courses + 2)))
+    spread = max(abs(float(values.max()) - 1) if values.count() else 0, abs(1 - float(values.min())) if values.count() else 0, 0.1)
+    norm = TwoSlopeNorm(vmin=1 - spread, vcenter=1.0, vmax=1 + spread)
+    image = ax.imshow(values, cmap="RdYlGn", norm=norm, aspect="auto")
+    ax.set_xticks(np.arange(n_subjects), labels=[fill(str(t), 30) for t in matrix.columns], rotation=90, fontsize=7)
+    ax.set_yticks(np.arange(n_courses), labels=[fill(str(c), 40) for c in matrix.index], fontsize=8)
+    if n_courses * n_subjects <= 400:
+        for (i, j), value in np.ndenumerate(values.filled(np.nan)):
+            if not np.isnan(value):
+                ax.text(j, i, f"{value:.2f}", ha="center", va="center", fontsize=6)
+    fig.colorbar(image, ax=ax, label=f"Razão do percentual de acerto ({ies_name} / Brasil)")
+    ax.set_title("Razão de Acertos por Tema: todos os cursos", loc="left")
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+def institution_heatmap_job(Enade_2023, institution_scores: pd.DataFrame, ies_name: str = "IES") -> ChartJob:
+    """Monta o ChartJob do mapa de calor institucional, com chave derivada do conteúdo de `institution_scores`."""
+    version = get_source_version(Enade_2023)
+    key = make_chart_key("heatmap", frame_digest(institution_scores), ies_name, version) if version else None
+    return ChartJob(key, render_ratio_heatmap, lambda: None if institution_scores.empty else (institution_scores, ies_name))
+
+# --- Histogramas de Respostas (Questionário do Estudante) ---
+
+# Alternativas contadas por questão: 0 (sem resposta) e 1 a 8
+QE_ANSWER_OPTIONS = 9
+
+@instrumentation.instrumented(rows=lambda result: len(result[0]))
+def get_qe_histograms(QE_data_2023: pd.DataFrame, questions_list) -> tuple:
+    """
+    Conta, por curso, as respostas de cada questão do QE em um tensor
+    cursos × questões × alternativas (0 a 8). Retorna (códigos dos cursos ordenados, tensor).
+    """
+    codes, courses = pd.factorize(QE_data_2023["CO_CURSO"], sort=True)
+    valid_course = codes >= 0
+    counts = np.zeros((len(courses), len(questions_list), QE_ANSWER_OPTIONS), dtype=np.int32)
+    for i, q in enumerate(questions_list):
+        answers = QE_data_2023[q].to_numpy()
+        valid = valid_course & (answers >= 0) & (answers < QE_ANSWER_OPTIONS)
+        flat = codes[valid] * QE_ANSWER_OPTIONS + answers[valid].astype(np.int64)
+        counts[:, i, :] = np.bincount(flat, minlength=len(courses) * QE_ANSWER_OPTIONS).reshape(-1, QE_ANSWER_OPTIONS)
+    return np.asarray(courses), counts
+
+class QEHistogram:
+    """
+    Contagens de respostas do QE em um tensor denso cursos × questões × alternativas (0 a 8),
+    calculado uma única vez. Cada gráfico passa a ser uma consulta O(questões).
+    """
+
+    def __init__(self, courses: np.ndarray, questions: list, counts: np.ndarray, data_version: str | None = None):
+        self.courses = np.asarray(courses)
+        self.questions = list(questions)
+        self.question_index = {q: i for i, q in enumerate(self.questions)}
+        self.counts = counts
+        self.data_version = data_version
+
+    @classmethod
+    def from_frame(cls, QE_data_2023: pd.DataFrame, questions_list, data_version: str | None = None) -> "QEHistogram":
+        """Constrói o tensor em uma única passagem agrupada sobre o DataFrame do QE."""
+        courses, counts = get_qe_histograms(QE_data_2023, questions_list)
+        return cls(courses, questions_list, counts, data_version)
+
+    def get_qe_histogram(self, course_code: int, questions_list) -> np.ndarray | None:
+        """Matriz questões × alternativas (0 a 8) de um curso, ou None se o curso não tiver respostas."""
+        position = np.searchsorted(self.courses, course_code)
+        if position >= len(self.courses) or self.courses[position] != course_code:
+            return None
+        return self.counts[position, [self.question_index[q] for q in questions_list], :]
+
+class QEBenchmarks:
+    """
+    Referências nacionais do QE: histogramas agregados por CO_GRUPO sobre todos os cursos do
+    arquivo do QE e apenas sobre os cursos de IES públicas federais (grupos × questões × alternativas).
+    """
+
+    def __init__(self, groups: np.ndarray, questions: list, national_counts: np.ndarray, public_counts: np.ndarray,
+                 data_version: str | None = None):
+        self.groups = np.asarray(groups)
+        self.questions = list(questions)
+        self.question_index = {q: i for i, q in enumerate(self.questions)}
+        self.national_counts = national_counts
+        self.public_counts = public_counts
+        self.data_version = data_version
+
+    @classmethod
+    def from_histogram(cls, histogram: "QEHistogram", course_info: pd.DataFrame) -> "QEBenchmarks":
+        """
+        Soma os histogramas dos cursos por grupo. `course_info` traz CO_CURSO, CO_GRUPO, CO_CATEGAD
+        e CO_ORGACAD; cursos sem grupo conhecido ficam de fora.
+        """
+        info = course_info.drop_duplicates(subset="CO_CURSO").set_index("CO_CURSO").reindex(histogram.courses)
+        known = info["CO_GRUPO"].notna().to_numpy()
+        groups, group_index = np.unique(info["CO_GRUPO"].to_numpy()[known].astype(np.int64), return_inverse=True)
+        counts = np.asarray(histogram.counts)[known]
+        public = ((info["CO_CATEGAD"] == config.PUBLIC_ADMIN_CATEGORY) &
+                  (info["CO_ORGACAD"] == config.FEDERAL_ORG_CATEGORY)).to_numpy()[known]
+
+        shape = (len(groups),) + counts.shape[1:]
+        national_counts = np.zeros(shape, dtype=np.int64)
+        public_counts = np.zeros(shape, dtype=np.int64)
+        np.add.at(national_counts, group_index, counts)
+        np.add.at(public_counts, group_index[public], counts[public])
+        return cls(groups, histogram.questions, national_counts, public_counts, histogram.data_version)
+
+    def get_averages(self, group_code: int, questions_list) -> tuple | None:
+        """Médias (nacional, IES públicas federais) de cada questão para o grupo, ou None se o grupo não existir."""
+        position = np.searchsorted(self.groups, group_code)
+        if position >= len(self.groups) or self.groups[position] != group_code:
+            return None
+        question_positions = [self.question_index[q] for q in questions_list]
+        return (get_qe_averages(self.national_counts[position, question_positions, :]),
+                get_qe_averages(self.public_counts[position, question_positions, :]))
+
+def get_qe_histogram(QE_data_2023, course_code: int, questions_list) -> np.ndarray | None:
+    """
+    Retorna a matriz questões × alternativas (0 a 8) de contagens de um curso, ou None se o
+    curso não tiver respostas. Aceita o DataFrame do QE, um QEHistogram ou um repositório
+    de agregados.
+    """
+    if not isinstance(QE_data_2023, pd.DataFrame):
+        return QE_data_2023.get_qe_histogram(course_code, questions_list)
+    course_df = QE_data_2023[QE_data_2023["CO_CURSO"] == course_code]
+    if course_df.empty:
+        return None
+    return get_qe_histograms(course_df, questions_list)[1][0]
 
-    return fig1, fig1_img, fig2, fig2_img
+def get_qe_averages(histogram: np.ndarray) -> np.ndarray:
+    """Média das respostas de cada questão a partir do histograma, excluindo as alternativas 7 e 8 (NaN se vazia)."""
+    valid_counts = histogram[..., :7]
+    totals = valid_counts.sum(axis=-1)
+    sums = valid_counts @ np.arange(7)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(totals > 0, sums / totals, np.nan)
 
 # --- Funções de Plotagem (Questionário do Estudante) ---
 
-def plot_count_graph(QE_data_2023, course_code: int, questions_list):
-    """Gera e salva o gráfico de contagem de respostas (linhas)."""
-    course_df = QE_data_2023[QE_data_2023["CO_CURSO"] == course_code]
-    
-    if course_df.empty:
-        return None, None
+QE_ANSWER_GROUPS = {
+    '1-2 (Discordância)': [1, 2],
+    '3-4 (Neutro)': [3, 4],
+    '5-6 (Concordância)': [5, 6],
+    '7-8 (Não se aplica/Não sei)': [7, 8]
+}
 
-    groups = {
-        '1-2 (Discordância)': [1, 2],
-        '3-4 (Neutro)': [3, 4],
-        '5-6 (Concordância)': [5, 6],
-        '7-8 (Não se aplica/Não sei)': [7, 8]
-    }
-    
-    counts = {label: [] for label in groups.keys()}
-    for q in questions_list:
-        counts_per_q = course_df[q].value_counts()
-        for label, values in groups.items():
-            counts[label].append(counts_per_q.reindex(values, fill_value=0).sum())
-
-    questions_labels = [q.replace('QE_I', '') for q in questions_list]
+def render_count_graph(counts: dict, questions_labels: list) -> bytes:
+    """Desenha o gráfico de contagem de respostas (linhas) e retorna o PNG."""
     fig, ax = plt.subplots(figsize=(10, 7))
 
     for label, data in counts.items():
@@ -145,34 +649,11 @@ def plot_count_graph(QE_data_2023, course_code: int, questions_list):
 
     ax.set_ylabel("Número de Respostas")
     ax.legend(title='Grupos de Resposta', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.tight_layout()
-
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_img:
-        fig.savefig(tmp_img.name, dpi=150)
-        return fig, tmp_img.name
-
-def plot_average_graph(QE_data_2023, course_code: int, questions_list, question_text):
-    """Gera e salva o gráfico de médias de respostas (barras)."""
-    course_df = QE_data_2023[QE_data_2023["CO_CURSO"] == course_code]
-    
-    if course_df.empty:
-        return None, None
-
-    averages = []
-    for q in questions_list:
-        # Filtra respostas 7 e 8 para o cálculo da média
-        valid_answers = course_df[q][~course_df[q].isin([7, 8])]
-        averages.append(valid_answers.mean())
-
-    df_plot = pd.DataFrame({
-        'Questão': [q.replace('QE_I', '') for q in questions_list],
-        'Média': averages,
-        'Texto': question_text
-    }).dropna(subset=['Média'])
-
-    if df_plot.empty:
-        return None, None
+    fig.tight_layout()
+    return figure_to_png(fig)
 
+def render_average_graph(df_plot: pd.DataFrame) -> bytes:
+    """Desenha o gráfico de médias de respostas (barras) e retorna o PNG."""
     max_avg = df_plot['Média'].max()
     min_avg = df_plot['Média'].min()
     colors = ['#00712D' if v == max_avg else '#F09319' if v == min_avg else '#81A263' for v in df_plot['Média']]
@@ -180,69 +661,215 @@ def plot_average_graph(QE_data_2023, course_code: int, questions_list, question_
     fig, ax = plt.subplots(figsize=(13, 9))
     bars = ax.bar(df_plot['Questão'], df_plot['Média'], color=colors)
     ax.bar_label(bars, fmt='%.2f', fontsize=12, padding=3)
+    # Referências do grupo (quando calculadas): marcadores sobre cada barra
+    if 'Média Nacional' in df_plot:
+        ax.scatter(df_plot['Questão'], df_plot['Média Nacional'], marker='_', s=900, linewidths=3, color='k', label='Média nacional', zorder=3)
+        ax.scatter(df_plot['Questão'], df_plot['Média Públicas Federais'], marker='_', s=900, linewidths=3, color='#1f77b4', label='Média IES públicas federais', zorder=3)
+        ax.legend(loc='lower right')
     ax.set_ylim(top=ax.get_ylim()[1] * 1.1) # Adiciona espaço no topo
     ax.set_ylabel("Média de Respostas (1 a 6)")
-    plt.tight_layout()
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+def get_count_graph_data(QE_data_2023, course_code: int, questions_list) -> dict | None:
+    """Contagem de respostas por grupo de alternativas e questão (None se o curso não tiver respostas)."""
+    histogram = get_qe_histogram(QE_data_2023, course_code, questions_list)
+    if histogram is None:
+        return None
+    return {label: histogram[:, values].sum(axis=1).tolist() for label, values in QE_ANSWER_GROUPS.items()}
+
+def get_average_graph_data(QE_data_2023, course_code: int, questions_list, question_text,
+                           benchmarks: QEBenchmarks | None = None, group_code: int | None = None) -> pd.DataFrame | None:
+    """
+    Médias por questão, excluídas as alternativas 7 e 8 (None se não houver médias). Com
+    `benchmarks`, inclui as médias nacional e das IES públicas federais do grupo do curso.
+    """
+    histogram = get_qe_histogram(QE_data_2023, course_code, questions_list)
+    if histogram is None:
+        return None
 
-    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_img:
-        fig.savefig(tmp_img.name, dpi=150)
-        return fig, tmp_img.name
+    df_plot = pd.DataFrame({
+        'Questão': [q.replace('QE_I', '') for q in questions_list],
+        'Média': get_qe_averages(histogram),
+        'Texto': question_text
+    })
+    group_averages = benchmarks.get_averages(group_code, questions_list) if benchmarks is not None else None
+    if group_averages is not None:
+        df_plot['Média Nacional'], df_plot['Média Públicas Federais'] = group_averages
+    df_plot = df_plot.dropna(subset=['Média'])
+    return None if df_plot.empty else df_plot
+
+def _qe_chart_key(name: str, QE_data_2023, course_code: int, questions_list) -> str | None:
+    version = get_source_version(QE_data_2023)
+    return make_chart_key(name, course_code, tuple(questions_list), version) if version else None
+
+def count_graph_job(QE_data_2023, course_code: int, questions_list) -> ChartJob:
+    """Monta o ChartJob do gráfico de contagem de respostas (linhas)."""
+    def prepare():
+        counts = get_count_graph_data(QE_data_2023, course_code, questions_list)
+        return None if counts is None else (counts, [q.replace('QE_I', '') for q in questions_list])
+    return ChartJob(_qe_chart_key("count", QE_data_2023, course_code, questions_list), render_count_graph, prepare)
+
+def average_graph_job(QE_data_2023, course_code: int, questions_list, question_text,
+                      benchmarks: QEBenchmarks | None = None, group_code: int | None = None) -> ChartJob:
+    """Monta o ChartJob do gráfico de médias de respostas (barras), com as referências do grupo se informadas."""
+    def prepare():
+        df_plot = get_average_graph_data(QE_data_2023, course_code, questions_list, question_text, benchmarks, group_code)
+        return None if df_plot is None else (df_plot,)
+    name = "average" if benchmarks is None else f"average-benchmark-{group_code}-{benchmarks.data_version}"
+    return ChartJob(_qe_chart_key(name, QE_data_2023, course_code, questions_list), render_average_graph, prepare)
+
+def qe_graph_jobs(QE_data_2023, course_code: int, benchmarks: QEBenchmarks | None = None, group_code: int | None = None) -> dict:
+    """Monta os ChartJobs de médias e de contagem de cada dimensão do QE (ex.: 'odp_img_av', 'odp_img_co')."""
+    jobs = {}
+    for prefix, (questions_list, question_text) in config.QE_DIMENSIONS.items():
+        jobs[f"{prefix}_img_av"] = average_graph_job(QE_data_2023, course_code, questions_list, question_text, benchmarks, group_code)
+    for prefix, (questions_list, _) in config.QE_DIMENSIONS.items():
+        jobs[f"{prefix}_img_co"] = count_graph_job(QE_data_2023, course_code, questions_list)
+    return jobs
+
+def plot_count_graph(QE_data_2023, course_code: int, questions_list) -> bytes | None:
+    """Gera o gráfico de contagem de respostas (linhas) em PNG, reaproveitando o cache de gráficos."""
+    return run_chart_job(count_graph_job(QE_data_2023, course_code, questions_list))
+
+def plot_average_graph(QE_data_2023, course_code: int, questions_list, question_text,
+                       benchmarks: QEBenchmarks | None = None, group_code: int | None = None) -> bytes | None:
+    """Gera o gráfico de médias de respostas (barras) em PNG, reaproveitando o cache de gráficos."""
+    return run_chart_job(average_graph_job(QE_data_2023, course_code, questions_list, question_text, benchmarks, group_code))
 
 # --- Função de Tabela de Ranking ---
 
-def show_best_hei_ranking_table(Enade_2023, COURSE_CODES, hei_dict, group_code: int, course_code: int, public_only: bool):
-    """Cria e retorna um DataFrame com o ranking das IES."""
-    
-    questions_subjects_df = pd.read_csv(
-        config.QUESTIONS_SUBJECTS_BASE_URL + COURSE_CODES[course_code][2] + "_questions_subjects.csv", sep=";"
-    )
-    
-    subjects = pd.unique(questions_subjects_df[["FIRST_SUBJECT", "SECOND_SUBJECT", "THIRD_SUBJECT"]].values.ravel('K'))
-    subjects = pd.Series(subjects).dropna().sort_values(ignore_index=True)
+@instrumentation.instrumented(rows=len)
+def build_ranking_table(group_hits: pd.DataFrame, questions_subjects_df: pd.DataFrame, hei_dict: dict,
+                        course_code: int, public_only: bool, merged_score_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Monta o ranking das IES a partir da tabela de acertos do grupo. Depende apenas de dados
+    pequenos e serializáveis, podendo ser executada no pool de `render.py`. Com os percentuais
+    do curso (`get_performance_scores`), acrescenta a razão curso/Brasil, seu intervalo de
+    confiança e se a diferença para o Brasil é significativa. As colunas do curso têm nomes
+    neutros (ver `label_institution_columns`).
+    """
     invalid_subjects = get_invalid_subjects(questions_subjects_df)
-    subjects = np.setdiff1d(subjects, invalid_subjects)
-
-    condition = (Enade_2023["CO_GRUPO"] == group_code)
-    if public_only:
-        condition &= (Enade_2023["CO_CATEGAD"] == config.PUBLIC_ADMIN_CATEGORY) & \
-                     (Enade_2023["CO_ORGACAD"] == config.FEDERAL_ORG_CATEGORY)
-
-    filtered_enade = Enade_2023[condition]
-    hei_codes = filtered_enade["CO_CURSO"].unique()
-
-    scores = []
-    for code in hei_codes:
-        hei_df = filtered_enade[filtered_enade["CO_CURSO"] == code]
-        score = get_score_per_subject(questions_subjects_df, hei_df)["Nota (%)"].values.tolist()
-        scores.append([code, score])
-    
-    if not scores:
+    subjects = np.setdiff1d(get_subjects(questions_subjects_df), invalid_subjects)
+
+    # Percentuais de todos os cursos do grupo em uma única agregação (cursos × temas)
+    course_hits = filter_public_courses(group_hits) if public_only else group_hits
+    if course_hits.empty:
         return pd.DataFrame()
 
-    score_values = np.array([s[1] for s in scores if s[1]])
+    score_values = get_subject_scores(questions_subjects_df, course_hits).to_numpy()
     if score_values.size == 0:
         return pd.DataFrame()
 
     max_scores = np.max(score_values, axis=0)
     argmax_indices = np.argmax(score_values, axis=0)
-    
-    best_hei_codes = [scores[i][0] for i in argmax_indices]
-    
-    get_hei_code_from_course = lambda c: filtered_enade[filtered_enade["CO_CURSO"] == c]["CO_IES"].iloc[0]
-    
-    hei_data = [hei_dict.get(get_hei_code_from_course(c), f"IES Cód: {get_hei_code_from_course(c)}") for c in best_hei_codes]
-    
-    num_participants = [filtered_enade[filtered_enade["CO_CURSO"] == c].shape[0] for c in best_hei_codes]
-
-    ufpa_df = Enade_2023[Enade_2023["CO_CURSO"] == course_code]
-    ufpa_data = get_score_per_subject(questions_subjects_df, ufpa_df)["Nota (%)"]
+
+    best_courses = course_hits.iloc[argmax_indices]
+    hei_data = [institution_name(hei_dict, hei_code) for hei_code in best_courses["CO_IES"]]
+    num_participants = best_courses["NU_PARTICIPANTES"].tolist()
+
+    if course_code in group_hits.index:
+        course_data = get_subject_scores(questions_subjects_df, group_hits.loc[[course_code]]).to_numpy()[0]
+    else:
+        course_data = np.zeros(len(subjects))
 
     df_data = {
         "Tema": subjects,
         "IES com melhor desempenho": hei_data,
         "Nº de participantes": num_participants,
         "Melhor curso (%)": max_scores,
-        "UFPA (%)": ufpa_data
+        "Curso (%)": course_data
     }
-    
-    return pd.DataFrame(df_data)
\ No newline at end of file
+    if merged_score_df is not None:
+        scores = merged_score_df.reindex(subjects)
+        df_data["Razão Curso/Brasil"] = scores["Razão"].to_numpy()
+        if "Razão IC inf" in scores.columns:
+            df_data[f"IC {config.BOOTSTRAP_CONFIDENCE:.0%} da razão"] = [
+                "-" if pd.isna(low) else f"{low:.2f} – {high:.2f}"
+                for low, high in zip(scores["Razão IC inf"], scores["Razão IC sup"])
+            ]
+        df_data["Diferença para o Brasil"] = significance_label(scores).to_numpy()
+
+    return pd.DataFrame(df_data)
+
+def top_k_rows(score_values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Índices (k × temas) das k linhas de maior percentual em cada coluna da matriz cursos × temas,
+    em ordem decrescente e, nos empates, na ordem dos cursos (como `np.argmax`). Usa uma seleção
+    parcial (`np.argpartition`) seguida da ordenação de apenas k elementos por coluna.
+    """
+    n_courses = score_values.shape[0]
+    k = min(k, n_courses)
+    # Percentuais têm 2 casas decimais: a chave inteira combina percentual (desc.) e posição (asc.)
+    hundredths = np.rint(np.nan_to_num(score_values, nan=-1.0) * 100).astype(np.int64)
+    keys = -hundredths * n_courses + np.arange(n_courses)[:, None]
+    candidates = np.argpartition(keys, k - 1, axis=0)[:k] if k < n_courses else np.broadcast_to(
+        np.arange(n_courses)[:, None], keys.shape
+    )
+    order = np.argsort(np.take_along_axis(keys, candidates, axis=0), axis=0)
+    return np.take_along_axis(candidates, order, axis=0)
+
+@instrumentation.instrumented(rows=lambda result: len(result[0]))
+def build_subject_standings(group_hits: pd.DataFrame, questions_subjects_df: pd.DataFrame, hei_dict: dict,
+                            course_code: int, public_only: bool, top_k: int = 5) -> tuple:
+    """
+    Posição do curso entre todos os cursos do grupo (ou apenas os de IES públicas federais), a
+    partir de uma única matriz cursos × temas. Retorna (situação por tema: percentual, posição e
+    percentil do curso e quartis nacionais; os `top_k` melhores cursos por tema).
+    """
+    course_hits = filter_public_courses(group_hits) if public_only else group_hits
+    if course_hits.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    scores_df = get_subject_scores(questions_subjects_df, course_hits)
+    score_values = scores_df.to_numpy()
+    if score_values.size == 0:
+        return pd.DataFrame(), pd.DataFrame()
+    subjects = scores_df.columns.to_numpy()
+
+    if course_code in group_hits.index:
+        course_scores = get_subject_scores(questions_subjects_df, group_hits.loc[[course_code]]).to_numpy()[0]
+    else:
+        course_scores = np.zeros(len(subjects))
+
+    n_courses = score_values.shape[0]
+    above = (score_values > course_scores).sum(axis=0)
+    at_or_below = (score_values <= course_scores).sum(axis=0)
+    quartiles = np.percentile(score_values, [25, 50, 75], axis=0)
+    standings = pd.DataFrame({
+        "Tema": subjects,
+        "Curso (%)": course_scores,
+        "Posição do curso": above + 1,
+        "Cursos": n_courses,
+        "Percentil do curso": (100 * at_or_below / n_courses).round(1),
+        "Q1 (%)": quartiles[0].round(2),
+        "Mediana (%)": quartiles[1].round(2),
+        "Q3 (%)": quartiles[2].round(2),
+    })
+
+    # Uma linha por (tema, posição), agrupada por tema
+    rows = top_k_rows(score_values, top_k).T
+    k = rows.shape[1]
+    top_courses = course_hits.iloc[rows.ravel()]
+    top = pd.DataFrame({
+        "Tema": np.repeat(subjects, k),
+        "Posição": np.tile(np.arange(1, k + 1), len(subjects)),
+        "IES": [institution_name(hei_dict, hei_code) for hei_code in top_courses["CO_IES"]],
+        "Curso (CO_CURSO)": top_courses.index.to_numpy(),
+        "Nº de participantes": top_courses["NU_PARTICIPANTES"].to_numpy(),
+        "Percentual (%)": np.take_along_axis(score_values, rows.T, axis=0).T.ravel(),
+    })
+    return standings, top
+
+def show_best_hei_ranking_table(Enade_2023, COURSE_CODES, hei_dict, group_code: int, course_code: int, public_only: bool,
+                                top_k: int | None = None):
+    """
+    Cria e retorna um DataFrame com o ranking das IES (e a significância da razão curso/Brasil). Com
+    `top_k`, retorna também a situação do curso por tema e os `top_k` melhores cursos (ver `build_subject_standings`).
+    """
+    questions_subjects_df = get_questions_subjects(COURSE_CODES[course_code][2])
+    group_hits = get_group_course_hits(Enade_2023, group_code)
+    merged_score_df = get_performance_scores(Enade_2023, questions_subjects_df, group_code, course_code, group_hits)
+    ranking_df = build_ranking_table(group_hits, questions_subjects_df, hei_dict, course_code, public_only, merged_score_df)
+    if top_k is None:
+        return ranking_df
+    return (ranking_df, *build_subject_standings(group_hits, questions_subjects_df, hei_dict, course_code, public_only, top_k))
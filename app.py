@@ -1,9 +1,48 @@
 # app.py (VERSÃO FINAL E CORRIGIDA)
 
 import streamlit as st
-from data_loader import load_data
-from ui import load_css, create_sidebar, display_home_page, display_footer
-from paginas import conhecimento_especifico, questionario_do_estudante, relatorio
+import config
+from analysis import institution_name
+from data_loader import DATASETS, get_data_version, get_source_snapshot, warm_up
+from aggregates import load_aggregate_store
+from questions_subjects import prefetch_questions_subjects
+from ui import load_css, create_sidebar, display_diagnostics_panel, display_home_page, display_footer, select_institution
+from paginas import conhecimento_especifico, questionario_do_estudante, relatorio, visao_institucional
+
+@st.cache_resource
+def get_aggregate_store():
+    """Carrega o repositório de agregados uma única vez por processo (compartilhado entre sessões)."""
+    return load_aggregate_store()
+
+def get_dataset(name: str, snapshot: dict | None = None):
+    """
+    Retorna um conjunto de dados ('ce', 'qe', 'qe_benchmarks', 'catalog' ou 'hei'): do repositório de agregados,
+    se existir, ou carregado sob demanda (com cache próprio) a partir dos microdados, na versão das origens `snapshot`.
+    """
+    aggregate_store = get_aggregate_store()
+    if aggregate_store is not None:
+        return {
+            "ce": aggregate_store, "qe": aggregate_store, "qe_benchmarks": aggregate_store.qe_benchmarks,
+            "catalog": aggregate_store.catalog, "hei": aggregate_store.hei_dict
+        }[name]
+    return DATASETS[name](snapshot)
+
+def get_snapshot(names) -> dict | None:
+    """
+    Versão das origens dos conjuntos `names` fixada para toda a execução (uma atualização concluída
+    no meio dela vale a partir da próxima); baixa apenas as origens desses conjuntos ainda sem cópia local.
+    None com o repositório de agregados.
+    """
+    return get_source_snapshot(names) if get_aggregate_store() is None else None
+
+def get_institution(snapshot: dict | None = None) -> tuple:
+    """
+    Exibe a seleção da instituição e retorna seus cursos e seu COURSE_CODES, obtidos do índice
+    do cadastro (sem reler os dados), o dicionário de IES e o nome da instituição usado nos rótulos.
+    """
+    catalog, hei_dict = get_dataset("catalog", snapshot), get_dataset("hei", snapshot)
+    ies_code = select_institution(catalog.institutions(config.INSTITUTION_CODES), hei_dict)
+    return (*catalog.get_institution(ies_code), hei_dict, institution_name(hei_dict, ies_code))
 
 def main():
     """
@@ -21,29 +60,49 @@ def main():
     load_css()
     page = create_sidebar()
 
-    # --- Carregamento dos Dados (com cache) ---
-    # A função load_data é chamada apenas uma vez por sessão
-    Enade_2023, QE_data_2023, UFPA_data, COURSE_CODES, hei_dict = load_data()
-
     # --- Roteamento de Páginas ---
+    # Cada página carrega apenas os conjuntos de dados de que precisa. Se o repositório de
+    # agregados foi gerado (python aggregates.py), ele substitui os microdados.
+    aggregate_store = get_aggregate_store()
     if page == "🏠 Página Inicial":
         display_home_page()
 
     elif "Conhecimento Específico" in page:
-        # Passa todos os dados necessários para a página
-        conhecimento_especifico.show_page(Enade_2023, UFPA_data, COURSE_CODES, hei_dict)
+        snapshot = get_snapshot(("ce", "catalog", "hei"))
+        Enade_2023 = get_dataset("ce", snapshot)
+        ies_courses, COURSE_CODES, hei_dict, ies_name = get_institution(snapshot)
+        # Baixa concorrentemente os arquivos de temas dos cursos ainda não carregados por este processo
+        prefetch_questions_subjects(details[2] for details in COURSE_CODES.values() if details[2])
+        conhecimento_especifico.show_page(Enade_2023, ies_courses, COURSE_CODES, hei_dict, ies_name)
 
     elif "Questionário do Estudante" in page:
-        questionario_do_estudante.show_page(QE_data_2023, UFPA_data, COURSE_CODES)
+        snapshot = get_snapshot(("qe", "qe_benchmarks", "catalog", "hei"))
+        QE_data_2023 = get_dataset("qe", snapshot)
+        ies_courses, COURSE_CODES, _, _ = get_institution(snapshot)
+        questionario_do_estudante.show_page(QE_data_2023, ies_courses, COURSE_CODES, get_dataset("qe_benchmarks", snapshot))
+
+    elif "Visão Institucional" in page:
+        snapshot = get_snapshot(("ce", "catalog", "hei"))
+        Enade_2023 = get_dataset("ce", snapshot)
+        _, COURSE_CODES, _, ies_name = get_institution(snapshot)
+        prefetch_questions_subjects(details[2] for details in COURSE_CODES.values() if details[2])
+        visao_institucional.show_page(Enade_2023, COURSE_CODES, ies_name)
 
     elif "Baixar Relatório" in page:
-        relatorio.show_page()
+        snapshot = get_snapshot(())  # Os gráficos já foram gerados nas outras páginas: nada a baixar
+        relatorio.show_page(aggregate_store.data_version if aggregate_store else get_data_version(list(snapshot), list(snapshot.values())))
 
     # --- Rodapé ---
     display_footer()
+    # Painel oculto (?diagnostics=<token>): exibido por último para incluir as etapas desta execução
+    display_diagnostics_panel()
+
+    # Com a primeira página já exibida, carrega em segundo plano os demais conjuntos de dados
+    if aggregate_store is None:
+        warm_up()
 
 if __name__ == "__main__":
     # O st.spinner é colocado dentro de cada página que faz processamento demorado
-    # para uma melhor experiência do usuário. O carregamento inicial já é coberto
-    # pela anotação @st.cache_data em load_data().
+    # para uma melhor experiência do usuário. O carregamento dos dados é coberto
+    # pelas anotações @st.cache_resource dos carregadores em data_loader.py.
     main()
\ No newline at end of file
@@ -0,0 +1,142 @@
+# batch_reports.py
+
+import argparse
+import json
+import re
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+import config
+import render
+from analysis import get_group_course_hits, get_source_version, institution_name, performance_graph_jobs, qe_graph_jobs
+from pdf_generator import REQUIRED_CHARTS, build_report_pdf
+from questions_subjects import prefetch_questions_subjects
+
+MANIFEST_FILE = "manifest.json"
+
+def load_dataset(ies_code: int | None = None) -> tuple:
+    """
+    Carrega os dados da instituição `ies_code` (por padrão, config.DEFAULT_IES_CODE) no formato de
+    `data_loader.load_data` e as referências nacionais do QE, preferindo o repositório de agregados.
+    Retorna (dados, referências).
+    """
+    from aggregates import load_aggregate_store
+    store = load_aggregate_store()
+    if store is not None:
+        return store.as_dataset(ies_code), store.qe_benchmarks
+    from data_loader import DATASETS, load_data
+    return load_data(ies_code), DATASETS["qe_benchmarks"]()
+
+def report_file_name(course_code: int, details: list) -> str:
+    """Nome do arquivo do relatório de um curso (código, nome e município, sem caracteres especiais)."""
+    label = re.sub(r"[^\w]+", "_", f"{details[1]} {details[3]}").strip("_")
+    return f"{course_code}_{label}.pdf"
+
+def prepare_report_charts(Enade_2023, QE_data_2023, COURSE_CODES, course_code: int, group_hits=None, qe_benchmarks=None,
+                          ies_name: str = "IES") -> dict:
+    """
+    Prepara, no processo principal, os argumentos de renderização dos gráficos do relatório de
+    um curso: nome do gráfico -> (função de renderização, argumentos), ou None se não houver dados.
+    """
+    group_code = COURSE_CODES[course_code][0]
+    ratio_job, percent_job = performance_graph_jobs(Enade_2023, COURSE_CODES, group_code, course_code, group_hits, ies_name=ies_name)
+    jobs = {"razao_chart": ratio_job, "percent_chart": percent_job, **qe_graph_jobs(QE_data_2023, course_code, qe_benchmarks, group_code)}
+    prepared = {}
+    for name, job in jobs.items():
+        args = job.prepare()
+        prepared[name] = None if args is None else (job.render, args)
+    return prepared
+
+def build_course_report(prepared: dict, curso_nome: str, municipio_nome: str, output_path: str) -> int:
+    """Renderiza os gráficos preparados e grava o PDF de um curso (executado no pool de processos). Retorna o tamanho em bytes."""
+    charts = {name: render_fn(*args) for name, (render_fn, args) in prepared.items()}
+    return Path(output_path).write_bytes(build_report_pdf(charts, curso_nome, municipio_nome))
+
+def generate_reports(output_dir, course_codes=None, dataset=None, qe_benchmarks=None, ies_code: int | None = None) -> dict:
+    """
+    Gera os relatórios em PDF de todos os cursos de `COURSE_CODES` da instituição (ou apenas de
+    `course_codes`) em `output_dir`, sem sessão do Streamlit, e grava um manifesto com o resultado
+    de cada curso.
+    """
+    start = time.perf_counter()
+    if dataset is None:
+        dataset, qe_benchmarks = load_dataset(ies_code)
+    Enade_2023, QE_data_2023, _, COURSE_CODES, hei_dict = dataset
+    ies_name = institution_name(hei_dict, ies_code or config.DEFAULT_IES_CODE)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    selected = list(dict.fromkeys(map(int, COURSE_CODES if course_codes is None else course_codes)))
+    prefetch_questions_subjects(COURSE_CODES[code][2] for code in selected if code in COURSE_CODES and COURSE_CODES[code][2])
+
+    entries, pending, group_hits = {}, {}, {}
+    for code in selected:
+        details = COURSE_CODES.get(code)
+        if details is None:
+            entries[code] = {"course_code": code, "status": "error", "error": "Curso não encontrado em COURSE_CODES."}
+            continue
+        entry = entries[code] = {
+            "course_code": code, "course_name": details[1], "municipality": details[3],
+            "file": report_file_name(code, details)
+        }
+        if details[2] is None:
+            entry.update(status="skipped", error="Sem arquivo de temas para a área do curso.")
+            continue
+        try:
+            # Agregação de cada grupo feita uma única vez para todos os seus cursos
+            if details[0] not in group_hits:
+                group_hits[details[0]] = get_group_course_hits(Enade_2023, details[0])
+            prepared = prepare_report_charts(
+                Enade_2023, QE_data_2023, COURSE_CODES, code, group_hits[details[0]], qe_benchmarks, ies_name
+            )
+        except (OSError, ValueError, KeyError) as e:
+            entry.update(status="error", error=str(e))
+            continue
+        missing = [name for name in REQUIRED_CHARTS if prepared.get(name) is None]
+        if missing:
+            entry.update(status="skipped", error=f"Sem dados para os gráficos: {', '.join(missing)}")
+            continue
+        args = (prepared, details[1], details[3], str(output_dir / entry["file"]))
+        pending[render.submit(build_course_report, *args)] = (entry, args, time.perf_counter())
+
+    for future in as_completed(pending):
+        entry, args, submitted = pending[future]
+        try:
+            render.result(future, build_course_report, *args)
+            entry.update(status="ok", seconds=round(time.perf_counter() - submitted, 2))
+        except Exception as e:
+            entry.update(status="error", error=str(e))
+
+    elapsed = time.perf_counter() - start
+    generated = sum(entry["status"] == "ok" for entry in entries.values())
+    manifest = {
+        "data_version": get_source_version(Enade_2023),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": config.RENDER_WORKERS,
+        "courses": len(selected),
+        "generated": generated,
+        "elapsed_seconds": round(elapsed, 2),
+        "courses_per_minute": round(generated / elapsed * 60, 2) if elapsed else None,
+        "reports": list(entries.values()),
+    }
+    (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, ensure_ascii=False, default=str))
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera os relatórios em PDF do ENADE 2023 para os cursos da IES, sem o Streamlit.")
+    parser.add_argument("--ies", type=int, default=config.DEFAULT_IES_CODE, help="Código da instituição (CO_IES).")
+    parser.add_argument("--output", default="relatorios", help="Diretório de saída dos relatórios.")
+    parser.add_argument("--courses", type=int, nargs="+", help="Códigos dos cursos (CO_CURSO); padrão: todos.")
+    parser.add_argument("--workers", type=int, default=config.RENDER_WORKERS, help="Processos de renderização (0 executa no próprio processo).")
+    args = parser.parse_args()
+
+    config.RENDER_WORKERS = args.workers
+    manifest = generate_reports(args.output, args.courses, ies_code=args.ies)
+    failed = manifest["courses"] - manifest["generated"]
+    print(
+        f"{manifest['generated']} relatórios gravados em {args.output} ({failed} sem relatório) "
+        f"em {manifest['elapsed_seconds']:.1f}s: {manifest['courses_per_minute']} cursos/min"
+    )
+
+if __name__ == "__main__":
+    main()
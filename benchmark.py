@@ -0,0 +1,254 @@
+# benchmark.py
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import config
+
+# Etapa medida: nome, função medida, preparação (não medida, executada antes de cada repetição),
+# número de repetições e função que informa as linhas processadas
+Stage = namedtuple("Stage", ["name", "run", "setup", "repeat", "rows"])
+
+def measure(stage: Stage, memory: bool = True) -> dict:
+    """
+    Mede uma etapa: tempo de relógio e de CPU (a melhor de `repeat` repetições), pico de memória
+    alocada pelo Python/NumPy (tracemalloc, em uma repetição à parte) e RSS máximo do processo.
+    """
+    wall, cpu = [], []
+    for _ in range(stage.repeat):
+        if stage.setup:
+            stage.setup()
+        gc.collect()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        stage.run()
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+
+    result = {
+        "wall_seconds": round(min(wall), 4),
+        "cpu_seconds": round(min(cpu), 4),
+        "repeat": stage.repeat,
+        "rows": stage.rows() if stage.rows else None,
+    }
+    if memory:
+        if stage.setup:
+            stage.setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            stage.run()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    # ru_maxrss em KiB no Linux (bytes no macOS)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["max_rss_mb"] = round(max_rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    return result
+
+def use_sources(urls: dict, work_dir: Path) -> None:
+    """Aponta as origens para o conjunto sintético e isola caches e downloads em `work_dir`."""
+    for attr, url in urls.items():
+        setattr(config, attr, url)
+    config.CACHE_DIR = str(work_dir / "cache")
+    config.DOWNLOAD_DIR = str(work_dir / "downloads")
+    config.SHARED_DATA_DIR = str(work_dir / "shared")
+    config.SOURCES_REGISTRY = str(work_dir / "sources.json")
+    config.QUESTIONS_SUBJECTS_CACHE_DIR = str(work_dir / "questions_subjects")
+    config.CHART_CACHE_DIR = None
+    # O cache de gráficos é criado na importação (antes desta configuração): sem o nível em disco,
+    # esvaziar o cache antes de cada repetição mede a geração completa dos gráficos
+    from chart_cache import chart_cache
+    chart_cache.disk_dir = None
+    config.CACHE_CHECK_REMOTE = False
+    config.RENDER_WORKERS = 0  # Renderização medida no próprio processo
+
+def build_stages(work_dir: Path, repeat: int) -> list:
+    """Etapas da carga, da análise, dos gráficos e do relatório, na ordem em que dependem umas das outras."""
+    import data_loader
+    from analysis import (
+        get_group_course_hits, get_group_rows, get_score_per_subject, plot_average_graph, plot_count_graph,
+        plot_performance_graph, show_best_hei_ranking_table
+    )
+    from chart_cache import chart_cache
+    from pdf_generator import build_report_pdf
+    from questions_subjects import get_questions_subjects
+
+    # Fora do `streamlit run`, os caches avisam a cada chamada que não há sessão
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    state = {}
+
+    def clear_all():
+        data_loader.clear_datasets()
+        for name in ("cache", "downloads", "shared", "sources.json"):
+            path = work_dir / name
+            shutil.rmtree(path, ignore_errors=True) if path.is_dir() else path.unlink(missing_ok=True)
+
+    def load():
+        state["data"] = data_loader.load_data()
+        state["qe_benchmarks"] = data_loader.DATASETS["qe_benchmarks"]()
+
+    def select_course():
+        # Curso da IES no grupo com mais participantes: o caso mais pesado da análise
+        Enade_2023, _, _, COURSE_CODES, _ = state["data"]
+        group_sizes = Enade_2023["CO_GRUPO"].value_counts()
+        course_code = max(COURSE_CODES, key=lambda code: group_sizes.get(COURSE_CODES[code][0], 0))
+        group_code = COURSE_CODES[course_code][0]
+        state.update(
+            course_code=course_code, group_code=group_code,
+            group_df=get_group_rows(Enade_2023, group_code),
+            questions_subjects_df=get_questions_subjects(COURSE_CODES[course_code][2]),
+        )
+
+    def score_per_subject():
+        get_score_per_subject(state["questions_subjects_df"], state["group_df"])
+
+    def group_hits():
+        state["group_hits"] = get_group_course_hits(state["data"][0], state["group_code"])
+
+    def ranking():
+        Enade_2023, _, _, COURSE_CODES, hei_dict = state["data"]
+        show_best_hei_ranking_table(Enade_2023, COURSE_CODES, hei_dict, state["group_code"], state["course_code"], False, 5)
+
+    # Os gráficos passam pelo mesmo caminho das páginas (percentuais com bootstrap e cache de
+    # gráficos); o cache é esvaziado antes de cada repetição para medir a geração completa
+    def performance_graphs():
+        Enade_2023, _, _, COURSE_CODES, _ = state["data"]
+        ratio_png, percent_png = plot_performance_graph(Enade_2023, COURSE_CODES, state["group_code"], state["course_code"])
+        state["charts"] = {"razao_chart": ratio_png, "percent_chart": percent_png}
+
+    def qe_graphs():
+        _, QE_histogram, _, _, _ = state["data"]
+        for prefix, (questions_list, question_text) in config.QE_DIMENSIONS.items():
+            state["charts"][f"{prefix}_img_av"] = plot_average_graph(
+                QE_histogram, state["course_code"], questions_list, question_text, state["qe_benchmarks"], state["group_code"]
+            )
+            state["charts"][f"{prefix}_img_co"] = plot_count_graph(QE_histogram, state["course_code"], questions_list)
+
+    def report():
+        details = state["data"][3][state["course_code"]]
+        build_report_pdf(state["charts"], details[1], details[3])
+
+    rows = lambda: len(state["data"][0])
+    group_rows = lambda: len(state["group_df"])
+    return [
+        Stage("load_data_cold", load, clear_all, 1, rows),
+        Stage("load_data_cached", load, data_loader.clear_datasets, repeat, rows),
+        Stage("select_course", select_course, None, 1, group_rows),
+        Stage("get_score_per_subject", score_per_subject, None, repeat, group_rows),
+        Stage("get_group_course_hits", group_hits, None, repeat, group_rows),
+        Stage("show_best_hei_ranking_table", ranking, None, repeat, group_rows),
+        Stage("plot_performance_graph", performance_graphs, chart_cache.clear, repeat, None),
+        Stage("plot_qe_graphs", qe_graphs, chart_cache.clear, repeat, None),
+        Stage("generate_pdf", report, None, repeat, None),
+    ]
+
+def run_benchmarks(scales, data_dir, repeat: int = config.BENCHMARK_REPEAT, seed: int = 0, memory: bool = True,
+                   log=print) -> dict:
+    """Gera (ou reaproveita) os dados sintéticos de cada escala e mede todas as etapas. Retorna os resultados."""
+    from synthetic_data import generate_sources
+
+    results = {}
+    for participants in scales:
+        scale_dir = Path(data_dir) / f"{participants}-{seed}"
+        start = time.perf_counter()
+        urls = generate_sources(scale_dir / "sources", participants, seed)
+        log(f"[{participants}] dados sintéticos prontos em {time.perf_counter() - start:.1f}s")
+        use_sources(urls, scale_dir / "work")
+
+        results[str(participants)] = {}
+        for stage in build_stages(scale_dir / "work", repeat):
+            results[str(participants)][stage.name] = measurement = measure(stage, memory)
+            log(f"[{participants}] {stage.name:<28} {measurement['wall_seconds']:>9.3f}s "
+                f"cpu {measurement['cpu_seconds']:>9.3f}s pico {measurement.get('peak_mb', float('nan')):>9.1f} MB")
+    return results
+
+def environment() -> dict:
+    """Versões e máquina da execução, para comparar resultados entre versões do código."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+def compare_results(baseline: dict, current: dict, thresholds: dict = config.BENCHMARK_THRESHOLDS) -> list:
+    """
+    Compara dois resultados etapa a etapa. Há regressão quando a métrica atual excede a da
+    referência em mais que a fração tolerada e também em mais que o mínimo absoluto
+    (para ignorar ruído em etapas muito rápidas). Retorna a lista de regressões.
+    """
+    regressions = []
+    for scale, stages in current["results"].items():
+        for stage, measurement in stages.items():
+            reference = baseline["results"].get(scale, {}).get(stage)
+            if not reference:
+                continue
+            for metric, (tolerance, minimum) in thresholds.items():
+                old, new = reference.get(metric), measurement.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + tolerance) and new - old > minimum:
+                    regressions.append({
+                        "scale": scale, "stage": stage, "metric": metric,
+                        "baseline": old, "current": new, "change": round(new / old - 1, 3) if old else None,
+                    })
+    return regressions
+
+def format_regressions(regressions: list) -> str:
+    if not regressions:
+        return "Nenhuma regressão acima dos limites."
+    lines = [f"{'Escala':>9} {'Etapa':<28} {'Métrica':<13} {'Referência':>11} {'Atual':>11} {'Variação':>9}"]
+    for r in regressions:
+        change = f"{r['change']:+.0%}" if r["change"] is not None else "-"
+        lines.append(f"{r['scale']:>9} {r['stage']:<28} {r['metric']:<13} {r['baseline']:>11} {r['current']:>11} {change:>9}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede carga, análise, gráficos e relatório sobre microdados sintéticos no formato do ENADE."
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=config.BENCHMARK_SCALES, help="Números de participantes.")
+    parser.add_argument("--output", default="benchmark.json", help="Arquivo JSON dos resultados.")
+    parser.add_argument("--data-dir", default=config.BENCHMARK_DIR, help="Diretório dos dados sintéticos e caches.")
+    parser.add_argument("--repeat", type=int, default=config.BENCHMARK_REPEAT, help="Repetições por etapa (vale a melhor).")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador de dados.")
+    parser.add_argument("--no-memory", action="store_true", help="Não mede o pico de memória (dispensa a repetição com tracemalloc).")
+    parser.add_argument("--baseline", help="Resultado de referência: falha (código 1) se houver regressão.")
+    parser.add_argument("--compare", nargs=2, metavar=("REFERENCIA", "ATUAL"), help="Apenas compara dois resultados.")
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (json.loads(Path(path).read_text()) for path in args.compare)
+    else:
+        results = run_benchmarks(args.scales, args.data_dir, args.repeat, args.seed, not args.no_memory)
+        current = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "results": results}
+        Path(args.output).write_text(json.dumps(current, indent=2))
+        print(f"Resultados gravados em {args.output}")
+        baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+
+    if baseline is not None:
+        regressions = compare_results(baseline, current)
+        print(format_regressions(regressions))
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# chart_cache.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+import config
+
+def make_chart_key(*parts) -> str:
+    """
+    Gera a chave (endereçada por conteúdo) de um gráfico a partir de função, curso, questões,
+    parâmetros e versão dos dados, combinados com a versão do código de desenho (config.CHART_RENDER_VERSION).
+    """
+    return hashlib.sha256(repr((config.CHART_RENDER_VERSION, parts)).encode()).hexdigest()
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Resumo do conteúdo de um DataFrame (colunas, índice e valores), para compor as chaves dos gráficos."""
+    digest = hashlib.sha256(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+class ChartCache:
+    """
+    Cache de gráficos renderizados (bytes PNG) com despejo LRU limitado por tamanho, em memória
+    e, opcionalmente, em disco. Seguro para uso concorrente pelas sessões do Streamlit.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str | None = None, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.png"
+
+    def _remember(self, key: str, png: bytes) -> None:
+        """Insere na memória (chamado com o lock) e despeja os itens menos usados acima do limite."""
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        if len(png) > self.max_bytes:
+            return
+        self._entries[key] = png
+        self._size += len(png)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _read_disk(self, key: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            png = path.read_bytes()
+            os.utime(path)  # Marca o uso recente para o despejo LRU em disco
+            return png
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, png: bytes) -> None:
+        if not self.disk_dir or len(png) > self.max_disk_bytes:
+            return
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._disk_path(key).with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(png)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_disk()
+        except OSError:
+            pass  # O cache em disco é opcional: falhas não afetam a renderização
+
+    def _evict_disk(self) -> None:
+        """Remove os arquivos usados há mais tempo até o diretório caber no limite."""
+        files = []
+        for path in self.disk_dir.glob("*.png"):
+            try:
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return png
+        png = self._read_disk(key)
+        with self._lock:
+            if png is not None:
+                self._remember(key, png)
+                self.hits += 1
+            else:
+                self.misses += 1
+        return png
+
+    def __contains__(self, key: str) -> bool:
+        """Se o item está em cache (sem contar como acesso nem alterar a ordem do LRU)."""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and self._disk_path(key).exists()
+
+    def put(self, key: str, png: bytes) -> None:
+        with self._lock:
+            self._remember(key, png)
+        self._write_disk(key, png)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+chart_cache = ChartCache(config.CHART_CACHE_MAX_BYTES, config.CHART_CACHE_DIR, config.CHART_CACHE_MAX_DISK_BYTES)
@@ -1,5 +1,7 @@
 # config.py (CORRIGIDO)
 
+import os
+
 # --- URLs ---
 ENADE_2023_CE_URL = "https://github.com/PaulaManoella/Microdados-Enade/raw/main/databases2023/microdados2023_arq3.zip"
 ENADE_2023_QE_URL = "https://github.com/PaulaManoella/Microdados-Enade/raw/main/databases2023/microdados2023_arq4.zip"
@@ -7,9 +9,13 @@ BASE_DB_URL = "https://raw.githubusercontent.com/PaulaManoella/Microdados-Enade/
 CPC_2023_URL = "https://raw.githubusercontent.com/PaulaManoella/Microdados-Enade/refs/heads/main/databases2023/CPC_2023.csv"
 QUESTIONS_SUBJECTS_BASE_URL = "https://raw.githubusercontent.com/PaulaManoella/Microdados-Enade/main/databases2023/"
 HEI_CODES_URL = "https://raw.githubusercontent.com/PaulaManoella/Microdados-Enade/main/databases2022/hei.csv"
+# Origens baixadas pelo gerenciador de downloads (python downloads.py)
+SOURCE_URLS = [BASE_DB_URL, CPC_2023_URL, HEI_CODES_URL, ENADE_2023_CE_URL, ENADE_2023_QE_URL]
 
 # --- Códigos e Constantes ---
-UFPA_CODE = 569
+UFPA_CODE = 569  # IES cujos cursos definem, na ordem dos microdados, os arquivos de temas de cada grupo
+DEFAULT_IES_CODE = UFPA_CODE  # instituição selecionada ao abrir o app e usada pelos scripts
+INSTITUTION_CODES = None  # IES oferecidas na seleção (ex.: as do consórcio); None oferece todas
 PRESENT_STUDENT_CODE = 555
 PUBLIC_ADMIN_CATEGORY = 1
 FEDERAL_ORG_CATEGORY = 10028
@@ -20,4 +26,130 @@ DTYPES = {
     "DS_VT_ACE_OCE": str,
     "DS_VT_ESC_OCE": str,
     "DS_VT_ESC_OFG": str
-}
\ No newline at end of file
+}
+
+# --- Colunas utilizadas dos microdados ---
+# Apenas estas colunas são lidas do TXT e mantidas no cache colunar.
+CE_COLUMNS = [
+    "NU_ANO", "CO_CURSO", "DS_VT_ACE_OCE", "DS_VT_ACE_OFG", "DS_VT_ESC_OCE",
+    "NT_CE", "NT_GER", "NT_OBJ_CE", "TP_PRES", "TP_PR_GER"
+]
+QE_QUESTIONS = [f"QE_I{i}" for i in range(27, 69)]
+QE_COLUMNS = ["CO_CURSO"] + QE_QUESTIONS
+# Prefixo das colunas uint8 com o gabarito de DS_VT_ACE_OCE decodificado na carga
+ANSWER_COLUMN_PREFIX = "ACE_OCE_"
+
+# --- Intervalos de Confiança (bootstrap dos participantes do curso) ---
+BOOTSTRAP_REPLICATES = 2000  # réplicas por curso (0 desativa os intervalos)
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 2023  # semente fixa: o mesmo curso tem sempre os mesmos intervalos (e gráficos em cache)
+BOOTSTRAP_MIN_PARTICIPANTS = 5  # abaixo disso os intervalos não são calculados
+BOOTSTRAP_BATCH_ELEMENTS = 4_000_000  # réplicas × participantes sorteados por lote (limita a memória)
+
+# --- Esquema Compacto em Memória ---
+# Respostas do QE em uint8, códigos em int32 e nomes como categorias
+COMPACT_DTYPES = True
+CODE_COLUMNS = ["NU_ANO", "CO_CURSO", "CO_IES", "CO_GRUPO", "CO_CATEGAD", "CO_ORGACAD", "TP_PRES", "TP_PR_GER"]
+CATEGORY_COLUMNS = ["NOME_CURSO", "NOME_MUNIC_CURSO"]
+# Registra os bytes de cada DataFrame antes/depois da compactação (python data_loader.py)
+MEMORY_REPORT = False
+
+# --- Cache Colunar Local ---
+# Os microdados são gravados em Arrow/Feather (sem compressão) após o primeiro parse,
+# permitindo leitura mapeada em memória nas inicializações seguintes.
+CACHE_DIR = ".cache/enade"
+CACHE_SCHEMA_VERSION = 1
+# Compara ETag/Content-Length da origem antes de reutilizar o cache na pré-carga (ignorado se offline;
+# as cargas dos conjuntos usam a versão fixada pelo snapshot e só refresh_data revalida as origens)
+CACHE_CHECK_REMOTE = True
+
+# --- Ingestão em Streaming ---
+# Lê o TXT direto do ZIP em blocos, filtrando linhas durante a leitura (sem extrair para o disco)
+STREAMING_INGESTION = True
+INGESTION_CHUNKSIZE = 200_000
+DOWNLOAD_BLOCK_SIZE = 1 << 20
+
+# --- Gerenciador de Downloads ---
+# As origens são baixadas concorrentemente, em blocos para o disco, com retomada de transferências
+# interrompidas (Range) e conferência do tamanho e, se informado, do SHA-256
+DOWNLOAD_DIR = ".cache/enade/downloads"
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_TIMEOUT = 60  # segundos sem resposta da origem
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_RETRY_DELAY = 1.0  # segundos, multiplicados pelo número da tentativa
+DOWNLOAD_MAX_AGE = 10 * 60  # segundos em que uma cópia baixada é usada sem revalidar na origem
+KEEP_DOWNLOADED_ARCHIVES = False  # Mantém os ZIPs dos microdados após gerar o cache colunar
+SOURCE_SHA256 = {}  # URL -> SHA-256 esperado (opcional)
+
+# --- Atualização Incremental ---
+# Impressões digitais (SHA-256, ETag, tamanho) de cada origem; a atualização revalida as origens e
+# reconstrói apenas os conjuntos que dependem das alteradas, trocando a versão em uso de uma só vez
+SOURCES_REGISTRY = ".cache/enade/sources.json"
+REFRESH_INTERVAL = 6 * 60 * 60  # segundos entre as atualizações em segundo plano (None desativa)
+DATASET_GENERATIONS = 2  # versões de cada conjunto mantidas em memória (a em uso e a anterior)
+GROUP_HITS_CACHE_ENTRIES = 128  # tabelas de acertos por grupo (agregação nacional) mantidas em memória
+
+# --- Arquivos de Temas por Questão (*_questions_subjects.csv) ---
+QUESTIONS_SUBJECTS_CACHE_DIR = ".cache/enade/questions_subjects"
+QUESTIONS_SUBJECTS_TTL = 24 * 60 * 60  # segundos até revalidar a cópia local (ETag)
+QUESTIONS_SUBJECTS_WORKERS = 8
+# No modo offline, dados auxiliares são servidos apenas das cópias locais
+OFFLINE_MODE = False
+
+# --- Repositório de Agregados ---
+# Gerado offline por `python aggregates.py`; quando presente, o app dispensa os microdados
+AGGREGATE_STORE_DIR = "aggregates"
+AGGREGATE_STORE_FORMAT = 2
+
+# --- Cache de Gráficos (PNG) ---
+CHART_CACHE_MAX_BYTES = 64 * 1024 * 1024
+CHART_CACHE_DIR = ".cache/enade/charts"  # None desativa o nível em disco
+CHART_CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+# Versão do código de desenho dos gráficos, parte das chaves do cache: incrementar ao mudar a
+# aparência dos gráficos para não reaproveitar os PNGs antigos (inclusive os gravados em disco)
+CHART_RENDER_VERSION = 1
+
+# --- Renderização Paralela ---
+RENDER_WORKERS = 4  # 0 renderiza no próprio processo
+RENDER_START_METHOD = "spawn"
+
+# Dimensões do Questionário do Estudante (QE): prefixo dos gráficos -> (questões, enunciados)
+ODP_QUESTIONS = ['QE_I27', 'QE_I28', 'QE_I29', 'QE_I30', 'QE_I31', 'QE_I32', 'QE_I33', 'QE_I34', 'QE_I35', 'QE_I36', 'QE_I37', 'QE_I38', 'QE_I39', 'QE_I40', 'QE_I42', 'QE_I47', 'QE_I48', 'QE_I49', 'QE_I51', 'QE_I55', 'QE_I57', 'QE_I66']
+ODP_QUESTIONS_TEXT = ['As disciplinas cursadas contribuíram para sua formação integral, como cidadão e profissional.', 'Os conteúdos abordados nas disciplinas do curso favoreceram sua atuaçãoem estágios ou em atividades de iniciação profissional.', 'As metodologias de ensino utilizadas no curso desafiaram você a aprofundar conhecimentos e desenvolver competênciasreflexivas e críticas.', 'O curso propiciou experiências de aprendizagem inovadoras.', 'O curso contribuiu para o desenvolvimento da sua consciência ética para o exercício profissional.', 'No curso você teve oportunidade de aprender a trabalhar em equipe.', 'O curso possibilitou aumentar sua capacidade de reflexão e argumentação.', 'O curso promoveu o desenvolvimento da sua capacidade de pensar criticamente, analisar e refletir sobre soluções para problemas da sociedade.', 'O curso contribuiu para você ampliar sua capacidade de comunicação nas formas oral e escrita.', 'O curso contribuiu para o desenvolvimento da sua capacidade de aprender e atualizar-se permanentemente.', 'As relações professor-aluno ao longo do curso estimularam você a estudar e aprender.', 'Os planos de ensino apresentados pelos professores contribuíram para o desenvolvimento das atividades acadêmicas e para seus estudos.', 'As referências bibliográficas indicadas pelos professores nosplanos de ensino contribuíram para seus estudos e aprendizagens.', 'Foram oferecidas oportunidades para os estudantes superarem dificuldades relacionadas ao processo de formação.', 'O curso exigiu de você organização e dedicação frequente aos estudos.', 'O curso favoreceu a articulação do conhecimento teórico com atividades práticas.', 'As atividades práticas foram suficientes para relacionar os conteúdos do curso com a prática, contribuindo para sua formação profissional.', 'O curso propiciou acesso a conhecimentos atualizados e/ou contemporâneos em sua área de formação.', 'As atividades realizadas durante seu trabalho de conclusão de curso contribuíram para qualificar sua formação profissional.', 'As avaliações da aprendizagem realizadas durante o curso foram compatíveis com os conteúdos ou temas trabalhados pelos professores.', 'Os professores demonstraram domínio dos conteúdos abordados nas disciplinas.', 'As atividades acadêmicas desenvolvidas dentro e fora da sala de aula possibilitaram reflexão, convivência e respeito à diversidade.']
+INFRA_QUESTIONS = ['QE_I50', 'QE_I54', 'QE_I56', 'QE_I58', 'QE_I59', 'QE_I60', 'QE_I61', 'QE_I62', 'QE_I63', 'QE_I64', 'QE_I65', 'QE_I67', 'QE_I68']
+INFRA_QUESTIONS_TEXT = ['O estágio supervisionado proporcionou experiências diversificadas para a sua formação.', 'Os estudantes participaram de avaliações periódicas do curso (disciplinas, atuação dos professores, infraestrutura).', 'Os professores apresentaram disponibilidade para atender os estudantes fora do horário das aulas.', 'Os professores utilizaram tecnologias da informação e comunicação (TICs) como estratégia de ensino (projetor multimídia, laboratório de informática, ambiente virtual de aprendizagem).', 'A instituição dispôs de quantidade suficiente de funcionários para o apoio administrativo e acadêmico.', 'O curso disponibilizou monitores ou tutores para auxiliar os estudantes.', 'As condições de infraestrutura das salas de aula foram adequadas.', 'Os equipamentos e materiais disponíveis para as aulas práticas foram adequados para a quantidade de estudantes.', 'Os ambientes e equipamentos destinados às aulas práticas foram adequados ao curso.', 'A biblioteca dispôs das referências bibliográficas que os estudantes necessitaram.', 'A instituição contou com biblioteca virtual ou conferiu acesso a obras disponíveis em acervos virtuais.', 'A instituição promoveu atividades de cultura, de lazer e de interação social.', 'A instituição dispôs de refeitório, cantina e banheiros em condições adequadas que atenderam as necessidades dos seus usuários.']
+OAF_QUESTIONS = ['QE_I43', 'QE_I44', 'QE_I45', 'QE_I46', 'QE_I52', 'QE_I53']
+OAF_QUESTIONS_TEXT = ['Foram oferecidas oportunidades para os estudantes participarem de programas, projetos ou atividades de extensão universitária.', 'Foram oferecidas oportunidades para os estudantes participarem de projetos de iniciação científica e de atividades que estimularam a investigação acadêmica.', 'O curso ofereceu condições para os estudantes participarem de eventos internos e/ou externos à instituição.', 'A instituição ofereceu oportunidades para os estudantes atuarem como representantes em órgãos colegiados.', 'Foram oferecidas oportunidades para os estudantes realizarem intercâmbios e/ou estágios no país.', 'Foram oferecidas oportunidades para os estudantes realizarem intercâmbios e/ou estágios fora do país.']
+QE_DIMENSIONS = {
+    "odp": (ODP_QUESTIONS, ODP_QUESTIONS_TEXT),
+    "infra": (INFRA_QUESTIONS, INFRA_QUESTIONS_TEXT),
+    "oaf": (OAF_QUESTIONS, OAF_QUESTIONS_TEXT),
+}
+
+# --- Fila de Relatórios ---
+REPORT_WORKERS = 2  # Threads que montam os PDFs em segundo plano
+REPORT_CACHE_MAX_BYTES = 128 * 1024 * 1024  # PDFs prontos, compartilhados entre sessões
+REPORT_JOBS_MAX_ENTRIES = 256  # Tarefas encerradas mantidas para consulta (avisos e erros)
+REPORT_POLL_INTERVAL = 1.0  # Segundos entre as consultas de andamento na página
+
+# --- Conjuntos de Dados Compartilhados ---
+# Conjuntos processados gravados em Arrow/NumPy sem compressão e abertos como mapeamentos somente
+# leitura: todas as sessões (e todos os processos do servidor na mesma máquina) usam as mesmas páginas
+SHARED_DATASETS = True
+SHARED_DATA_DIR = ".cache/enade/shared"
+
+# --- Benchmarks (python benchmark.py) ---
+BENCHMARK_SCALES = [100_000, 500_000, 2_000_000]  # participantes dos conjuntos sintéticos
+BENCHMARK_DIR = ".cache/enade/benchmark"
+BENCHMARK_REPEAT = 3  # repetições por etapa; vale a mais rápida
+# Métrica -> (aumento relativo tolerado, aumento absoluto mínimo) para acusar regressão
+BENCHMARK_THRESHOLDS = {"wall_seconds": (0.25, 0.05), "peak_mb": (0.25, 5.0)}
+
+# --- Instrumentação (diagnóstico de desempenho) ---
+INSTRUMENTATION = False  # mede as etapas de carga, análise, gráficos, relatório e páginas
+INSTRUMENTATION_MEMORY = False  # pico de memória por etapa via tracemalloc (deixa as etapas mais lentas)
+INSTRUMENTATION_LOG = ".cache/enade/stages.jsonl"  # uma linha JSON por etapa, para o pipeline de logs (None desativa)
+INSTRUMENTATION_HISTORY = 1000  # etapas recentes mantidas em memória para o painel
+DIAGNOSTICS_QUERY_PARAM = "diagnostics"  # ?diagnostics=<token> na URL exibe o painel de diagnóstico na barra lateral
+# Token do painel de diagnóstico, definido fora do código (variável de ambiente); sem ele, o painel fica desativado
+DIAGNOSTICS_TOKEN = os.environ.get("ENADE_DIAGNOSTICS_TOKEN")
@@ -1,21 +1,283 @@
 # data_loader.py
 
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
 import streamlit as st
+from functools import partial
+from pathlib import Path
 from zipfile import ZipFile
-from io import BytesIO
-from urllib.request import urlopen
+from urllib.request import Request, urlopen
 import config
+import downloads
+import instrumentation
+import shared_data
+from analysis import CATALOG_COLUMNS, CourseCatalog, QEBenchmarks, QEHistogram, get_group_course_hits
+from utils import answer_columns, decode_answer_keys
 
-def get_raw_data(url: str, extract_to: str = '.') -> None:
-    """Baixa um arquivo ZIP de uma URL e o extrai para um diretório."""
-    http_response = urlopen(url)
-    with ZipFile(BytesIO(http_response.read())) as zipfile:
+# Informações de cada download (status, bytes, segundos) feito pelas cargas deste processo
+_download_report = {}
+
+_registry_lock = threading.Lock()
+
+def _read_registry() -> dict:
+    """Impressões digitais registradas das origens: URL -> {sha256, etag, content_length, checked_at}."""
+    try:
+        return json.loads(Path(config.SOURCES_REGISTRY).read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _record_source(url: str, info: dict) -> None:
+    """Registra a impressão digital da origem obtida e o tempo gasto no download."""
+    if info["status"] != "cached" or url not in _download_report:  # Mantém o registro do download efetivo
+        _download_report[url] = info
+    if info["status"] == "error":
+        return
+    with _registry_lock:
+        registry = _read_registry()
+        registry[url] = {**{field: info.get(field) for field in downloads.FINGERPRINT_FIELDS}, "checked_at": time.time()}
+        path = Path(config.SOURCES_REGISTRY)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(registry, indent=2))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # Sem o registro, a versão da origem vem do cache colunar (ou fica indefinida)
+
+def fetch_source(url: str, max_age: float = float("inf")) -> tuple:
+    """
+    Obtém a cópia local de uma origem pelo gerenciador de downloads, registrando sua impressão digital.
+    Por padrão usa a cópia já existente sem consultar a origem: as cargas leem a versão fixada pelo
+    snapshot e a revalidação cabe a `refresh_data`. Retorna (caminho, impressão digital).
+    """
+    with instrumentation.stage("fetch_source", source=Path(url).name) as record:
+        path, info = downloads.fetch(url, max_age=max_age)
+        record.update(cache="miss" if info["status"] in ("downloaded", "resumed") else "hit",
+                      status=info["status"], bytes=info.get("bytes", 0))
+    _record_source(url, info)
+    return path, {field: info.get(field) for field in downloads.FINGERPRINT_FIELDS}
+
+def release_archive(url: str) -> None:
+    """Descarta o ZIP baixado depois de convertido em cache colunar (a menos que KEEP_DOWNLOADED_ARCHIVES)."""
+    if not config.KEEP_DOWNLOADED_ARCHIVES:
+        downloads.discard(url)
+
+def get_download_report() -> pd.DataFrame:
+    """Status, megabytes transferidos e tempo de cada origem obtida por este processo."""
+    return pd.DataFrame(
+        [(Path(url).name, info["status"], round(info.get("bytes", 0) / 1e6, 1), info.get("seconds"))
+         for url, info in _download_report.items()],
+        columns=["Origem", "Status", "MB", "Segundos"]
+    )
+
+def get_raw_data(url: str, extract_to: str = '.') -> dict:
+    """Baixa um arquivo ZIP de uma URL, o extrai para um diretório e retorna a impressão digital do conteúdo."""
+    archive_path, fingerprint = fetch_source(url)
+    with ZipFile(archive_path) as zipfile:
         zipfile.extractall(path=extract_to)
+    return fingerprint
+
+@instrumentation.instrumented("parse_microdata", rows=len)
+def stream_microdata(archive_path: Path, txt_name: str, columns: list, row_filter=None) -> pd.DataFrame:
+    """
+    Lê o TXT diretamente de dentro do ZIP, em blocos de linhas, mantendo apenas as colunas
+    pedidas e as linhas aceitas por `row_filter`. Nada é extraído para o disco.
+    """
+    wanted = set(columns)
+    chunks = []
+    with ZipFile(archive_path) as zipfile, zipfile.open(txt_name) as member:
+        reader = pd.read_csv(
+            member, sep=";", decimal=",", dtype=config.DTYPES,
+            usecols=lambda col: col in wanted, chunksize=config.INGESTION_CHUNKSIZE
+        )
+        for chunk in reader:
+            chunks.append(row_filter(chunk) if row_filter else chunk)
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+def filter_present_chunk(chunk: pd.DataFrame, ies_courses: set) -> pd.DataFrame:
+    """
+    Filtro aplicado a cada bloco do arquivo de Conhecimento Específico: mantém participantes
+    presentes e válidos de todos os cursos, além de todas as linhas dos cursos da IES de
+    referência (necessárias para associar, na ordem original, seus cursos aos arquivos de temas).
+    """
+    present = (
+        (chunk["TP_PRES"] == config.PRESENT_STUDENT_CODE) &
+        (chunk["TP_PR_GER"] == config.PRESENT_STUDENT_CODE) &
+        (~chunk["DS_VT_ESC_OCE"].isna())
+    )
+    keep = present | chunk["CO_CURSO"].isin(ies_courses)
+    return chunk.loc[keep]
+
+def make_ce_row_filter(database: pd.DataFrame, ies_code: int) -> tuple:
+    """
+    Monta o filtro por bloco do arquivo de Conhecimento Específico a partir da base de cursos,
+    junto com uma chave que identifica o filtro no cache colunar.
+    """
+    ies_courses = set(database.loc[database["CO_IES"] == ies_code, "CO_CURSO"].tolist())
+    signature = json.dumps(sorted(ies_courses), default=int)
+    filter_key = "present:" + hashlib.sha256(signature.encode()).hexdigest()[:16]
+    return partial(filter_present_chunk, ies_courses=ies_courses), filter_key
+
+# --- Cache Colunar dos Microdados ---
+
+def _cache_paths(url: str) -> tuple:
+    """Retorna os caminhos (dados, metadados) do cache colunar associado a uma URL."""
+    stem = Path(url).name.rsplit(".", 1)[0]
+    key = hashlib.sha256(url.encode()).hexdigest()[:16]
+    base = Path(config.CACHE_DIR) / f"{stem}-{key}"
+    return base.with_suffix(".feather"), base.with_suffix(".json")
+
+def _remote_fingerprint(url: str) -> dict | None:
+    """Consulta ETag/Content-Length da origem sem baixar o arquivo (None se indisponível ou no modo offline)."""
+    if config.OFFLINE_MODE:
+        return None
+    try:
+        with urlopen(Request(url, method="HEAD"), timeout=10) as response:
+            return {
+                "etag": response.headers.get("ETag"),
+                "content_length": response.headers.get("Content-Length"),
+            }
+    except (OSError, ValueError):
+        return None
+
+def _is_cache_fresh(metadata: dict | None, url: str, columns: list, filter_key: str | None,
+                    check_remote: bool = False) -> bool:
+    """
+    Verifica se o cache corresponde à URL, ao esquema, ao filtro e às colunas pedidas e, com
+    `check_remote`, se a origem não mudou (as cargas não consultam a origem: isso cabe a `refresh_data`).
+    """
+    if not metadata or metadata.get("url") != url:
+        return False
+    if metadata.get("schema") != config.CACHE_SCHEMA_VERSION or metadata.get("filter") != filter_key:
+        return False
+    if not set(columns) <= set(metadata.get("columns", [])):
+        return False
+    if check_remote:
+        remote = _remote_fingerprint(url)
+        if remote:
+            for field in ("etag", "content_length"):
+                if remote[field] and metadata.get(field) and remote[field] != metadata[field]:
+                    return False
+    return True
+
+def _read_cache_metadata(url: str) -> dict | None:
+    """Lê os metadados do cache colunar, se existirem."""
+    data_path, meta_path = _cache_paths(url)
+    if not data_path.exists() or not meta_path.exists():
+        return None
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
 
-def filter_courses_results(df: pd.DataFrame, cod_grupo_list: list) -> pd.DataFrame:
-    """Filtra o DataFrame para incluir apenas participantes presentes e válidos."""
-    df_filtered = df.loc[df["CO_GRUPO"].isin(cod_grupo_list)]
+def _write_cache(url: str, df: pd.DataFrame, columns: list, filter_key: str | None, fingerprint: dict) -> None:
+    """Grava o DataFrame em Feather sem compressão (mapeável em memória) e seus metadados."""
+    data_path, meta_path = _cache_paths(url)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = data_path.with_suffix(".feather.tmp")
+    try:
+        df.reset_index(drop=True).to_feather(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, data_path)
+        metadata = {
+            "url": url,
+            "schema": config.CACHE_SCHEMA_VERSION,
+            "filter": filter_key,
+            "columns": list(columns),
+            "available": list(df.columns),
+            **fingerprint,
+        }
+        meta_path.write_text(json.dumps(metadata, indent=2))
+    except OSError:
+        # O cache é apenas uma otimização: falhas de escrita não devem impedir a análise
+        tmp_path.unlink(missing_ok=True)
+
+def read_microdata(url: str, txt_name: str, columns: list, row_filter=None, filter_key: str | None = None,
+                   select: list | None = None) -> pd.DataFrame:
+    """
+    Lê um arquivo de microdados a partir do cache colunar local, carregando apenas as
+    colunas pedidas (`select`, se informado, dentre as de `columns`). Se o cache estiver
+    ausente ou desatualizado, baixa o ZIP e faz o parse de todas as `columns` do TXT (em
+    blocos, aplicando `row_filter`, quando a ingestão em streaming está ativa), gravando o
+    cache para as próximas inicializações.
+    """
+    with instrumentation.stage("read_microdata", cached=True, source=Path(url).name) as record:
+        df = _read_microdata(url, txt_name, columns, row_filter, filter_key, select or columns)
+        record["rows"] = len(df)
+        return df
+
+def _read_microdata(url: str, txt_name: str, columns: list, row_filter, filter_key: str | None,
+                    select: list) -> pd.DataFrame:
+    data_path, _ = _cache_paths(url)
+    if not config.STREAMING_INGESTION:
+        row_filter, filter_key = None, None
+    metadata = _read_cache_metadata(url)
+    if _is_cache_fresh(metadata, url, columns, filter_key):
+        available = [col for col in select if col in metadata.get("available", [])]
+        try:
+            return feather.read_table(data_path, columns=available, memory_map=True).to_pandas()
+        except (OSError, ValueError):
+            pass  # Cache corrompido: segue para o download
+
+    instrumentation.cache_miss()
+    if config.STREAMING_INGESTION:
+        archive_path, fingerprint = fetch_source(url)
+        df = stream_microdata(archive_path, txt_name, columns, row_filter)
+    else:
+        fingerprint = get_raw_data(url=url, extract_to='.')
+        wanted = set(columns)
+        df = pd.read_csv(
+            txt_name, sep=";", decimal=",", dtype=config.DTYPES,
+            usecols=lambda col: col in wanted, low_memory=False
+        )
+    _write_cache(url, df, columns, filter_key, fingerprint)
+    release_archive(url)
+    return df[[col for col in select if col in df.columns]]
+
+def _source_fingerprint(url: str) -> str | None:
+    """SHA-256 da versão obtida de uma origem: do registro de origens ou, para os microdados, do cache colunar."""
+    fingerprint = _read_registry().get(url, {}).get("sha256")
+    return fingerprint or (_read_cache_metadata(url) or {}).get("sha256")
+
+def get_data_version(urls=None, fingerprints=None) -> str:
+    """
+    Identificador curto da versão dos dados (por padrão, de todas as origens), derivado das
+    impressões digitais informadas ou, na falta delas, das registradas para cada origem.
+    """
+    urls = list(urls or get_source_urls())
+    if fingerprints is None:
+        fingerprints = [_source_fingerprint(url) for url in urls]
+    parts = [f"{url}={fingerprint}" for url, fingerprint in zip(urls, fingerprints)]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:12]
+
+def _dataset_version(url: str, columns: list, filter_key: str | None = None, check_fresh: bool = True,
+                     references: tuple = ()) -> str | None:
+    """
+    Versão de um conjunto processado a partir dos microdados de `url`: combina a impressão digital
+    da origem (e das tabelas de referência usadas, `references`), as colunas, o filtro e o esquema.
+    None se o cache dos microdados não estiver atualizado.
+    """
+    if not config.STREAMING_INGESTION:
+        filter_key = None
+    metadata = _read_cache_metadata(url)
+    if not metadata or not metadata.get("sha256"):
+        return None
+    if check_fresh and not _is_cache_fresh(metadata, url, columns, filter_key):
+        return None
+    key = f"{metadata['sha256']}|{references}|{columns}|{filter_key}|{config.CACHE_SCHEMA_VERSION}|{config.COMPACT_DTYPES}"
+    return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+def filter_courses_results(df: pd.DataFrame, cod_grupo_list: list | None = None) -> pd.DataFrame:
+    """Filtra o DataFrame para incluir apenas participantes presentes e válidos (dos grupos de `cod_grupo_list`, se informado)."""
+    in_groups = df["CO_GRUPO"].notna() if cod_grupo_list is None else df["CO_GRUPO"].isin(cod_grupo_list)
+    df_filtered = df.loc[in_groups]
     df_filtered = df_filtered.loc[
         (df_filtered["TP_PRES"] == config.PRESENT_STUDENT_CODE) &
         (df_filtered["TP_PR_GER"] == config.PRESENT_STUDENT_CODE) &
@@ -34,63 +296,470 @@ def reduce_data(df: pd.DataFrame) -> pd.DataFrame:
     # Retorna apenas colunas que existem para evitar KeyErrors
     return df[[col for col in columns if col in df.columns]]
 
-@st.cache_data
-def load_data():
-    """Função principal que orquestra o download e processamento de todos os dados."""
-    database = pd.read_csv(config.BASE_DB_URL, sep=";")
-    cpc2023 = pd.read_csv(config.CPC_2023_URL, sep=";")
+# Colunas dos microdados do CE usadas apenas na carga (filtro de presença e gabarito a decodificar)
+LOAD_ONLY_COLUMNS = [
+    "NU_ANO", "DS_VT_ACE_OCE", "DS_VT_ACE_OFG", "DS_VT_ESC_OCE",
+    "NT_CE", "NT_GER", "NT_OBJ_CE", "TP_PRES", "TP_PR_GER"
+]
+
+# --- Esquema Compacto ---
+
+# Bytes por DataFrame antes/depois da compactação, registrados por load_data quando MEMORY_REPORT está ativo
+_memory_report = {}
+
+def memory_footprint(df: pd.DataFrame) -> int:
+    """Total de bytes ocupados pelo DataFrame, incluindo o conteúdo das strings."""
+    return int(df.memory_usage(deep=True).sum())
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o DataFrame para o esquema compacto: respostas do QE em uint8 (ausentes viram 0,
+    como no esquema original), códigos em int32 (float32 se houver ausentes) e nomes como categorias.
+    """
+    qe_columns = [col for col in df.columns if str(col).startswith("QE_I")]
+    if qe_columns:
+        df = df.fillna({col: 0 for col in qe_columns})
+
+    dtypes = {col: np.uint8 for col in qe_columns}
+    for col in df.columns:
+        if col in config.CATEGORY_COLUMNS:
+            dtypes[col] = "category"
+        elif col in config.CODE_COLUMNS:
+            dtypes[col] = "float32" if df[col].isna().any() else np.int32
+    return df.astype(dtypes)
+
+def _compact(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Compacta o DataFrame (se COMPACT_DTYPES) e registra seu tamanho antes/depois (se MEMORY_REPORT)."""
+    if not config.COMPACT_DTYPES:
+        return df
+    before = memory_footprint(df) if config.MEMORY_REPORT else None
+    df = compact_frame(df)
+    if config.MEMORY_REPORT:
+        _memory_report[name] = (before, memory_footprint(df))
+    return df
+
+def get_memory_report() -> pd.DataFrame:
+    """Relatório de bytes por DataFrame antes e depois do esquema compacto (última carga com MEMORY_REPORT)."""
+    report = pd.DataFrame(
+        [(name, before, after) for name, (before, after) in _memory_report.items()],
+        columns=["DataFrame", "Antes (bytes)", "Depois (bytes)"]
+    )
+    report["Redução (%)"] = (100 * (1 - report["Depois (bytes)"] / report["Antes (bytes)"])).round(1)
+    return report
+
+# --- Conjuntos de Dados e Suas Origens ---
+# Cada carregador recebe como chave as impressões digitais das origens de que depende (na ordem
+# de `get_dataset_sources`): uma origem alterada gera uma nova chave apenas para os conjuntos
+# que a usam. A versão anterior fica em cache até ser substituída pela seguinte.
+
+def get_dataset_sources() -> dict:
+    """Origens (URLs) de que cada conjunto de dados depende."""
+    references = (config.BASE_DB_URL, config.CPC_2023_URL)
+    return {
+        "ce": (*references, config.ENADE_2023_CE_URL),
+        "qe": (config.ENADE_2023_QE_URL,),
+        "qe_benchmarks": (*references, config.ENADE_2023_QE_URL),
+        "catalog": (*references, config.ENADE_2023_CE_URL),
+        "hei": (config.HEI_CODES_URL,),
+    }
 
-    get_raw_data(url=config.ENADE_2023_CE_URL, extract_to='.')
-    raw_data = pd.read_csv("microdados2023_arq3.txt", sep=";", decimal=",", dtype=config.DTYPES, low_memory=False)
+def get_source_urls() -> list:
+    """Todas as origens usadas pelos conjuntos de dados, sem repetição."""
+    return list(dict.fromkeys(url for urls in get_dataset_sources().values() for url in urls))
 
-    get_raw_data(url=config.ENADE_2023_QE_URL, extract_to='.')
-    raw_QE_data_2023 = pd.read_csv("microdados2023_arq4.txt", sep=";", decimal=",", dtype=config.DTYPES, low_memory=False)
+@st.cache_resource(max_entries=config.DATASET_GENERATIONS)
+@instrumentation.instrumented(marks_miss=True)
+def load_reference_tables(key: tuple) -> tuple:
+    """Tabelas de referência (cadastro de cursos e CPC 2023), pequenas e compartilhadas pelos demais conjuntos. Chave: (base_db, CPC)."""
+    database = pd.read_csv(fetch_source(config.BASE_DB_URL)[0], sep=";")
+    cpc2023 = pd.read_csv(fetch_source(config.CPC_2023_URL)[0], sep=";")
+    return database, cpc2023
 
+# Arquivo de temas (*_questions_subjects.csv) de cada curso da IES de referência (config.UFPA_CODE),
+# na ordem dos cursos nos microdados; os cursos das demais IES usam o arquivo do seu grupo
+QUESTIONS_SUBJECTS_FILE_NAMES = [
+    'ENG_CIV','ENG_ELE','ARQ','ENG_COM', 'NUT', 'ENG_MEC', 'ENG_AMB','ENF', 
+    'ENG_COM', 'ENG_MEC','AGR', 'ENG_AMB', 'FAR', 'ENG_ALI', 'MED', 'ENG_FLO', 
+    'AGR', 'BIO', 'ENG_CIV', 'ENG_ELE', 'ENG_QUI', 'MED_VET', 'MED', 'ODO', 'FIS'
+]
+
+def build_course_table(selected_data: pd.DataFrame, anchor_courses) -> pd.DataFrame:
+    """
+    Cursos com participantes de todas as IES (colunas CATALOG_COLUMNS), na ordem em que aparecem
+    nos microdados; os da IES de referência seguem a ordem de `anchor_courses`. Cada curso recebe
+    o arquivo de temas do curso correspondente da IES de referência ou, nas demais IES, o do
+    seu grupo (None se a IES de referência não oferece o grupo).
+    """
+    courses = selected_data.drop_duplicates("CO_CURSO")[CATALOG_COLUMNS[:-1]].astype(
+        {"CO_CURSO": np.int64, "CO_IES": np.int64, "CO_GRUPO": np.int64}
+    )
+    anchor_order = pd.Series(np.arange(len(anchor_courses)), index=anchor_courses)
+    courses = courses.assign(_order=courses["CO_CURSO"].map(anchor_order)).sort_values(
+        "_order", kind="stable", na_position="last"
+    ).drop(columns="_order")
+
+    course_files = dict(zip(anchor_courses, QUESTIONS_SUBJECTS_FILE_NAMES))
+    course_groups = courses.set_index("CO_CURSO")["CO_GRUPO"]
+    group_files = {}
+    for course, file_name in course_files.items():
+        if course in course_groups.index:
+            group_files.setdefault(course_groups[course], file_name)
+    courses["FILE_NAME"] = courses["CO_CURSO"].map(course_files).fillna(courses["CO_GRUPO"].map(group_files))
+    return courses.reset_index(drop=True)
+
+@instrumentation.instrumented(rows=len)
+def build_course_catalog(database: pd.DataFrame, ce_row_filter, ce_filter_key: str | None) -> pd.DataFrame:
+    """
+    Cadastro dos cursos com participantes (ver `build_course_table`), montado a partir da base de
+    cursos e de uma leitura apenas das colunas de presença do cache colunar do CE, sem depender
+    da carga (e da decodificação) dos resultados do CE.
+    """
+    raw_data = read_microdata(
+        config.ENADE_2023_CE_URL, "microdados2023_arq3.txt", config.CE_COLUMNS,
+        row_filter=ce_row_filter, filter_key=ce_filter_key,
+        select=["CO_CURSO", "TP_PRES", "TP_PR_GER", "DS_VT_ESC_OCE"]
+    )
     raw_data = raw_data.merge(
         database[['CO_CURSO', 'CO_IES', 'CO_GRUPO', 'NOME_CURSO', 'NOME_MUNIC_CURSO']], on='CO_CURSO', how='left'
     )
-    merged_selected_data = raw_data.merge(
-        cpc2023[['CO_CURSO', 'CO_CATEGAD', 'CO_ORGACAD']], on='CO_CURSO', how='left'
+    # Cursos da IES de referência na ordem dos microdados (inclusive sem participantes presentes)
+    cod_curso_list = raw_data.loc[raw_data.CO_IES == config.UFPA_CODE, "CO_CURSO"].unique()
+    return build_course_table(filter_courses_results(raw_data), cod_curso_list)
+
+@instrumentation.instrumented(rows=len)
+def build_ce_data(database: pd.DataFrame, cpc2023: pd.DataFrame, ce_row_filter, ce_filter_key: str | None) -> pd.DataFrame:
+    """
+    Resultados do Componente Específico dos cursos de todos os grupos, com o gabarito decodificado,
+    ordenados (de forma estável) por CO_GRUPO para que cada grupo seja um intervalo contíguo de linhas.
+    """
+    raw_data = read_microdata(
+        config.ENADE_2023_CE_URL, "microdados2023_arq3.txt", config.CE_COLUMNS,
+        row_filter=ce_row_filter, filter_key=ce_filter_key
     )
 
-    UFPA_raw_data = merged_selected_data[merged_selected_data.CO_IES == config.UFPA_CODE]
-    cod_grupo_list = UFPA_raw_data.CO_GRUPO.unique()
-    cod_curso_list = UFPA_raw_data.CO_CURSO.unique()
+    with instrumentation.stage("merge_ce_references", rows=len(raw_data)):
+        raw_data = raw_data.merge(
+            database[['CO_CURSO', 'CO_IES', 'CO_GRUPO', 'NOME_CURSO', 'NOME_MUNIC_CURSO']], on='CO_CURSO', how='left'
+        )
+        merged_selected_data = raw_data.merge(
+            cpc2023[['CO_CURSO', 'CO_CATEGAD', 'CO_ORGACAD']], on='CO_CURSO', how='left'
+        )
 
-    selected_data = filter_courses_results(merged_selected_data, cod_grupo_list)
-    Enade_2023 = reduce_data(selected_data)
+    selected_data = filter_courses_results(merged_selected_data)
+    selected_data = reduce_data(selected_data).sort_values("CO_GRUPO", kind="stable", ignore_index=True)
+    answers = decode_answer_keys(selected_data["DS_VT_ACE_OCE"])
+    # As strings e notas brutas só servem ao filtro e à decodificação: não seguem no conjunto compartilhado
+    Enade_2023 = _compact("Enade_2023", selected_data.drop(columns=LOAD_ONLY_COLUMNS, errors="ignore"))
+    Enade_2023 = pd.concat([
+        Enade_2023,
+        pd.DataFrame(answers, index=Enade_2023.index, columns=answer_columns(answers.shape[1]))
+    ], axis=1)
+    return Enade_2023
 
-    QE_data_2023 = raw_QE_data_2023.merge(
-        Enade_2023[['CO_CURSO', 'TP_PRES', 'TP_PR_GER']].drop_duplicates(), on='CO_CURSO', how='left'
-    )
+@st.cache_resource(max_entries=config.DATASET_GENERATIONS)
+@instrumentation.instrumented(rows=len, marks_miss=True)
+def load_ce_data(key: tuple) -> pd.DataFrame:
+    """
+    Resultados do CE de todos os grupos (ver `build_ce_data`). O DataFrame é um mapeamento somente
+    leitura do conjunto compartilhado, o mesmo objeto para todas as sessões.
+    Chave: (base_db, CPC, microdados do CE).
+    """
+    database, cpc2023 = load_reference_tables(key[:2])
+    ce_row_filter, ce_filter_key = make_ce_row_filter(database, config.UFPA_CODE)
+    url, columns = config.ENADE_2023_CE_URL, config.CE_COLUMNS
+
+    version = _dataset_version(url, columns, ce_filter_key, references=key[:2]) if config.SHARED_DATASETS else None
+    mapped = shared_data.map_frame("ce", version) if version else None
+    if mapped is not None:
+        Enade_2023 = mapped[0]
+    else:
+        Enade_2023 = build_ce_data(database, cpc2023, ce_row_filter, ce_filter_key)
+        version = _dataset_version(url, columns, ce_filter_key, check_fresh=False, references=key[:2])
+        if version:
+            # Nomes como categorias: o mapeamento em cada processo não recria um objeto por linha
+            Enade_2023 = Enade_2023.astype({col: "category" for col in config.CATEGORY_COLUMNS if col in Enade_2023.columns})
+            Enade_2023 = shared_data.share_frame("ce", version, Enade_2023)
+
+    # A versão dos dados compõe as chaves do cache de gráficos; a ordenação permite localizar
+    # cada grupo por busca binária (ver `analysis.get_group_rows`)
+    Enade_2023.attrs["data_version"] = get_data_version(get_dataset_sources()["ce"], key)
+    Enade_2023.attrs["sorted_by"] = "CO_GRUPO"
+    return Enade_2023
+
+@instrumentation.instrumented(rows=lambda histogram: len(histogram.courses))
+def build_qe_histogram() -> QEHistogram:
+    """
+    Respostas do Questionário do Estudante agregadas por curso × questão × alternativa, em uma
+    única passagem agrupada; os gráficos do QE consultam apenas este tensor.
+    """
+    QE_data_2023 = read_microdata(config.ENADE_2023_QE_URL, "microdados2023_arq4.txt", config.QE_COLUMNS)
+    QE_data_2023 = _compact("QE_data_2023", QE_data_2023)
     for col in QE_data_2023.columns:
         if QE_data_2023[col].dtype == 'float64':
             QE_data_2023[col] = QE_data_2023[col].fillna(0).astype(int)
+    return QEHistogram.from_frame(QE_data_2023, config.QE_QUESTIONS)
 
-    UFPA_data = Enade_2023[Enade_2023.CO_IES == config.UFPA_CODE]
+@st.cache_resource(max_entries=config.DATASET_GENERATIONS)
+@instrumentation.instrumented(rows=lambda histogram: len(histogram.courses), marks_miss=True)
+def load_qe_data(key: tuple) -> QEHistogram:
+    """Histogramas do QE (ver `build_qe_histogram`), mapeados do conjunto compartilhado quando disponível. Chave: (microdados do QE,)."""
+    url, columns = config.ENADE_2023_QE_URL, config.QE_COLUMNS
+    data_version = get_data_version([url], key)
+    version = _dataset_version(url, columns) if config.SHARED_DATASETS else None
+    arrays = shared_data.map_arrays("qe_histogram", version, ("courses", "counts")) if version else None
+    if arrays is None:
+        histogram = build_qe_histogram()
+        version = _dataset_version(url, columns, check_fresh=False)
+        if version:
+            arrays = shared_data.share_arrays("qe_histogram", version, courses=histogram.courses, counts=histogram.counts)
+        if arrays is None:
+            histogram.data_version = data_version
+            return histogram
+    return QEHistogram(arrays["courses"], config.QE_QUESTIONS, arrays["counts"], data_version)
 
-    COURSE_CODES = {}
-    questions_sub_file_name = [
-        'ENG_CIV','ENG_ELE','ARQ','ENG_COM', 'NUT', 'ENG_MEC', 'ENG_AMB','ENF', 
-        'ENG_COM', 'ENG_MEC','AGR', 'ENG_AMB', 'FAR', 'ENG_ALI', 'MED', 'ENG_FLO', 
-        'AGR', 'BIO', 'ENG_CIV', 'ENG_ELE', 'ENG_QUI', 'MED_VET', 'MED', 'ODO', 'FIS'
-    ]
-    
-    for curso, file_name in zip(cod_curso_list, questions_sub_file_name):
-        curso_info = UFPA_data.loc[UFPA_data['CO_CURSO'] == curso]
-        if not curso_info.empty:
-            COURSE_CODES[curso] = [
-                curso_info['CO_GRUPO'].iloc[0],
-                curso_info['NOME_CURSO'].iloc[0],
-                file_name,
-                curso_info['NOME_MUNIC_CURSO'].iloc[0]
-            ]
-    
+@st.cache_resource(max_entries=config.DATASET_GENERATIONS)
+@instrumentation.instrumented(rows=lambda benchmarks: len(benchmarks.groups), marks_miss=True)
+def load_qe_benchmarks(key: tuple) -> QEBenchmarks:
+    """
+    Médias de referência do QE por CO_GRUPO (todas as IES e IES públicas federais), agregadas
+    uma única vez a partir dos histogramas de todos os cursos do arquivo do QE.
+    Chave: (base_db, CPC, microdados do QE).
+    """
+    database, cpc2023 = load_reference_tables(key[:2])
+    course_info = database[['CO_CURSO', 'CO_GRUPO']].merge(
+        cpc2023[['CO_CURSO', 'CO_CATEGAD', 'CO_ORGACAD']], on='CO_CURSO', how='left'
+    )
+    benchmarks = QEBenchmarks.from_histogram(load_qe_data(key[2:]), course_info)
+    benchmarks.data_version = get_data_version(get_dataset_sources()["qe_benchmarks"], key)
+    return benchmarks
+
+@st.cache_resource(max_entries=config.DATASET_GENERATIONS)
+@instrumentation.instrumented(rows=lambda catalog: len(catalog.courses), marks_miss=True)
+def load_course_catalog(key: tuple) -> CourseCatalog:
+    """
+    Cadastro dos cursos de todas as IES indexado por CO_IES: os cursos e o COURSE_CODES (grupo,
+    nome, arquivo de temas, município) de cada instituição são obtidos com `get_institution`.
+    Independe da carga dos resultados do CE (ver `build_course_catalog`). Chave: a mesma de `load_ce_data`.
+    """
+    database, _ = load_reference_tables(key[:2])
+    ce_row_filter, ce_filter_key = make_ce_row_filter(database, config.UFPA_CODE)
+    url, columns = config.ENADE_2023_CE_URL, config.CE_COLUMNS
+
+    version = _dataset_version(url, columns, ce_filter_key, references=key[:2]) if config.SHARED_DATASETS else None
+    mapped = shared_data.map_frame("catalog", version) if version else None
+    if mapped is not None:
+        return CourseCatalog(mapped[0])
+    courses = build_course_catalog(database, ce_row_filter, ce_filter_key)
+    version = _dataset_version(url, columns, ce_filter_key, check_fresh=False, references=key[:2])
+    if version:
+        courses = shared_data.share_frame("catalog", version, courses)
+    return CourseCatalog(courses)
+
+@st.cache_resource(max_entries=config.GROUP_HITS_CACHE_ENTRIES, show_spinner=False)
+@instrumentation.instrumented(rows=len, marks_miss=True)
+def load_group_hits(_Enade_2023, data_version: str, group_code: int) -> pd.DataFrame:
+    """
+    Tabela de acertos por curso de um grupo (a agregação nacional do grupo), calculada na
+    primeira consulta e compartilhada (somente leitura) entre sessões e instituições.
+    """
+    return get_group_course_hits(_Enade_2023, group_code)
+
+@st.cache_resource(max_entries=config.DATASET_GENERATIONS)
+@instrumentation.instrumented(rows=len, marks_miss=True)
+def load_hei_dict(key: tuple) -> dict:
+    """Dicionário código -> nome das IES. Chave: (hei,)."""
     # --- LÓGICA ORIGINAL RESTAURADA ---
     # Este bloco é idêntico ao seu script original.
     # Ele lê o CSV sem cabeçalho e converte os valores diretamente para um dicionário.
-    hei_df = pd.read_csv(config.HEI_CODES_URL, sep=",", header=None)
+    hei_df = pd.read_csv(fetch_source(config.HEI_CODES_URL)[0], sep=",", header=None)
     hei_dict = dict(hei_df.values)
     # --- FIM DA LÓGICA ORIGINAL ---
+    return hei_dict
+
+def _microdata_columns() -> dict:
+    """URL -> colunas usadas de cada arquivo de microdados."""
+    return {config.ENADE_2023_CE_URL: config.CE_COLUMNS, config.ENADE_2023_QE_URL: config.QE_COLUMNS}
+
+@instrumentation.instrumented(rows=len)
+def prefetch_sources(urls=None) -> dict:
+    """
+    Baixa concorrentemente as origens `urls` (por padrão, todas) que a carga vai usar: as tabelas
+    de referência e os microdados cujo cache colunar não está atualizado. Falhas ficam registradas
+    no relatório de downloads e voltam a ocorrer (e são exibidas) na carga do conjunto que depende da origem.
+    """
+    microdata_columns = _microdata_columns()
+    wanted, urls = urls or get_source_urls(), []
+    for url in wanted:
+        if url in microdata_columns:
+            metadata = _read_cache_metadata(url)
+            if _is_cache_fresh(metadata, url, microdata_columns[url], metadata.get("filter") if metadata else None,
+                               check_remote=config.CACHE_CHECK_REMOTE):
+                continue
+        urls.append(url)
+    report = downloads.download_all(urls)
+    for url, info in report.items():
+        _record_source(url, info)
+    return report
+
+# --- Versão das Origens em Uso ---
+
+# Impressões digitais das origens dos conjuntos em uso (URL -> SHA-256), substituídas de uma só vez
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+def get_source_snapshot(names=None) -> dict:
+    """
+    Impressões digitais das origens em uso por este processo, lidas das cópias locais (registro
+    de origens e cache colunar) sem consultar as origens. Apenas as origens dos conjuntos `names`
+    (por padrão, todos) ainda sem cópia local são baixadas, concorrentemente; as dos demais
+    conjuntos ficam para quando forem pedidos. A revalidação das origens cabe a `refresh_data`.
+    """
+    global _snapshot
+    sources = get_dataset_sources()
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = {url: _source_fingerprint(url) for url in get_source_urls()}
+        missing = list(dict.fromkeys(
+            url for name in (sources if names is None else names) for url in sources[name] if _snapshot[url] is None
+        ))
+        if missing:
+            prefetch_sources(missing)
+            _snapshot = {**_snapshot, **{url: _source_fingerprint(url) for url in missing}}
+        return _snapshot
+
+def dataset_key(name: str, snapshot: dict | None = None) -> tuple:
+    """Chave do conjunto `name` na versão `snapshot` (por padrão, a em uso): impressões digitais das suas origens."""
+    snapshot = snapshot or get_source_snapshot((name,))
+    return tuple(snapshot.get(url) for url in get_dataset_sources()[name])
+
+def _load_dataset(name: str, loader, snapshot: dict | None = None):
+    """Obtém o conjunto `name` do seu carregador, medindo a obtenção (acerto ou falha do cache) quando instrumentado."""
+    with instrumentation.stage(f"dataset.{name}", cached=True):
+        return loader(dataset_key(name, snapshot))
+
+# Conjuntos de dados carregados sob demanda (cada um com seu próprio cache), na versão `snapshot`
+DATASETS = {
+    "ce": lambda snapshot=None: _load_dataset("ce", load_ce_data, snapshot),
+    "qe": lambda snapshot=None: _load_dataset("qe", load_qe_data, snapshot),
+    "qe_benchmarks": lambda snapshot=None: _load_dataset("qe_benchmarks", load_qe_benchmarks, snapshot),
+    "catalog": lambda snapshot=None: _load_dataset("catalog", load_course_catalog, snapshot),
+    "hei": lambda snapshot=None: _load_dataset("hei", load_hei_dict, snapshot),
+}
+
+def _revalidate_sources(urls) -> None:
+    """
+    Consulta as origens e baixa as que mudaram, registrando as novas impressões digitais. Os
+    microdados só são baixados se o ETag/tamanho da origem diferir do cache colunar; se o
+    conteúdo de fato mudou, o cache colunar é invalidado para o próximo parse.
+    """
+    microdata_columns = _microdata_columns()
+    stale = []
+    for url in urls:
+        metadata = _read_cache_metadata(url) if url in microdata_columns else None
+        if metadata:
+            remote = _remote_fingerprint(url)
+            if remote and all(not remote[field] or remote[field] == metadata.get(field) for field in ("etag", "content_length")):
+                continue
+        stale.append(url)
+
+    for url, info in downloads.download_all(stale, max_age=0).items():
+        _record_source(url, info)
+        metadata = _read_cache_metadata(url) if url in microdata_columns and info["status"] != "error" else None
+        if not metadata:
+            continue
+        if metadata.get("sha256") != info["sha256"]:
+            _cache_paths(url)[1].unlink(missing_ok=True)  # Novo conteúdo: refaz o parse na reconstrução
+        else:
+            # Mesmo conteúdo republicado: atualiza ETag/tamanho para não baixá-lo de novo
+            metadata.update({field: info.get(field) for field in downloads.FINGERPRINT_FIELDS})
+            _cache_paths(url)[1].write_text(json.dumps(metadata, indent=2))
+            release_archive(url)
+
+@instrumentation.instrumented()
+def refresh_data() -> dict:
+    """
+    Atualização incremental: revalida as origens já obtidas, reconstrói (ainda sem publicá-los) apenas
+    os conjuntos que dependem das origens alteradas e então troca a versão em uso de uma só vez.
+    As sessões em andamento terminam com os conjuntos anteriores; as execuções seguintes já usam
+    os novos. Retorna conjunto reconstruído -> origens alteradas (vazio se nada mudou).
+    """
+    global _snapshot
+    with _refresh_lock:
+        current = get_source_snapshot(())
+        _revalidate_sources([url for url, fingerprint in current.items() if fingerprint])
+        snapshot = {url: _source_fingerprint(url) for url in current}
+        changed = {url for url in current if snapshot[url] != current[url]}
+        rebuilt = {
+            name: [url for url in sources if url in changed]
+            for name, sources in get_dataset_sources().items()
+            if changed.intersection(sources) and all(snapshot[url] for url in sources)
+        }
+        for name in rebuilt:
+            DATASETS[name](snapshot)  # Falhas interrompem a atualização e mantêm a versão em uso
+        with _snapshot_lock:
+            _snapshot = snapshot
+        return rebuilt
+
+def clear_datasets() -> None:
+    """Descarta os conjuntos carregados por este processo e a versão das origens em uso: a próxima carga refaz tudo."""
+    global _snapshot
+    for loader in (load_reference_tables, load_ce_data, load_qe_data, load_qe_benchmarks, load_course_catalog,
+                   load_group_hits, load_hei_dict):
+        loader.clear()
+    with _snapshot_lock:
+        _snapshot = None
+    _download_report.clear()
+
+_warm_up_lock = threading.Lock()
+_warm_up_started = False
+
+def warm_up(names=tuple(DATASETS)) -> bool:
+    """
+    Inicia (uma vez por processo) o carregamento em segundo plano dos conjuntos de dados,
+    para que as páginas seguintes já os encontrem em cache, e, se REFRESH_INTERVAL estiver
+    definido, a atualização incremental periódica. Retorna True se iniciou agora.
+    """
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return False
+        _warm_up_started = True
+
+    def run():
+        for name in names:
+            try:
+                DATASETS[name]()
+            except Exception:
+                pass  # Falhas voltam a ocorrer (e são exibidas) quando a página pede o conjunto
+        while config.REFRESH_INTERVAL:
+            time.sleep(config.REFRESH_INTERVAL)
+            try:
+                refresh_data()
+            except Exception:
+                pass  # Origem indisponível ou reconstrução com erro: segue com a versão em uso
+    threading.Thread(target=run, name="enade-warm-up", daemon=True).start()
+    return True
+
+def load_data(ies_code: int | None = None):
+    """
+    Carrega todos os conjuntos de dados (cada um com seu próprio cache), após baixar
+    concorrentemente as origens necessárias, com os cursos e o COURSE_CODES da instituição
+    `ies_code` (por padrão, config.DEFAULT_IES_CODE). As respostas do QE são devolvidas já
+    agregadas em um QEHistogram.
+    """
+    snapshot = get_source_snapshot()
+    Enade_2023 = DATASETS["ce"](snapshot)
+    QE_histogram = DATASETS["qe"](snapshot)
+    ies_courses, COURSE_CODES = DATASETS["catalog"](snapshot).get_institution(ies_code or config.DEFAULT_IES_CODE)
+    return Enade_2023, QE_histogram, ies_courses, COURSE_CODES, DATASETS["hei"](snapshot)
 
-    return Enade_2023, QE_data_2023, UFPA_data, COURSE_CODES, hei_dict
\ No newline at end of file
+if __name__ == "__main__":
+    # Diagnóstico: carrega os dados e mostra o tempo de cada download, o tamanho de cada
+    # DataFrame antes/depois do esquema compacto e o tempo de cada etapa da carga
+    config.MEMORY_REPORT = True
+    instrumentation.enable()
+    load_data()
+    print(get_download_report().to_string(index=False))
+    print(get_memory_report().to_string(index=False))
+    print(instrumentation.summarize().to_string(index=False))
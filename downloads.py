@@ -0,0 +1,229 @@
+# downloads.py
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import config
+
+# Campos da impressão digital de uma origem, gravados nos metadados dos caches derivados
+FINGERPRINT_FIELDS = ("sha256", "etag", "content_length")
+
+class ChecksumError(OSError):
+    """O conteúdo baixado não confere com o tamanho anunciado ou com o SHA-256 esperado."""
+
+# Um lock por URL: downloads simultâneos da mesma origem aguardam o primeiro e reaproveitam a cópia
+_url_locks = {}
+_url_locks_lock = threading.Lock()
+
+def _url_lock(url: str) -> threading.Lock:
+    with _url_locks_lock:
+        return _url_locks.setdefault(url, threading.Lock())
+
+def local_paths(url: str, dest_dir=None) -> tuple:
+    """Retorna os caminhos (arquivo, parcial, metadados, metadados do parcial) da cópia local de uma URL."""
+    stem, _, suffix = Path(url).name.partition(".")
+    key = hashlib.sha256(url.encode()).hexdigest()[:16]
+    path = Path(dest_dir or config.DOWNLOAD_DIR) / f"{stem}-{key}.{suffix}"
+    part_path = path.with_name(path.name + ".part")
+    return path, part_path, path.with_name(path.name + ".json"), part_path.with_name(part_path.name + ".json")
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data, indent=2))
+    os.replace(tmp_path, path)
+
+def _hash_file(path: Path):
+    """SHA-256 parcial do conteúdo já gravado (para continuar o cálculo ao retomar um download)."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(config.DOWNLOAD_BLOCK_SIZE):
+            sha256.update(block)
+    return sha256
+
+def _content_total(response, offset: int) -> int | None:
+    """Tamanho total do arquivo segundo a resposta (Content-Range em 206, Content-Length em 200)."""
+    if response.status == 206:
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length and length.isdigit() else None
+
+def _transfer(url: str, paths: tuple, metadata: dict, expected_sha256: str | None) -> dict:
+    """
+    Uma tentativa de download em blocos para o arquivo parcial: retoma do ponto em que parou
+    (Range + If-Range com o validador da origem) ou, havendo cópia completa, revalida com
+    If-None-Match. Retorna os novos metadados, ou os atuais com status 'not_modified'.
+    """
+    path, part_path, meta_path, part_meta_path = paths
+    part_meta = _read_json(part_meta_path)
+    validator = part_meta.get("etag") or part_meta.get("last_modified")
+    offset = part_path.stat().st_size if part_path.exists() and part_meta.get("url") == url and validator else 0
+
+    headers = {}
+    if offset:
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+    elif metadata.get("etag"):
+        headers = {"If-None-Match": metadata["etag"]}
+    try:
+        response = urlopen(Request(url, headers=headers), timeout=config.DOWNLOAD_TIMEOUT)
+    except HTTPError as e:
+        if e.code == 304:
+            return {**metadata, "status": "not_modified", "bytes": 0}
+        if e.code == 416:  # Parcial inválido para a versão atual: recomeça do zero
+            part_path.unlink(missing_ok=True)
+            part_meta_path.unlink(missing_ok=True)
+        raise
+
+    with response:
+        if response.status != 206 or not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            offset = 0  # A origem ignorou o Range (ou a versão mudou): recomeça do zero
+        total = _content_total(response, offset)
+        part_meta = {
+            "url": url, "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"), "total": total,
+        }
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_json(part_meta_path, part_meta)
+        sha256 = _hash_file(part_path) if offset else hashlib.sha256()
+        received = 0
+        with open(part_path, "ab" if offset else "wb") as f:
+            while block := response.read(config.DOWNLOAD_BLOCK_SIZE):
+                sha256.update(block)
+                f.write(block)
+                received += len(block)
+
+    size = offset + received
+    if total is not None and size < total:
+        raise ConnectionError(f"Transferência interrompida em {size} de {total} bytes: {url}")
+    digest = sha256.hexdigest()
+    if (total is not None and size != total) or (expected_sha256 and digest != expected_sha256):
+        part_path.unlink(missing_ok=True)
+        part_meta_path.unlink(missing_ok=True)
+        message = f"Conteúdo de {url} não confere com o esperado (SHA-256 {digest}, {size} bytes)."
+        # Um parcial retomado pode estar corrompido: a nova tentativa baixa do zero
+        raise (ConnectionError if offset else ChecksumError)(message)
+
+    os.replace(part_path, path)
+    metadata = {
+        "url": url, "sha256": digest, "etag": part_meta["etag"], "last_modified": part_meta["last_modified"],
+        "content_length": str(size), "checked_at": time.time(),
+    }
+    _write_json(meta_path, metadata)
+    part_meta_path.unlink(missing_ok=True)
+    return {**metadata, "status": "resumed" if offset else "downloaded", "bytes": received}
+
+def _download(url: str, paths: tuple, metadata: dict, expected_sha256: str | None) -> dict:
+    """Executa `_transfer` com novas tentativas (retomando o parcial) em falhas de conexão e erros 5xx da origem."""
+    for attempt in range(config.DOWNLOAD_RETRIES + 1):
+        try:
+            return _transfer(url, paths, metadata, expected_sha256)
+        except ChecksumError:
+            raise
+        except HTTPError as e:
+            if (e.code < 500 and e.code not in (408, 416, 429)) or attempt == config.DOWNLOAD_RETRIES:
+                raise
+        except (OSError, HTTPException):
+            if attempt == config.DOWNLOAD_RETRIES:
+                raise
+        time.sleep(config.DOWNLOAD_RETRY_DELAY * (attempt + 1))
+
+def fetch(url: str, dest_dir=None, expected_sha256: str | None = None, max_age: float | None = None) -> tuple:
+    """
+    Obtém a cópia local de uma origem, baixando-a em blocos para o disco. Cópias verificadas há
+    menos de `max_age` segundos (ou qualquer cópia, no modo offline) são usadas sem consultar a
+    origem; se a origem estiver indisponível, a cópia local é usada mesmo vencida.
+    Retorna (caminho, informações do download: impressão digital, status, bytes e segundos).
+    """
+    expected_sha256 = expected_sha256 or config.SOURCE_SHA256.get(url)
+    max_age = config.DOWNLOAD_MAX_AGE if max_age is None else max_age
+    paths = local_paths(url, dest_dir)
+    path, _, meta_path, _ = paths
+    start = time.perf_counter()
+    with _url_lock(url):
+        metadata = _read_json(meta_path) if path.exists() else {}
+        complete = metadata.get("url") == url and bool(metadata.get("sha256"))
+        if complete and expected_sha256 and metadata["sha256"] != expected_sha256:
+            metadata, complete = {}, False
+
+        if complete and (config.OFFLINE_MODE or time.time() - metadata.get("checked_at", 0) < max_age):
+            info = {**metadata, "status": "cached", "bytes": 0}
+        elif config.OFFLINE_MODE:
+            raise FileNotFoundError(f"Modo offline: cópia local de '{url}' não encontrada.")
+        else:
+            try:
+                info = _download(url, paths, metadata if complete else {}, expected_sha256)
+            except (OSError, HTTPException):
+                if not complete:
+                    raise
+                info = {**metadata, "status": "stale", "bytes": 0}  # Origem indisponível: usa a cópia local
+            if info["status"] == "not_modified":
+                metadata["checked_at"] = time.time()
+                _write_json(meta_path, metadata)
+    info.update(path=str(path), seconds=round(time.perf_counter() - start, 3))
+    return path, info
+
+def discard(url: str, dest_dir=None) -> None:
+    """Remove a cópia local completa de uma origem (ex.: um ZIP já convertido em cache colunar)."""
+    path, _, meta_path, _ = local_paths(url, dest_dir)
+    with _url_lock(url):
+        path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+
+def download_all(urls, dest_dir=None, max_workers: int | None = None, max_age: float | None = None) -> dict:
+    """
+    Baixa concorrentemente (no máximo `max_workers` por vez) as origens informadas. Retorna
+    URL -> informações do download; falhas são registradas com status 'error' e não
+    interrompem os demais downloads.
+    """
+    urls = list(dict.fromkeys(urls))
+    report = {}
+    with ThreadPoolExecutor(max_workers=max_workers or config.DOWNLOAD_WORKERS, thread_name_prefix="download") as executor:
+        futures = {url: executor.submit(fetch, url, dest_dir, None, max_age) for url in urls}
+        for url, future in futures.items():
+            try:
+                report[url] = future.result()[1]
+            except (OSError, HTTPException) as e:
+                report[url] = {"url": url, "status": "error", "error": str(e)}
+    return report
+
+def format_report(report: dict) -> str:
+    """Tabela de texto com status, tamanho, tempo e vazão de cada origem."""
+    lines = [f"{'Origem':<32} {'Status':<13} {'MB':>9} {'Segundos':>9} {'MB/s':>8}"]
+    for url, info in report.items():
+        megabytes = info.get("bytes", 0) / 1e6
+        seconds = info.get("seconds") or 0
+        rate = f"{megabytes / seconds:8.1f}" if megabytes and seconds else f"{'-':>8}"
+        lines.append(f"{Path(url).name:<32} {info['status']:<13} {megabytes:9.1f} {seconds:9.2f} {rate}")
+        if info.get("error"):
+            lines.append(f"    {info['error']}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Baixa concorrentemente as origens de dados do ENADE para o diretório local.")
+    parser.add_argument("urls", nargs="*", help="URLs a baixar; padrão: todas as origens de config.SOURCE_URLS.")
+    parser.add_argument("--output", default=config.DOWNLOAD_DIR, help="Diretório das cópias locais.")
+    parser.add_argument("--workers", type=int, default=config.DOWNLOAD_WORKERS, help="Downloads simultâneos.")
+    parser.add_argument("--force", action="store_true", help="Revalida todas as cópias na origem, mesmo as recentes.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = download_all(args.urls or config.SOURCE_URLS, args.output, args.workers, 0 if args.force else None)
+    print(format_report(report))
+    print(f"Total: {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# instrumentation.py
+
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+import pandas as pd
+import config
+
+# Etapas medidas recentemente por este processo (exibidas no painel de diagnóstico)
+_records = deque(maxlen=config.INSTRUMENTATION_HISTORY)
+_records_lock = threading.Lock()
+_log_lock = threading.Lock()
+# Pilha de etapas abertas em cada thread (etapas aninhadas registram a etapa-mãe)
+_local = threading.local()
+
+def is_enabled() -> bool:
+    return config.INSTRUMENTATION
+
+def enable(memory: bool | None = None) -> None:
+    """Ativa a instrumentação em tempo de execução (e, se informado, a medição de memória)."""
+    config.INSTRUMENTATION = True
+    if memory is not None:
+        config.INSTRUMENTATION_MEMORY = memory
+
+def disable() -> None:
+    config.INSTRUMENTATION = False
+    if tracemalloc.is_tracing() and not getattr(_local, "stack", None):
+        tracemalloc.stop()
+
+def current_session_id() -> str | None:
+    """Sessão do Streamlit que executa a etapa (None em threads de segundo plano e fora do app)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx else None
+
+def _write_log(record: dict) -> None:
+    """Acrescenta a etapa, como uma linha JSON, ao arquivo lido pelo pipeline de logs."""
+    if not config.INSTRUMENTATION_LOG:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    path = Path(config.INSTRUMENTATION_LOG)
+    with _log_lock:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass  # O diagnóstico não deve interromper a aplicação
+
+@contextmanager
+def stage(name: str, rows: int | None = None, cached: bool = False, **fields):
+    """
+    Mede uma etapa: tempo de relógio, tempo de CPU da thread, pico de memória acima do início
+    da etapa (tracemalloc, se INSTRUMENTATION_MEMORY), linhas processadas e acerto/falha de
+    cache. Retorna o registro da etapa, no qual o código medido pode preencher 'rows', 'cache'
+    e outros campos. Com `cached`, a etapa conta como acerto até que `cache_miss` seja chamada
+    dentro dela. Sem instrumentação ativa, não mede nada.
+    """
+    record = {"stage": name, "rows": rows, "cache": "hit" if cached else None, **fields}
+    if not config.INSTRUMENTATION:
+        yield record
+        return
+
+    stack = _local.__dict__.setdefault("stack", [])
+    trace_memory = config.INSTRUMENTATION_MEMORY
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # O pico é global: é repassado às etapas abertas antes de ser zerado para esta
+        current, peak = tracemalloc.get_traced_memory()
+        for parent in stack:
+            parent["_peak"] = max(parent.get("_peak", 0), peak)
+        tracemalloc.reset_peak()
+        record["_start_memory"] = record["_peak"] = current
+
+    record.update(
+        parent=stack[-1]["stage"] if stack else None, depth=len(stack),
+        thread=threading.current_thread().name, session=current_session_id(), timestamp=time.time(),
+    )
+    stack.append(record)
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["wall_ms"] = round((time.perf_counter() - start_wall) * 1000, 3)
+        record["cpu_ms"] = round((time.thread_time() - start_cpu) * 1000, 3)
+        stack.pop()
+        peak, start_memory = record.pop("_peak", 0), record.pop("_start_memory", None)
+        if trace_memory and start_memory is not None and tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            record["peak_memory_mb"] = round((peak - start_memory) / 2**20, 3)
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1].get("_peak", 0), peak)
+        with _records_lock:
+            _records.append(record)
+        _write_log(record)
+
+def cache_miss() -> None:
+    """Marca como falha de cache a etapa aberta mais interna que mede um cache (ver `stage(cached=True)`)."""
+    for record in reversed(getattr(_local, "stack", [])):
+        if record.get("cache") is not None:
+            record["cache"] = "miss"
+            return
+
+def instrumented(name: str | None = None, rows=None, marks_miss: bool = False):
+    """
+    Decorador que mede cada chamada da função como uma etapa. `rows(resultado)` informa as
+    linhas processadas. Com `marks_miss`, a execução da função (o corpo de uma função com
+    cache) indica falha do cache medido pela etapa que a envolve.
+    """
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not config.INSTRUMENTATION:
+                return fn(*args, **kwargs)
+            if marks_miss:
+                cache_miss()
+            with stage(stage_name) as record:
+                result = fn(*args, **kwargs)
+                if rows is not None and result is not None:
+                    record["rows"] = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+def get_records() -> list:
+    """Etapas medidas recentemente, da mais antiga para a mais recente."""
+    with _records_lock:
+        return list(_records)
+
+def clear_records() -> None:
+    with _records_lock:
+        _records.clear()
+
+def records_to_jsonl(records) -> str:
+    """Etapas em JSON lines (uma por linha), no mesmo formato do arquivo INSTRUMENTATION_LOG."""
+    return "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+
+def summarize(records=None) -> pd.DataFrame:
+    """Resumo por etapa: chamadas, tempos total/médio/máximo, CPU, pico de memória, linhas e acertos/falhas de cache."""
+    columns = ["Etapa", "Chamadas", "Total (ms)", "Média (ms)", "Máximo (ms)", "CPU (ms)",
+               "Pico de memória (MB)", "Linhas", "Acertos", "Falhas"]
+    df = pd.DataFrame(get_records() if records is None else records)
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    for col in ("rows", "cache", "peak_memory_mb"):
+        if col not in df.columns:
+            df[col] = None
+    df["rows"] = pd.to_numeric(df["rows"])
+    df["peak_memory_mb"] = pd.to_numeric(df["peak_memory_mb"])
+    df["hit"] = df["cache"] == "hit"
+    df["miss"] = df["cache"] == "miss"
+    summary = df.groupby("stage", sort=False).agg(
+        calls=("wall_ms", "size"), total=("wall_ms", "sum"), mean=("wall_ms", "mean"), max=("wall_ms", "max"),
+        cpu=("cpu_ms", "sum"), peak=("peak_memory_mb", "max"), rows=("rows", lambda rows: rows.sum(min_count=1)), hits=("hit", "sum"),
+        misses=("miss", "sum"),
+    ).round(1).sort_values("total", ascending=False).reset_index()
+    summary.columns = columns
+    return summary
@@ -4,38 +4,94 @@ import streamlit as st
 import pandas as pd
 
 # ALTERAÇÃO: Importações corrigidas para a estrutura modular
-from analysis import plot_performance_graph, show_best_hei_ranking_table
+from analysis import (
+    build_ranking_table, build_subject_standings, get_performance_scores, get_source_version, label_institution_columns,
+    performance_graph_jobs
+)
+from data_loader import load_group_hits
+from questions_subjects import get_questions_subjects
+from render import render_charts
 from utils import atualiza_cursos
+from instrumentation import instrumented
+
+# Cada cálculo é memorizado pelas suas próprias entradas (a versão dos dados substitui o
+# DataFrame, que não é usado no hash): interações que não mudam as entradas não o refazem.
+# A tabela de acertos de cada grupo vem do cache por grupo de `data_loader.load_group_hits`.
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_cached_performance_scores(_Enade_2023, _group_hits, data_version: str, group_code: int, course_code: int, file_name: str):
+    """Percentuais por tema do curso e nacionais, a razão entre eles e seus intervalos de confiança."""
+    return get_performance_scores(_Enade_2023, get_questions_subjects(file_name), group_code, course_code, _group_hits)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_cached_ranking(_group_hits, _hei_dict, _merged_score_df, data_version: str, group_code: int, course_code: int,
+                       file_name: str, public_only: bool) -> pd.DataFrame:
+    """Ranking das IES por tema para o curso e o filtro de IES públicas, com a significância da razão do curso."""
+    return build_ranking_table(_group_hits, get_questions_subjects(file_name), _hei_dict, course_code, public_only, _merged_score_df)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_cached_standings(_group_hits, _hei_dict, data_version: str, group_code: int, course_code: int,
+                         file_name: str, public_only: bool, top_k: int) -> tuple:
+    """Posição e percentil do curso, quartis nacionais e os K melhores cursos por tema."""
+    return build_subject_standings(_group_hits, get_questions_subjects(file_name), _hei_dict, course_code, public_only, top_k)
+
+@st.fragment
+def show_ranking(group_hits, hei_dict, merged_score_df, data_version, group_code, course_code, file_name, ies_name):
+    """Tabela Ranking: o filtro de IES públicas e o K reexecutam apenas este fragmento. As colunas do curso levam o nome da IES."""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        public_only = st.checkbox(
+            "Apenas IES Públicas", value=True, key='public_only',
+            help="Filtra a tabela de ranking para comparar apenas com IES Públicas Federais."
+        )
+    with col2:
+        top_k = st.number_input("Melhores cursos por tema (K)", min_value=1, max_value=20, value=5, key='ranking_top_k')
+
+    ranking_df = get_cached_ranking(group_hits, hei_dict, merged_score_df, data_version, group_code, course_code, file_name, public_only)
+    st.dataframe(label_institution_columns(ranking_df, ies_name), use_container_width=True)
+    st.caption(
+        "Diferença para o Brasil: significativa quando o intervalo de confiança bootstrap da razão "
+        "(reamostragem dos participantes do curso) não contém 1,0."
+    )
+
+    standings_df, top_df = get_cached_standings(
+        group_hits, hei_dict, data_version, group_code, course_code, file_name, public_only, int(top_k)
+    )
+    st.markdown(f"**Posição do curso ({ies_name}) por tema** (posição 1 = melhor percentual; percentil = cursos com percentual igual ou inferior)")
+    st.dataframe(label_institution_columns(standings_df, ies_name), use_container_width=True, hide_index=True)
+    with st.expander(f"{int(top_k)} melhores cursos por tema"):
+        st.dataframe(top_df, use_container_width=True, hide_index=True)
 
 # ALTERAÇÃO: A função agora recebe os dados do app.py
-def show_page(Enade_2023, UFPA_data, COURSE_CODES, hei_dict):
+@instrumented("page.conhecimento_especifico")
+def show_page(Enade_2023, ies_courses, COURSE_CODES, hei_dict, ies_name):
 
     # Mantida a sua excelente estrutura de container e texto
     with st.container():
-        st.markdown("""
+        st.markdown(f"""
         <div class="text-container">
             <h1>Conhecimento Específico ENADE 2023</h1>
-            <p>A análise gráfica fornece informações valiosas a respeito do desempenho dos alunos nas temáticas avaliadas na prova, uma vez que possibilita averiguar se as estratégias pedagógicas aplicadas nas disciplinas ministradas estão produzindo os resultados almejados. São apresentados dois gráficos que exibem a comparação entre o desempenho do curso de graduação da UFPA e o desempenho nacional, calculado a partir do mesmo curso ofertado por todas as IES no país que participam do exame.</p>
-            <p>O Gráfico da Razão do Percentual de Acerto exibe o desempenho do curso da UFPA em comparação com a média nacional, por tema avaliado no ENADE 2023. A interpretação do gráfico da razão é a seguinte: Razão > 1,0: a UFPA apresentou desempenho superior à média nacional; Razão < 1,0: a UFPA obteve desempenho inferior à média nacional; Razão = 1,0: o desempenho da UFPA foi equivalente à média nacional.</p>
-            <p>O Gráfico de Percentual de Acerto por Tema apresenta a comparação entre o percentual de acertos do curso da UFPA e o percentual médio nacional, para cada temática do componente específico da prova.</p>
-            <p>Na Tabela Ranking é apresentada a instituição com melhor percentual de desempenho, por temática do exame, em comparação com o desempenho do curso da UFPA.</p>
+            <p>A análise gráfica fornece informações valiosas a respeito do desempenho dos alunos nas temáticas avaliadas na prova, uma vez que possibilita averiguar se as estratégias pedagógicas aplicadas nas disciplinas ministradas estão produzindo os resultados almejados. São apresentados dois gráficos que exibem a comparação entre o desempenho do curso de graduação da instituição selecionada ({ies_name}) e o desempenho nacional, calculado a partir do mesmo curso ofertado por todas as IES no país que participam do exame.</p>
+            <p>O Gráfico da Razão do Percentual de Acerto exibe o desempenho do curso em comparação com a média nacional, por tema avaliado no ENADE 2023. A interpretação do gráfico da razão é a seguinte: Razão > 1,0: o curso apresentou desempenho superior à média nacional; Razão < 1,0: o curso obteve desempenho inferior à média nacional; Razão = 1,0: o desempenho do curso foi equivalente à média nacional. As barras de erro mostram o intervalo de confiança de 95% da razão, obtido por reamostragem (bootstrap) dos participantes do curso; em turmas pequenas o intervalo é largo, e temas cujo intervalo contém 1,0 (em cinza) não diferem significativamente da média nacional.</p>
+            <p>O Gráfico de Percentual de Acerto por Tema apresenta a comparação entre o percentual de acertos do curso e o percentual médio nacional, para cada temática do componente específico da prova.</p>
+            <p>Na Tabela Ranking é apresentada a instituição com melhor percentual de desempenho, por temática do exame, em comparação com o desempenho do curso.</p>
         </div>
         """, unsafe_allow_html=True)
 
-        municipios = sorted(UFPA_data['NOME_MUNIC_CURSO'].unique().tolist())
+        municipios = sorted(ies_courses['NOME_MUNIC_CURSO'].unique().tolist())
         
         # Mantida a sua ótima lógica de filtros reativos com session_state
         if 'municipio_op' not in st.session_state or st.session_state['municipio_op'] not in municipios:
             st.session_state['municipio_op'] = municipios[0]
 
-        cursos_disponiveis = atualiza_cursos(UFPA_data, st.session_state['municipio_op'])
+        cursos_disponiveis = atualiza_cursos(ies_courses, st.session_state['municipio_op'])
         if 'curso_op' not in st.session_state or st.session_state['curso_op'] not in cursos_disponiveis:
             st.session_state['curso_op'] = cursos_disponiveis[0]
 
         def atualizar_curso_selecionado():
-            st.session_state['curso_op'] = atualiza_cursos(UFPA_data, st.session_state['municipio_op'])[0]
+            st.session_state['curso_op'] = atualiza_cursos(ies_courses, st.session_state['municipio_op'])[0]
         
-        col1, col2, col3 = st.columns([2, 2, 1])
+        col1, col2 = st.columns(2)
         
         with col1:
             st.selectbox(
@@ -48,14 +104,9 @@ def show_page(Enade_2023, UFPA_data, COURSE_CODES, hei_dict):
         with col2:
             st.selectbox(
                 'Selecione o Curso',
-                atualiza_cursos(UFPA_data, st.session_state['municipio_op']),
+                atualiza_cursos(ies_courses, st.session_state['municipio_op']),
                 key='curso_op'
             )
-        
-        with col3:
-            st.write("") # Espaçamento
-            st.write("") # Espaçamento
-            public_only = st.checkbox("Apenas IES Públicas", value=True, help="Filtra a tabela de ranking para comparar apenas com IES Públicas Federais.")
 
 
         # A análise agora é reativa, sem necessidade de botão "Gerar"
@@ -71,33 +122,39 @@ def show_page(Enade_2023, UFPA_data, COURSE_CODES, hei_dict):
                 group_code = details[0] # details[0] é CO_GRUPO
                 break
         
-        if course_code and group_code:
+        if course_code and group_code and COURSE_CODES[course_code][2] is None:
+            st.warning("Ainda não há arquivo de temas para a área deste curso: a análise por tema não está disponível.")
+        elif course_code and group_code:
             with st.spinner("Gerando análises..."):
-                # ALTERAÇÃO: Chamada de função atualizada com os argumentos corretos
-                fig1, fig1_img, fig2, fig2_img = plot_performance_graph(
-                    Enade_2023, COURSE_CODES, group_code, course_code
+                # Agregação do grupo e percentuais memorizados; os gráficos vêm do cache de gráficos
+                # (ou são renderizados em paralelo no pool de processos)
+                data_version = get_source_version(Enade_2023)
+                file_name = COURSE_CODES[course_code][2]
+                group_hits = load_group_hits(Enade_2023, data_version, group_code)
+                merged_score_df = get_cached_performance_scores(Enade_2023, group_hits, data_version, group_code, course_code, file_name)
+
+                ratio_job, percent_job = performance_graph_jobs(
+                    Enade_2023, COURSE_CODES, group_code, course_code, group_hits, merged_score_df, ies_name
                 )
+                charts = render_charts({"razao": ratio_job, "percent": percent_job})
+                fig1_img, fig2_img = charts["razao"], charts["percent"]
                 
-                # Salva os caminhos das imagens para o PDF
+                # Salva as imagens (PNG) para o PDF
                 st.session_state['razao_chart'] = fig1_img
                 st.session_state['percent_chart'] = fig2_img
 
                 with tab1:
-                    if fig1:
-                        st.pyplot(fig1)
+                    if fig1_img:
+                        st.image(fig1_img, use_container_width=True)
                     else:
                         st.warning("Não foi possível gerar o gráfico de razão para este curso.")
                 with tab2:
-                    if fig2:
-                        st.pyplot(fig2)
+                    if fig2_img:
+                        st.image(fig2_img, use_container_width=True)
                     else:
                         st.warning("Não foi possível gerar o gráfico de percentual para este curso.")
 
                 with tab3:
-                    # ALTERAÇÃO: Chamada de função atualizada com os argumentos corretos
-                    ranking_df = show_best_hei_ranking_table(
-                        Enade_2023, COURSE_CODES, hei_dict, group_code, course_code, public_only
-                    )
-                    st.dataframe(ranking_df, use_container_width=True)
+                    show_ranking(group_hits, hei_dict, merged_score_df, data_version, group_code, course_code, file_name, ies_name)
         else:
             st.warning("Não foi possível encontrar os detalhes para o curso selecionado. Verifique os dados.")
\ No newline at end of file
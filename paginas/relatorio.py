@@ -1,12 +1,43 @@
 # paginas/relatorio.py (ATUALIZADO)
 
 import streamlit as st
-import os
+import config
 
 # ALTERAÇÃO: Importação corrigida para a estrutura modular
-from pdf_generator import generate_pdf
+from pdf_generator import REQUIRED_CHARTS
+from report_jobs import report_jobs
+from instrumentation import instrumented
 
-def show_page():
+def show_report_status(key: str, file_name: str):
+    """Mostra o andamento da montagem do relatório (consultado periodicamente) ou o botão de download."""
+    pdf_bytes = report_jobs.get_result(key)
+    job = report_jobs.get_job(key)
+    if pdf_bytes is not None:
+        for warning in job.warnings if job else []:
+            st.warning(warning)
+        st.download_button(
+            label="Clique aqui para Baixar o PDF",
+            data=pdf_bytes,
+            file_name=file_name,
+            mime="application/pdf"
+        )
+    elif job is None:
+        return
+    elif job.status == "error":
+        st.error(f"Ocorreu um erro ao gerar o arquivo PDF ({job.error}). Tente gerar as análises novamente.")
+    elif job.status == "done":
+        st.info("O relatório foi descartado do cache. Gere-o novamente.")
+    else:
+        st.progress(job.progress, text=job.step)
+        return
+
+    # Montagem encerrada: interrompe a consulta periódica do fragmento
+    if st.session_state.get('report_polling') == key:
+        del st.session_state['report_polling']
+        st.rerun()
+
+@instrumented("page.relatorio")
+def show_page(data_version: str | None = None):
     st.title("📥 Baixar Relatório Completo")
     st.markdown("---")
 
@@ -26,24 +57,18 @@ def show_page():
         st.success(f"Todos os dados para o relatório de **{curso} - {municipio}** estão prontos!")
         st.write("Clique no botão abaixo para gerar e baixar o seu relatório em PDF.")
 
-        # MELHORIA: Adicionado um botão explícito para o usuário iniciar a geração do PDF.
-        if st.button("Gerar Relatório em PDF"):
-            # MELHORIA: Adicionado st.spinner para feedback ao usuário durante a geração.
-            with st.spinner("Montando o relatório... Por favor, aguarde."):
-                pdf_path = generate_pdf()
-            
-            if pdf_path and os.path.exists(pdf_path):
-                with open(pdf_path, "rb") as f:
-                    pdf_bytes = f.read()
-                
-                st.download_button(
-                    label="Clique aqui para Baixar o PDF",
-                    data=pdf_bytes,
-                    file_name=f"Relatorio_Enade_2023_{curso}_{municipio}.pdf",
-                    mime="application/pdf"
-                )
-            else:
-                st.error("Ocorreu um erro ao gerar o arquivo PDF. Tente gerar as análises novamente.")
+        # O relatório é montado em segundo plano; PDFs prontos são compartilhados entre as sessões
+        charts = {name: st.session_state[name] for name in REQUIRED_CHARTS}
+        key = report_jobs.make_key(curso, municipio, charts, data_version)
+        file_name = f"Relatorio_Enade_2023_{curso}_{municipio}.pdf"
+        if report_jobs.get_result(key) is None and st.button("Gerar Relatório em PDF"):
+            report_jobs.submit(key, charts, curso, municipio)
+
+        job = report_jobs.get_job(key)
+        pending = job is not None and job.status in ("queued", "running")
+        if pending:
+            st.session_state['report_polling'] = key
+        st.fragment(run_every=config.REPORT_POLL_INTERVAL if pending else None)(show_report_status)(key, file_name)
 
     else:
         st.warning(
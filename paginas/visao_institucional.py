@@ -0,0 +1,55 @@
+# paginas/visao_institucional.py
+
+import streamlit as st
+from analysis import (
+    get_institution_scores, get_source_version, get_weakest_subjects, institution_heatmap_job, label_institution_columns
+)
+from data_loader import load_group_hits
+from render import render_charts
+from instrumentation import instrumented
+
+@st.cache_data(show_spinner=False)
+def get_cached_institution_scores(_Enade_2023, _COURSE_CODES, data_version: str, course_codes: tuple):
+    """
+    Percentuais e razões de todos os cursos da instituição, calculados uma vez por versão dos dados;
+    a agregação nacional de cada grupo vem do cache por grupo, compartilhado entre as instituições.
+    """
+    return get_institution_scores(
+        _Enade_2023, _COURSE_CODES, lambda group_code: load_group_hits(_Enade_2023, data_version, group_code)
+    )
+
+@st.fragment
+def show_weakest_subjects(institution_scores, ies_name):
+    """Resumo dos temas mais fracos: alterar o número de temas reexecuta apenas este fragmento."""
+    per_course = st.number_input("Temas por curso", min_value=1, max_value=20, value=3, key='weakest_per_course')
+    st.dataframe(
+        label_institution_columns(get_weakest_subjects(institution_scores, int(per_course)), ies_name),
+        use_container_width=True, hide_index=True
+    )
+
+@instrumented("page.visao_institucional")
+def show_page(Enade_2023, COURSE_CODES, ies_name):
+
+    with st.container():
+        st.markdown(f"""
+        <div class="text-container">
+            <h1>Visão Institucional ENADE 2023</h1>
+            <p>O mapa de calor apresenta, para todos os cursos da instituição selecionada ({ies_name}) de uma só vez, a razão entre o percentual de acerto do curso e o percentual nacional em cada tema do Componente Específico. Tons de verde indicam desempenho superior à média nacional (Razão > 1,0) e tons de vermelho, desempenho inferior (Razão < 1,0). Células vazias correspondem a temas que não fazem parte da prova do curso.</p>
+            <p>A tabela de Temas mais Fracos lista, para cada curso, os temas com as menores razões. Clique no cabeçalho de uma coluna para reordenar a tabela.</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        with st.spinner("Gerando a visão institucional..."):
+            institution_scores = get_cached_institution_scores(
+                Enade_2023, COURSE_CODES, get_source_version(Enade_2023), tuple(int(code) for code in COURSE_CODES)
+            )
+            charts = render_charts({"heatmap": institution_heatmap_job(Enade_2023, institution_scores, ies_name)})
+
+        tab1, tab2 = st.tabs(["Mapa de Calor", "Temas mais Fracos"])
+        with tab1:
+            if charts["heatmap"]:
+                st.image(charts["heatmap"], use_container_width=True)
+            else:
+                st.warning("Não há dados para gerar o mapa de calor.")
+        with tab2:
+            show_weakest_subjects(institution_scores, ies_name)
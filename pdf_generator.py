@@ -1,23 +1,51 @@
 # pdf_generator.py
 
-import streamlit as st
-import tempfile
+import threading
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
 from fpdf import FPDF
 from PyPDF2 import PdfReader, PdfWriter
+import instrumentation
 
-def generate_pdf():
-    """Gera o relatório completo em PDF a partir dos gráficos no st.session_state."""
-    
-    # Verifica se os gráficos necessários estão na sessão
-    required_charts = [
-        'odp_img_av', 'infra_img_av', 'oaf_img_av',
-        'odp_img_co', 'infra_img_co', 'oaf_img_co',
-        'razao_chart', 'percent_chart'
-    ]
-    if not all(key in st.session_state for key in required_charts):
-        st.error("Gere todos os gráficos nas páginas de análise antes de baixar o relatório.")
-        return None
+BASE_DIR = Path(__file__).parent
+COVER_PATH = BASE_DIR / "src/file/capa_relatorio.pdf"
+ANNEX_PATH = BASE_DIR / "anexo_qe_2023.pdf"
+
+# Gráficos (PNG) que compõem o relatório
+REQUIRED_CHARTS = [
+    'odp_img_av', 'infra_img_av', 'oaf_img_av',
+    'odp_img_co', 'infra_img_co', 'oaf_img_co',
+    'razao_chart', 'percent_chart'
+]
+
+# As páginas dos modelos são compartilhadas entre os relatórios: a cópia para um novo PDF
+# lê o arquivo de origem e não pode ocorrer em paralelo
+_templates_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+@instrumentation.instrumented("read_templates", marks_miss=True)
+def load_templates() -> tuple:
+    """
+    Lê e interpreta a capa e o anexo do relatório uma única vez por processo, mantendo as
+    páginas prontas para reuso em todos os relatórios.
+    """
+    cover = PdfReader(BytesIO(COVER_PATH.read_bytes()))
+    annex = PdfReader(BytesIO(ANNEX_PATH.read_bytes()))
+    return list(cover.pages), list(annex.pages)
+
+@instrumentation.instrumented()
+def build_report_pdf(charts: dict, curso_nome: str, municipio_nome: str, on_warning=None, on_progress=None) -> bytes:
+    """
+    Monta o relatório em PDF a partir dos gráficos em `charts` (nome -> PNG), sem depender de
+    uma sessão do Streamlit, e retorna o conteúdo do arquivo. `on_progress(fração, etapa)`,
+    se informado, recebe o andamento da montagem.
+    """
+    def progress(fraction, step):
+        if on_progress:
+            on_progress(fraction, step)
 
+    progress(0.0, "Montando as páginas do relatório")
     pdf = FPDF(orientation='P', unit='mm', format='A4')
     pdf.set_auto_page_break(auto=True, margin=15)
     
@@ -26,8 +54,6 @@ def generate_pdf():
     pdf.set_y(100)
     pdf.set_font("Times", "B", 22)
     pdf.cell(0, 10, "Relatório de Análise dos Microdados ENADE 2023", ln=True, align='C')
-    curso_nome = st.session_state.get('curso_op', 'Curso não selecionado')
-    municipio_nome = st.session_state.get('municipio_op', '')
     pdf.set_font("Times", "B", 18)
     pdf.cell(0, 15, f"{curso_nome} - {municipio_nome}", ln=True, align='C')
    
@@ -43,11 +69,12 @@ def generate_pdf():
     pdf.set_font("Times", "B", 16)
     pdf.cell(0, 10, "Análise do Componente Específico", ln=True)
     pdf.ln(10)
-    pdf.image(st.session_state['razao_chart'], x=20, w=170)
+    pdf.image(BytesIO(charts['razao_chart']), x=20, w=170)
     pdf.ln(2)
-    pdf.image(st.session_state['percent_chart'], x=20, w=170)
+    pdf.image(BytesIO(charts['percent_chart']), x=20, w=170)
 
     # Página - Análise Questionário do Estudante
+    progress(0.3, "Adicionando os gráficos do Questionário do Estudante")
     pdf.add_page()
     pdf.set_font("Times", "B", 16)
     pdf.cell(0, 10, "Análise do Questionário do Estudante", ln=True)
@@ -56,54 +83,45 @@ def generate_pdf():
     # ODP
     pdf.set_font("Times", "B", 14)
     pdf.cell(0, 8, "Organização Didático-Pedagógica", ln=True)
-    pdf.image(st.session_state['odp_img_av'], x=30, w=150)
-    pdf.image(st.session_state['odp_img_co'], x=30, w=150)
+    pdf.image(BytesIO(charts['odp_img_av']), x=30, w=150)
+    pdf.image(BytesIO(charts['odp_img_co']), x=30, w=150)
     
     # Infraestrutura
     pdf.add_page()
     pdf.set_font("Times", "B", 14)
     pdf.cell(0, 8, "Infraestrutura e Instalações Físicas", ln=True)
-    pdf.image(st.session_state['infra_img_av'], x=30, w=150)
-    pdf.image(st.session_state['infra_img_co'], x=30, w=150)
+    pdf.image(BytesIO(charts['infra_img_av']), x=30, w=150)
+    pdf.image(BytesIO(charts['infra_img_co']), x=30, w=150)
 
     # OAF
     pdf.add_page()
     pdf.set_font("Times", "B", 14)
     pdf.cell(0, 8, "Oportunidades de Ampliação da Formação", ln=True)
-    pdf.image(st.session_state['oaf_img_av'], x=30, w=150)
-    pdf.image(st.session_state['oaf_img_co'], x=30, w=150)
+    pdf.image(BytesIO(charts['oaf_img_av']), x=30, w=150)
+    pdf.image(BytesIO(charts['oaf_img_co']), x=30, w=150)
 
-    # Salvar em arquivo temporário
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-        pdf_path = tmp_pdf.name
-        pdf.output(pdf_path)
-
-    # (Opcional) Combinar com capa e anexos
+    # Corpo gerado em memória e combinado com a capa e o anexo pré-carregados
+    progress(0.6, "Gerando o PDF")
+    with instrumentation.stage("pdf_output") as record:
+        content = bytes(pdf.output())
+        record["bytes"] = len(content)
+    body = PdfReader(BytesIO(content))
     try:
-        writer = PdfWriter()
-        # Adiciona a capa
-        with open("src/file/capa_relatorio.pdf", "rb") as f:
-            reader_capa = PdfReader(f)
-            writer.add_page(reader_capa.pages[0])
-        
-        # Adiciona o conteúdo gerado
-        with open(pdf_path, "rb") as f:
-            reader_content = PdfReader(f)
-            for page in reader_content.pages:
-                writer.add_page(page)
-
-        # Adiciona o anexo
-        with open("anexo_qe_2023.pdf", "rb") as f:
-            reader_anexo = PdfReader(f)
-            for page in reader_anexo.pages:
-                writer.add_page(page)
-
-        # Salva o PDF final
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as final_pdf_file:
-            final_path = final_pdf_file.name
-            writer.write(final_path)
-        return final_path
-        
+        with instrumentation.stage("load_templates", cached=True):
+            cover_pages, annex_pages = load_templates()
     except FileNotFoundError as e:
-        st.warning(f"Não foi possível adicionar capa/anexo: {e}. Gerando PDF simples.")
-        return pdf_path # Retorna o PDF sem capa e anexos se os arquivos não forem encontrados
\ No newline at end of file
+        if on_warning:
+            on_warning(f"Não foi possível adicionar capa/anexo: {e}. Gerando PDF simples.")
+        cover_pages, annex_pages = [], []  # Retorna o PDF sem capa e anexos
+
+    progress(0.8, "Adicionando capa e anexo")
+    writer = PdfWriter()
+    with _templates_lock, instrumentation.stage("pdf_merge") as record:
+        pages = cover_pages[:1] + list(body.pages) + annex_pages
+        for page in pages:
+            writer.add_page(page)
+        buffer = BytesIO()
+        writer.write(buffer)
+        record.update(rows=len(pages), bytes=buffer.tell())
+    progress(1.0, "Relatório concluído")
+    return buffer.getvalue()
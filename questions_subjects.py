@@ -0,0 +1,108 @@
+# questions_subjects.py
+
+import json
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import config
+
+# Cache em memória: nome do arquivo -> (DataFrame, instante da última validação)
+_frames = {}
+_lock = threading.Lock()
+
+def _local_paths(file_name: str) -> tuple:
+    """Retorna os caminhos (CSV, metadados) da cópia local de um arquivo de temas."""
+    base = Path(config.QUESTIONS_SUBJECTS_CACHE_DIR) / f"{file_name}_questions_subjects"
+    return base.with_suffix(".csv"), base.with_suffix(".json")
+
+def _parse(content: bytes) -> pd.DataFrame:
+    return pd.read_csv(BytesIO(content), sep=";")
+
+def _read_local(file_name: str) -> tuple:
+    """Lê a cópia local (conteúdo, metadados), ou (None, {}) se não existir."""
+    csv_path, meta_path = _local_paths(file_name)
+    if not csv_path.exists():
+        return None, {}
+    try:
+        metadata = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+    except ValueError:
+        metadata = {}
+    return csv_path.read_bytes(), metadata
+
+def _write_local(file_name: str, content: bytes, metadata: dict) -> None:
+    csv_path, meta_path = _local_paths(file_name)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    csv_path.write_bytes(content)
+    meta_path.write_text(json.dumps(metadata))
+
+def _fetch(file_name: str) -> pd.DataFrame:
+    """
+    Obtém o arquivo de temas: usa a cópia local dentro do TTL (ou sempre, no modo offline);
+    fora dele, revalida na origem com If-None-Match e baixa apenas se o ETag mudou.
+    """
+    content, metadata = _read_local(file_name)
+    now = time.time()
+    if content is not None and (config.OFFLINE_MODE or now - metadata.get("fetched_at", 0) < config.QUESTIONS_SUBJECTS_TTL):
+        return _parse(content)
+    if config.OFFLINE_MODE:
+        raise FileNotFoundError(f"Modo offline: cópia local de '{file_name}' não encontrada.")
+
+    url = config.QUESTIONS_SUBJECTS_BASE_URL + file_name + "_questions_subjects.csv"
+    headers = {"If-None-Match": metadata["etag"]} if content is not None and metadata.get("etag") else {}
+    try:
+        with urlopen(Request(url, headers=headers), timeout=30) as response:
+            content = response.read()
+            etag = response.headers.get("ETag")
+    except HTTPError as e:
+        if content is None:
+            raise
+        if e.code != 304:
+            return _parse(content)  # Erro na origem: usa a cópia local, mesmo vencida
+        etag = metadata.get("etag")  # Não modificado: mantém a cópia local
+    except OSError:
+        if content is None:
+            raise
+        return _parse(content)  # Origem indisponível: usa a cópia local, mesmo vencida
+    _write_local(file_name, content, {"etag": etag, "fetched_at": now})
+    return _parse(content)
+
+def get_questions_subjects(file_name: str) -> pd.DataFrame:
+    """Retorna o DataFrame de questões × temas de um curso (ex.: 'ENG_CIV'), servido da memória."""
+    with _lock:
+        cached = _frames.get(file_name)
+    if cached and (config.OFFLINE_MODE or time.time() - cached[1] < config.QUESTIONS_SUBJECTS_TTL):
+        return cached[0]
+    df = _fetch(file_name)
+    with _lock:
+        _frames[file_name] = (df, time.time())
+    return df
+
+def prefetch_questions_subjects(file_names) -> dict:
+    """
+    Carrega concorrentemente os arquivos de temas informados que ainda não estão na memória
+    (ou cuja cópia venceu): nas execuções seguintes não há nada a submeter. Retorna os erros por
+    arquivo (vazio se tudo foi carregado); falhas não interrompem os demais downloads e são
+    tentadas de novo na chamada seguinte.
+    """
+    now = time.time()
+    with _lock:
+        file_names = sorted(
+            name for name in set(file_names)
+            if name not in _frames or not (config.OFFLINE_MODE or now - _frames[name][1] < config.QUESTIONS_SUBJECTS_TTL)
+        )
+    errors = {}
+    if not file_names:
+        return errors
+    with ThreadPoolExecutor(max_workers=config.QUESTIONS_SUBJECTS_WORKERS) as executor:
+        futures = {name: executor.submit(get_questions_subjects, name) for name in file_names}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except (OSError, ValueError) as e:
+                errors[name] = e
+    return errors
@@ -0,0 +1,99 @@
+# render.py
+
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import config
+import instrumentation
+from chart_cache import chart_cache
+
+# Gráfico a renderizar: chave no cache de gráficos (ou None), função de renderização (nível de
+# módulo, serializável) e função que prepara, no processo principal, os argumentos da renderização
+# (retorna None se não houver dados para o gráfico)
+ChartJob = namedtuple("ChartJob", ["key", "render", "prepare"])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _init_worker():
+    """Inicializa cada processo do pool com o backend não interativo do matplotlib."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+def get_executor() -> ProcessPoolExecutor | None:
+    """Retorna o pool de processos compartilhado (criado sob demanda), ou None se desativado."""
+    global _executor
+    with _executor_lock:
+        if _executor is None and config.RENDER_WORKERS > 0:
+            _executor = ProcessPoolExecutor(
+                max_workers=config.RENDER_WORKERS,
+                mp_context=multiprocessing.get_context(config.RENDER_START_METHOD),
+                initializer=_init_worker
+            )
+        return _executor
+
+def _reset_executor() -> None:
+    """Descarta um pool quebrado (ex.: processo encerrado); o próximo uso cria outro."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _run_inline(fn, *args, **kwargs) -> Future:
+    future = Future()
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def submit(fn, *args, **kwargs) -> Future:
+    """
+    Executa uma tarefa CPU-bound (função de nível de módulo com argumentos serializáveis) no
+    pool de processos. Sem pool disponível, executa no próprio processo.
+    """
+    executor = get_executor()
+    if executor is None:
+        return _run_inline(fn, *args, **kwargs)
+    try:
+        return executor.submit(fn, *args, **kwargs)
+    except (BrokenProcessPool, RuntimeError):
+        _reset_executor()
+        return _run_inline(fn, *args, **kwargs)
+
+def result(future: Future, fn, *args, **kwargs):
+    """Aguarda o resultado de `submit`, refazendo a tarefa localmente se o pool tiver quebrado."""
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _reset_executor()
+        return fn(*args, **kwargs)
+
+def render_charts(jobs: dict) -> dict:
+    """
+    Renderiza concorrentemente os gráficos independentes de `jobs` (nome -> ChartJob ou None)
+    e retorna nome -> PNG (ou None). Gráficos já presentes no cache não são redesenhados.
+    """
+    results, pending = {}, {}
+    with instrumentation.stage("render_charts", rows=len(jobs), cached=True) as record:
+        for name, job in jobs.items():
+            png = chart_cache.get(job.key) if job and job.key else None
+            args = None
+            if job and png is None:
+                with instrumentation.stage("prepare_chart", chart=name):
+                    args = job.prepare()
+            results[name] = png
+            if args is not None:
+                pending[name] = (job, args, submit(job.render, *args))
+
+        # Acerto apenas se nenhum gráfico precisou ser renderizado
+        record.update(rendered=len(pending), cache="miss" if pending else "hit")
+        for name, (job, args, future) in pending.items():
+            png = result(future, job.render, *args)
+            if job.key:
+                chart_cache.put(job.key, png)
+            results[name] = png
+    return results
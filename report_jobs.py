@@ -0,0 +1,110 @@
+# report_jobs.py
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+from chart_cache import ChartCache, make_chart_key
+from pdf_generator import build_report_pdf
+
+class ReportJob:
+    """Estado de uma montagem de relatório: 'queued', 'running', 'done' ou 'error', com o andamento (0 a 1)."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.status = "queued"
+        self.progress = 0.0
+        self.step = "Aguardando na fila"
+        self.error = None
+        self.warnings = []
+
+    def update(self, fraction: float, step: str) -> None:
+        self.progress, self.step = fraction, step
+
+class ReportJobs:
+    """
+    Fila de geração de relatórios em segundo plano. Cada relatório é identificado por
+    (curso, município, gráficos, versão dos dados); pedidos repetidos reaproveitam a tarefa em andamento
+    ou o PDF pronto, guardado em um cache LRU limitado e compartilhado entre as sessões.
+    """
+
+    def __init__(self, max_workers: int, max_cache_bytes: int, max_jobs: int = config.REPORT_JOBS_MAX_ENTRIES):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        # O cache de gráficos é genérico (bytes com despejo LRU): reaproveitado, apenas em memória
+        self.results = ChartCache(max_cache_bytes)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @staticmethod
+    def make_key(curso_nome: str, municipio_nome: str, charts: dict, data_version: str | None) -> str:
+        """
+        Chave do relatório: o título (curso e município) e o conteúdo de cada gráfico embutido no
+        PDF. Os gráficos do CE e do QE vêm de seleções independentes; um relatório só é
+        reaproveitado por quem pediu exatamente os mesmos gráficos.
+        """
+        digests = tuple((name, hashlib.sha256(png).hexdigest()) for name, png in sorted(charts.items()))
+        return make_chart_key("report", curso_nome, municipio_nome, digests, data_version)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="report")
+        return self._executor
+
+    def _run(self, job: ReportJob, charts: dict, curso_nome: str, municipio_nome: str) -> None:
+        job.status = "running"
+        try:
+            pdf_bytes = build_report_pdf(
+                charts, curso_nome, municipio_nome,
+                on_warning=job.warnings.append, on_progress=job.update
+            )
+        except Exception as e:
+            job.error = str(e)
+            job.status = "error"
+            return
+        if len(pdf_bytes) > self.results.max_bytes:
+            # O PDF não caberia no cache de relatórios e não poderia ser baixado
+            job.error = (f"o relatório tem {len(pdf_bytes) / 1e6:.1f} MB, acima do limite de "
+                         f"{self.results.max_bytes / 1e6:.1f} MB do cache de relatórios")
+            job.status = "error"
+            return
+        self.results.put(job.key, pdf_bytes)
+        job.status = "done"
+
+    def _prune(self) -> None:
+        """
+        Descarta (chamado com o lock, antes de enfileirar uma tarefa) as tarefas concluídas cujo PDF já
+        saiu do cache e as encerradas mais antigas além de `max_jobs`. Tarefas na fila ou em andamento são mantidas.
+        """
+        for key, job in list(self._jobs.items()):
+            if job.status == "done" and key not in self.results:
+                del self._jobs[key]
+        finished = [key for key, job in self._jobs.items() if job.status in ("done", "error")]
+        for key in finished[:max(0, len(self._jobs) + 1 - self.max_jobs)]:
+            del self._jobs[key]
+
+    def submit(self, key: str, charts: dict, curso_nome: str, municipio_nome: str) -> ReportJob | None:
+        """Enfileira a montagem do relatório, se ainda não estiver pronto nem em andamento. Retorna a tarefa (None se já pronto)."""
+        with self._lock:
+            if self.results.get(key) is not None:
+                return None
+            job = self._jobs.get(key)
+            if job is not None and job.status in ("queued", "running"):
+                return job
+            self._jobs.pop(key, None)  # A nova tarefa entra como a mais recente
+            self._prune()
+            job = self._jobs[key] = ReportJob(key)
+            self._get_executor().submit(self._run, job, dict(charts), curso_nome, municipio_nome)
+            return job
+
+    def get_job(self, key: str) -> ReportJob | None:
+        """Última tarefa enfileirada para o relatório, ou None."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def get_result(self, key: str) -> bytes | None:
+        """PDF pronto do relatório, ou None."""
+        return self.results.get(key)
+
+report_jobs = ReportJobs(config.REPORT_WORKERS, config.REPORT_CACHE_MAX_BYTES)
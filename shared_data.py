@@ -0,0 +1,99 @@
+# shared_data.py
+
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pathlib import Path
+import config
+
+# Chave dos metadados da aplicação no esquema Arrow
+METADATA_KEY = b"enade"
+
+def _path(name: str, version: str, suffix: str) -> Path:
+    return Path(config.SHARED_DATA_DIR) / f"{name}-{version}{suffix}"
+
+def _replace(tmp_path: Path, path: Path) -> None:
+    """Publica o arquivo atomicamente e remove as versões anteriores do mesmo conjunto."""
+    os.replace(tmp_path, path)
+    name = path.name.rsplit("-", 1)[0]
+    for old in path.parent.glob(f"{name}-*{path.suffix}"):
+        if old != path and old.name.rsplit("-", 1)[0] == name:
+            # Processos que ainda mapeiam a versão antiga mantêm acesso ao conteúdo
+            old.unlink(missing_ok=True)
+
+def publish_frame(name: str, version: str, df: pd.DataFrame, metadata: dict | None = None) -> None:
+    """Grava o DataFrame em Arrow IPC sem compressão (mapeável em memória), com metadados opcionais."""
+    path = _path(name, version, ".arrow")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}), METADATA_KEY: json.dumps(metadata or {}).encode()
+    })
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        _replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def map_frame(name: str, version: str) -> tuple | None:
+    """
+    Abre o DataFrame publicado como mapeamento em memória somente leitura: as colunas numéricas
+    apontam para as páginas do arquivo, compartilhadas pelo sistema operacional entre processos.
+    Retorna (DataFrame, metadados), ou None se não houver arquivo publicado.
+    """
+    path = _path(name, version, ".arrow")
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (OSError, ValueError):
+        return None
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    # Um bloco por coluna: evita a consolidação, que copiaria os dados para a memória do processo
+    return table.to_pandas(split_blocks=True), metadata
+
+def publish_arrays(name: str, version: str, **arrays: np.ndarray) -> None:
+    """Grava os arrays em .npy (um arquivo por array), mapeáveis em memória."""
+    for key, array in arrays.items():
+        path = _path(f"{name}.{key}", version, ".npy")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            _replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+def map_arrays(name: str, version: str, keys) -> dict | None:
+    """Abre os arrays publicados como mapeamentos somente leitura, ou None se algum estiver ausente."""
+    try:
+        return {key: np.load(_path(f"{name}.{key}", version, ".npy"), mmap_mode="r") for key in keys}
+    except (OSError, ValueError):
+        return None
+
+def share_frame(name: str, version: str, df: pd.DataFrame, metadata: dict | None = None) -> pd.DataFrame:
+    """
+    Publica o DataFrame recém-construído e o devolve reaberto como mapeamento compartilhado.
+    Com SHARED_DATASETS desativado ou se a gravação falhar, devolve o próprio DataFrame.
+    """
+    if not config.SHARED_DATASETS:
+        return df
+    try:
+        publish_frame(name, version, df, metadata)
+    except OSError:
+        return df  # A publicação é uma otimização: segue com a cópia em memória
+    mapped = map_frame(name, version)
+    return df if mapped is None else mapped[0]
+
+def share_arrays(name: str, version: str, **arrays: np.ndarray) -> dict | None:
+    """Publica os arrays e os devolve reabertos como mapeamentos compartilhados (None se não for possível)."""
+    if not config.SHARED_DATASETS:
+        return None
+    try:
+        publish_arrays(name, version, **arrays)
+    except OSError:
+        return None
+    return map_arrays(name, version, arrays)
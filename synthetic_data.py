@@ -0,0 +1,170 @@
+# synthetic_data.py
+
+import zipfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+import config
+from data_loader import QUESTIONS_SUBJECTS_FILE_NAMES
+
+# Itens objetivos do Componente Específico e temas por arquivo de temas
+CE_ITEMS = 27
+SUBJECTS_PER_FILE = 10
+PARTICIPANTS_PER_COURSE = 45  # média de participantes por curso, próxima à do ENADE 2023
+N_IES = 2000
+
+# Colunas do arquivo 3 (Componente Específico), com as não usadas pela aplicação para manter a largura real
+ARQ3_COLUMNS = [
+    "NU_ANO", "CO_CURSO", "NU_ITEM_OFG", "NU_ITEM_OFG_Z", "NU_ITEM_OFG_X", "NU_ITEM_OFG_N",
+    "NU_ITEM_OCE", "NU_ITEM_OCE_Z", "NU_ITEM_OCE_X", "NU_ITEM_OCE_N", "DS_VT_GAB_OFG_FIN",
+    "DS_VT_GAB_OCE_FIN", "DS_VT_ESC_OFG", "DS_VT_ACE_OFG", "DS_VT_ESC_OCE", "DS_VT_ACE_OCE",
+    "TP_PRES", "TP_PR_GER", "TP_PR_OB_FG", "TP_PR_DI_FG", "TP_PR_OB_CE", "TP_PR_DI_CE",
+    "NT_GER", "NT_FG", "NT_OBJ_FG", "NT_DIS_FG", "NT_CE", "NT_OBJ_CE", "NT_DIS_CE",
+]
+
+def source_file_names() -> dict:
+    """Atributo de URL em `config` -> nome do arquivo gerado."""
+    return {
+        "ENADE_2023_CE_URL": "microdados2023_arq3.zip",
+        "ENADE_2023_QE_URL": "microdados2023_arq4.zip",
+        "BASE_DB_URL": "base_db.csv",
+        "CPC_2023_URL": "CPC_2023.csv",
+        "HEI_CODES_URL": "hei.csv",
+    }
+
+def _answer_strings(marks: np.ndarray, alphabet: bytes) -> np.ndarray:
+    """Converte uma matriz de índices (participantes × itens) em strings de largura fixa com o alfabeto."""
+    chars = np.frombuffer(alphabet, dtype=np.uint8)[marks]
+    return np.ascontiguousarray(chars).view(f"S{marks.shape[1]}").ravel().astype(f"U{marks.shape[1]}")
+
+def build_courses(rng, participants: int, ies_code: int = config.UFPA_CODE) -> pd.DataFrame:
+    """
+    Cadastro de cursos (formato de base_db.csv): um grupo por arquivo de temas, os cursos da IES
+    na ordem de QUESTIONS_SUBJECTS_FILE_NAMES e os demais distribuídos entre as outras IES.
+    """
+    file_names = list(dict.fromkeys(QUESTIONS_SUBJECTS_FILE_NAMES))
+    group_codes = {name: 100 + i for i, name in enumerate(file_names)}
+    n_courses = max(participants // PARTICIPANTS_PER_COURSE, 4 * len(QUESTIONS_SUBJECTS_FILE_NAMES))
+
+    ies_groups = [group_codes[name] for name in QUESTIONS_SUBJECTS_FILE_NAMES]
+    other_groups = rng.choice(list(group_codes.values()), n_courses - len(ies_groups))
+    other_ies = rng.integers(1, N_IES, len(other_groups))
+    other_ies[other_ies == ies_code] += 1
+    municipalities = np.array(["Belém", "Castanhal", "Tucuruí", "Altamira"])
+    courses = pd.DataFrame({
+        "CO_CURSO": np.arange(1, n_courses + 1) + 1000,
+        "CO_IES": np.concatenate([np.full(len(ies_groups), ies_code), other_ies]),
+        "CO_GRUPO": np.concatenate([ies_groups, other_groups]),
+        "NOME_MUNIC_CURSO": np.concatenate([
+            municipalities[np.arange(len(ies_groups)) % len(municipalities)],
+            np.char.add("Município ", rng.integers(1, 500, len(other_groups)).astype(str)),
+        ]),
+    })
+    names = {code: name for name, code in group_codes.items()}
+    courses.insert(3, "NOME_CURSO", courses["CO_GRUPO"].map(names))
+    return courses
+
+def build_ce_microdata(rng, courses: pd.DataFrame, participants: int) -> pd.DataFrame:
+    """Arquivo 3 (uma linha por participante): gabaritos DS_VT_ACE_OCE de 0/1, escolhas, presença e notas."""
+    # Tamanho dos cursos com cauda longa; os cursos da IES aparecem primeiro, na ordem do cadastro
+    weights = rng.lognormal(0, 1, len(courses))
+    course_index = np.concatenate([
+        np.arange(len(courses)), rng.choice(len(courses), max(participants - len(courses), 0), p=weights / weights.sum())
+    ])[:participants]
+    n = len(course_index)
+
+    present = rng.random(n) < 0.92
+    answered = present & (rng.random(n) < 0.97)
+    # Dificuldade por grupo e item, habilidade por participante
+    group_codes, group_index = np.unique(courses["CO_GRUPO"].to_numpy()[course_index], return_inverse=True)
+    difficulty = rng.uniform(0.2, 0.8, (len(group_codes), CE_ITEMS))
+    ability = rng.normal(0, 0.12, n)[:, None]
+    hits = (rng.random((n, CE_ITEMS)) < np.clip(difficulty[group_index] + ability, 0.02, 0.98)).astype(np.uint8)
+
+    ace_oce = pd.Series(_answer_strings(hits, b"01")).where(answered)
+    esc_oce = pd.Series(_answer_strings(rng.integers(0, 6, (n, CE_ITEMS)), b"ABCDE.")).where(answered)
+    ace_ofg = pd.Series(_answer_strings(rng.integers(0, 2, (n, 8)), b"01")).where(present)
+    esc_ofg = pd.Series(_answer_strings(rng.integers(0, 5, (n, 8)), b"ABCDE")).where(present)
+    scores = np.where(present[:, None], rng.uniform(0, 100, (n, 8)).round(1), np.nan)
+
+    data = {
+        "NU_ANO": 2023, "CO_CURSO": courses["CO_CURSO"].to_numpy()[course_index],
+        "NU_ITEM_OFG": 8, "NU_ITEM_OFG_Z": 0, "NU_ITEM_OFG_X": 0, "NU_ITEM_OFG_N": 0,
+        "NU_ITEM_OCE": CE_ITEMS, "NU_ITEM_OCE_Z": 0, "NU_ITEM_OCE_X": 0, "NU_ITEM_OCE_N": 0,
+        "DS_VT_GAB_OFG_FIN": "ABCDEABC", "DS_VT_GAB_OCE_FIN": "ABCDE" * 5 + "AB",
+        "DS_VT_ESC_OFG": esc_ofg, "DS_VT_ACE_OFG": ace_ofg, "DS_VT_ESC_OCE": esc_oce, "DS_VT_ACE_OCE": ace_oce,
+        "TP_PRES": np.where(present, config.PRESENT_STUDENT_CODE, 222),
+        "TP_PR_GER": np.where(answered, config.PRESENT_STUDENT_CODE, 222),
+        "TP_PR_OB_FG": 555, "TP_PR_DI_FG": 555, "TP_PR_OB_CE": 555, "TP_PR_DI_CE": 555,
+    }
+    for i, col in enumerate(["NT_GER", "NT_FG", "NT_OBJ_FG", "NT_DIS_FG", "NT_CE", "NT_OBJ_CE", "NT_DIS_CE"]):
+        data[col] = scores[:, i]
+    return pd.DataFrame(data, columns=ARQ3_COLUMNS)
+
+def build_qe_microdata(rng, courses: pd.DataFrame, participants: int) -> pd.DataFrame:
+    """Arquivo 4 (Questionário do Estudante): perfil em letras (QE_I01 a QE_I26) e escala de 1 a 8 (QE_I27 a QE_I68)."""
+    course_codes = rng.choice(courses["CO_CURSO"].to_numpy(), participants)
+    data = {"NU_ANO": 2023, "CO_CURSO": course_codes}
+    profile = _answer_strings(rng.integers(0, 6, (participants, 26)), b"ABCDEF")
+    profile = profile.view("U1").reshape(participants, 26)
+    for i in range(26):
+        data[f"QE_I{i + 1:02d}"] = profile[:, i]
+    # Concordância concentrada nas notas altas, com 7/8 e respostas em branco ocasionais
+    scale = rng.choice(np.arange(1, 9), (participants, 42), p=[.04, .05, .09, .16, .25, .33, .05, .03]).astype(float)
+    scale[rng.random(scale.shape) < 0.03] = np.nan
+    for i in range(42):
+        data[f"QE_I{i + 27}"] = scale[:, i]
+    return pd.DataFrame(data)
+
+def build_questions_subjects(rng) -> pd.DataFrame:
+    """Arquivo de temas: até três temas por item e a validade do item."""
+    subjects = np.array([f"Tema {i + 1:02d}" for i in range(SUBJECTS_PER_FILE)])
+    first = rng.choice(subjects, CE_ITEMS)
+    second = pd.Series(rng.choice(subjects, CE_ITEMS)).where(rng.random(CE_ITEMS) < 0.5)
+    third = pd.Series(rng.choice(subjects, CE_ITEMS)).where(rng.random(CE_ITEMS) < 0.2)
+    second = second.mask(second == first)
+    third = third.mask((third == first) | (third == second) | second.isna())
+    return pd.DataFrame({
+        "FIRST_SUBJECT": first, "SECOND_SUBJECT": second, "THIRD_SUBJECT": third,
+        "VALIDITY": rng.random(CE_ITEMS) > 0.05,
+    })
+
+def _write_zip(df: pd.DataFrame, path: Path, txt_name: str) -> None:
+    """Grava o TXT (';' e vírgula decimal, como os microdados do INEP) dentro de um ZIP."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        with archive.open(txt_name, "w", force_zip64=True) as member:
+            df.to_csv(member, sep=";", decimal=",", index=False, encoding="latin-1")
+
+def generate_sources(output_dir, participants: int, seed: int = 0) -> dict:
+    """
+    Gera em `output_dir` todas as origens no formato do INEP para `participants` participantes
+    (microdados dos arquivos 3 e 4 em ZIP, base_db, CPC, hei e arquivos de temas). Conjuntos já
+    gerados com os mesmos parâmetros são reaproveitados. Retorna atributo de `config` -> URL.
+    """
+    output_dir = Path(output_dir)
+    urls = {attr: output_dir.resolve().as_uri() + "/" + name for attr, name in source_file_names().items()}
+    urls["QUESTIONS_SUBJECTS_BASE_URL"] = output_dir.resolve().as_uri() + "/"
+    done_marker = output_dir / ".complete"
+    if done_marker.exists():
+        return urls
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    courses = build_courses(rng, participants)
+    courses.to_csv(output_dir / "base_db.csv", sep=";", index=False)
+    pd.DataFrame({
+        "CO_CURSO": courses["CO_CURSO"],
+        "CO_CATEGAD": rng.choice([config.PUBLIC_ADMIN_CATEGORY, 2, 4, 5], len(courses), p=[.35, .15, .3, .2]),
+        "CO_ORGACAD": rng.choice([config.FEDERAL_ORG_CATEGORY, 10019, 10020, 10022], len(courses), p=[.4, .2, .2, .2]),
+    }).to_csv(output_dir / "CPC_2023.csv", sep=";", index=False)
+    hei_codes = np.union1d(courses["CO_IES"].unique(), np.arange(1, N_IES))
+    pd.DataFrame({0: hei_codes, 1: [f"Instituição {code}" for code in hei_codes]}).to_csv(
+        output_dir / "hei.csv", header=False, index=False
+    )
+    for file_name in dict.fromkeys(QUESTIONS_SUBJECTS_FILE_NAMES):
+        build_questions_subjects(rng).to_csv(output_dir / f"{file_name}_questions_subjects.csv", sep=";", index=False)
+
+    _write_zip(build_ce_microdata(rng, courses, participants), output_dir / "microdados2023_arq3.zip", "microdados2023_arq3.txt")
+    _write_zip(build_qe_microdata(rng, courses, participants), output_dir / "microdados2023_arq4.zip", "microdados2023_arq4.txt")
+    done_marker.touch()
+    return urls
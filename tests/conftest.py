@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# Os módulos do app ficam na raiz do repositório (python -m pytest a partir dela)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,110 @@
+# tests/test_downloads.py
+
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import config
+import downloads
+
+CONTENT = bytes(range(256)) * 400  # 100 KB
+
+class Origin(BaseHTTPRequestHandler):
+    """Origem local com ETag, If-None-Match e Range/If-Range; `truncate` corta o corpo enviado."""
+
+    content = CONTENT
+    truncate = None
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        etag = '"%s"' % hashlib.md5(self.content).hexdigest()
+        self.requests.append({name: self.headers.get(name) for name in ("Range", "If-Range", "If-None-Match")})
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start, range_header = 0, self.headers.get("Range")
+        # Range só é atendido se o validador de If-Range ainda corresponder à versão da origem
+        if range_header and self.headers.get("If-Range") in (None, etag):
+            start = int(range_header.split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(self.content) - 1}/{len(self.content)}")
+        else:
+            self.send_response(200)
+        body = self.content[start:]
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:self.truncate] if self.truncate else body)
+
+@pytest.fixture
+def origin(monkeypatch, tmp_path):
+    """Servidor HTTP local; retorna (URL do arquivo, diretório das cópias locais)."""
+    monkeypatch.setattr(Origin, "content", CONTENT)
+    monkeypatch.setattr(Origin, "truncate", None)
+    monkeypatch.setattr(Origin, "requests", [])
+    monkeypatch.setattr(config, "DOWNLOAD_RETRIES", 0)
+    monkeypatch.setattr(config, "DOWNLOAD_RETRY_DELAY", 0)
+    monkeypatch.setattr(config, "DOWNLOAD_BLOCK_SIZE", 1 << 12)
+    monkeypatch.setattr(config, "OFFLINE_MODE", False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/microdados.zip", tmp_path
+    server.shutdown()
+    server.server_close()
+
+def write_partial(url: str, dest_dir, content: bytes, etag: str) -> None:
+    """Simula um download interrompido: o parcial e seus metadados com o validador da origem."""
+    _, part_path, _, part_meta_path = downloads.local_paths(url, dest_dir)
+    part_path.write_bytes(content)
+    part_meta_path.write_text(json.dumps({"url": url, "etag": etag, "last_modified": None, "total": len(CONTENT)}))
+
+def test_resumes_partial_download_with_range(origin):
+    url, dest_dir = origin
+    etag = '"%s"' % hashlib.md5(CONTENT).hexdigest()
+    write_partial(url, dest_dir, CONTENT[:30000], etag)
+
+    path, info = downloads.fetch(url, dest_dir)
+
+    assert Origin.requests == [{"Range": "bytes=30000-", "If-Range": etag, "If-None-Match": None}]
+    assert info["status"] == "resumed" and info["bytes"] == len(CONTENT) - 30000
+    assert path.read_bytes() == CONTENT
+    assert info["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    assert not downloads.local_paths(url, dest_dir)[1].exists()
+
+def test_restarts_when_validator_no_longer_matches(origin):
+    url, dest_dir = origin
+    write_partial(url, dest_dir, b"x" * 30000, '"versao-anterior"')
+
+    path, info = downloads.fetch(url, dest_dir)
+
+    # A origem responde 200 com o arquivo inteiro: o parcial da versão anterior é descartado
+    assert Origin.requests[0]["If-Range"] == '"versao-anterior"'
+    assert info["status"] == "downloaded" and info["bytes"] == len(CONTENT)
+    assert path.read_bytes() == CONTENT
+
+def test_rejects_checksum_mismatch(origin):
+    url, dest_dir = origin
+    with pytest.raises(downloads.ChecksumError):
+        downloads.fetch(url, dest_dir, expected_sha256="0" * 64)
+    path, part_path, _, _ = downloads.local_paths(url, dest_dir)
+    assert not path.exists() and not part_path.exists()
+
+    path, info = downloads.fetch(url, dest_dir, expected_sha256=hashlib.sha256(CONTENT).hexdigest())
+    assert info["status"] == "downloaded" and path.read_bytes() == CONTENT
+
+def test_rejects_truncated_transfer(origin, monkeypatch):
+    url, dest_dir = origin
+    monkeypatch.setattr(Origin, "truncate", 50000)
+    with pytest.raises(OSError):
+        downloads.fetch(url, dest_dir)
+    assert not downloads.local_paths(url, dest_dir)[0].exists()
+
+    # O parcial recebido é retomado na tentativa seguinte
+    monkeypatch.setattr(Origin, "truncate", None)
+    path, info = downloads.fetch(url, dest_dir)
+    assert info["status"] == "resumed" and path.read_bytes() == CONTENT
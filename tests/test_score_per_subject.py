@@ -0,0 +1,85 @@
+# tests/test_score_per_subject.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import get_score_per_subject, get_subjects_per_question, get_invalid_subjects
+from synthetic_data import build_ce_microdata, build_courses, build_questions_subjects
+from utils import answer_columns, decode_answer_keys
+
+def baseline_score_per_subject(questions_subjects_df: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Implementação original (iterrows sobre as questões, DS_VT_ACE_OCE como string), usada como referência."""
+    subjects = pd.unique(questions_subjects_df[["FIRST_SUBJECT", "SECOND_SUBJECT", "THIRD_SUBJECT"]].values.ravel('K'))
+    subjects = pd.Series(subjects).dropna().sort_values().unique()
+
+    subjects_score = pd.DataFrame({"Conteúdo": subjects, "Acertos": 0})
+    marked_keys = df["DS_VT_ACE_OCE"]
+
+    for index, row in questions_subjects_df.iterrows():
+        subjects_to_update = row[["FIRST_SUBJECT", "SECOND_SUBJECT", "THIRD_SUBJECT"]].dropna().values
+        if marked_keys.str.len().max() > index:
+            result = marked_keys[marked_keys.str[index] == '1'].shape[0]
+            subjects_score.loc[subjects_score["Conteúdo"].isin(subjects_to_update), "Acertos"] += result
+
+    total_participants = df.shape[0]
+    if total_participants > 0:
+        subjects_per_question = get_subjects_per_question(questions_subjects_df)
+        subject_score_column = (subjects_score["Acertos"] * 100) / (subjects_per_question * total_participants)
+        subjects_score["Nota (%)"] = subject_score_column.round(2)
+    else:
+        subjects_score["Nota (%)"] = 0
+
+    invalid_subjects = get_invalid_subjects(questions_subjects_df)
+    return subjects_score[~subjects_score["Conteúdo"].isin(invalid_subjects)]
+
+@pytest.fixture(scope="module")
+def fixture():
+    """Microdados sintéticos de um grupo, com gabaritos ausentes e de tamanhos diferentes, e o arquivo de temas."""
+    rng = np.random.default_rng(7)
+    courses = build_courses(rng, 3000)
+    ce = build_ce_microdata(rng, courses, 3000)
+    ce = ce[ce["CO_CURSO"].isin(courses.loc[courses["CO_GRUPO"] == courses["CO_GRUPO"].iloc[0], "CO_CURSO"])]
+    keys = ce["DS_VT_ACE_OCE"].copy()
+    ragged = keys.notna() & (np.arange(len(keys)) % 5 == 0)
+    keys[ragged] = keys[ragged].str[:20]  # Gabaritos mais curtos que a prova
+    ce = ce.assign(DS_VT_ACE_OCE=keys).reset_index(drop=True)
+    return ce, build_questions_subjects(rng)
+
+def with_decoded_answers(df: pd.DataFrame) -> pd.DataFrame:
+    """Acrescenta as colunas ACE_OCE_* decodificadas, como faz a carga dos dados."""
+    answers = decode_answer_keys(df["DS_VT_ACE_OCE"])
+    return pd.concat([df, pd.DataFrame(answers, index=df.index, columns=answer_columns(answers.shape[1]))], axis=1)
+
+def assert_same_scores(result: pd.DataFrame, expected: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+def test_group_scores_match_baseline(fixture):
+    ce, questions_subjects_df = fixture
+    expected = baseline_score_per_subject(questions_subjects_df, ce)
+    assert_same_scores(get_score_per_subject(questions_subjects_df, ce), expected)
+    assert_same_scores(get_score_per_subject(questions_subjects_df, with_decoded_answers(ce)), expected)
+
+def test_each_course_matches_baseline(fixture):
+    ce, questions_subjects_df = fixture
+    decoded = with_decoded_answers(ce)
+    for course_code in ce["CO_CURSO"].unique()[:20]:
+        course = ce["CO_CURSO"] == course_code
+        expected = baseline_score_per_subject(questions_subjects_df, ce[course])
+        assert_same_scores(get_score_per_subject(questions_subjects_df, decoded[course]), expected)
+
+def test_ragged_and_missing_answer_keys_match_baseline(fixture):
+    ce, questions_subjects_df = fixture
+    short = ce[ce["DS_VT_ACE_OCE"].str.len() < 27]
+    missing = ce[ce["DS_VT_ACE_OCE"].isna()]
+    assert len(short) and len(missing)
+    for df in (short, pd.concat([short, missing])):
+        expected = baseline_score_per_subject(questions_subjects_df, df)
+        assert_same_scores(get_score_per_subject(questions_subjects_df, df), expected)
+        assert_same_scores(get_score_per_subject(questions_subjects_df, with_decoded_answers(df)), expected)
+
+def test_empty_course_scores_zero(fixture):
+    ce, questions_subjects_df = fixture
+    empty = ce.iloc[:0]
+    result = get_score_per_subject(questions_subjects_df, with_decoded_answers(empty))
+    assert_same_scores(result, baseline_score_per_subject(questions_subjects_df, empty))
+    assert (result["Nota (%)"] == 0).all()
@@ -1,7 +1,12 @@
 import streamlit as st
 import base64
+import hmac
+import pandas as pd
 from pathlib import Path
 from streamlit_option_menu import option_menu
+import config
+import instrumentation
+from pdf_generator import REQUIRED_CHARTS
 
 def load_css(file_path="style/style.css"):
     """Carrega um arquivo CSS e o aplica ao app."""
@@ -27,8 +32,8 @@ def create_sidebar() -> str:
         st.markdown("### Menu")
         page = option_menu(
             menu_title=None,
-            options=["🏠 Página Inicial", "📊 Conhecimento Específico", "📝 Questionário do Estudante", "📥 Baixar Relatório"],
-            icons=["house-door-fill", "bar-chart-line-fill", "pencil-square", "download"],
+            options=["🏠 Página Inicial", "📊 Conhecimento Específico", "📝 Questionário do Estudante", "🏛️ Visão Institucional", "📥 Baixar Relatório"],
+            icons=["house-door-fill", "bar-chart-line-fill", "pencil-square", "grid-3x3-gap-fill", "download"],
             default_index=0,
             styles={
                 "container": {"padding": "0!important", "background-color": "transparent"},
@@ -39,6 +44,29 @@ def create_sidebar() -> str:
         )
     return page
 
+def _change_institution():
+    """Troca a instituição e descarta os gráficos do relatório gerados para a anterior."""
+    st.session_state["ies_code"] = st.session_state["ies_op"]
+    for key in REQUIRED_CHARTS:
+        st.session_state.pop(key, None)
+
+def select_institution(institutions: list, hei_dict: dict) -> int:
+    """
+    Seleção da instituição na barra lateral, entre as IES com cursos no cadastro. A escolha é
+    mantida entre as páginas (inclusive as que não exibem a seleção). Retorna o código da IES.
+    """
+    if st.session_state.get("ies_code") not in institutions:
+        default = config.DEFAULT_IES_CODE
+        st.session_state["ies_code"] = default if default in institutions or not institutions else institutions[0]
+    if not institutions:
+        return st.session_state["ies_code"]
+    st.session_state["ies_op"] = st.session_state["ies_code"]
+    st.sidebar.selectbox(
+        "Instituição", institutions, key="ies_op", on_change=_change_institution,
+        format_func=lambda code: f"{hei_dict.get(code, 'IES')} ({code})"
+    )
+    return st.session_state["ies_code"]
+
 def display_home_page():
     """Exibe o conteúdo da página inicial com a estrutura HTML correta e segura."""
     
@@ -90,4 +118,43 @@ def display_footer():
     <div class="footer">
         <p>© 2025 CPA - DIAVI/PROPLAN. Todos os direitos reservados.</p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+def _diagnostics_authorized() -> bool:
+    """O painel só é liberado com o token configurado (config.DIAGNOSTICS_TOKEN) informado na URL."""
+    token = config.DIAGNOSTICS_TOKEN
+    given = st.query_params.get(config.DIAGNOSTICS_QUERY_PARAM)
+    return bool(token) and given is not None and hmac.compare_digest(given.encode(), token.encode())
+
+def display_diagnostics_panel():
+    """
+    Painel de diagnóstico para operadores, oculto para os demais usuários: só aparece na barra
+    lateral com ?diagnostics=<token> na URL. Mostra, por etapa, tempo, CPU, memória, linhas e
+    acertos/falhas de cache, e exporta as etapas medidas em JSON lines. Somente leitura: a
+    instrumentação é ligada na configuração do processo (INSTRUMENTATION), não por uma sessão.
+    """
+    if not _diagnostics_authorized():
+        return
+    with st.sidebar.expander("🔧 Diagnóstico", expanded=True):
+        if instrumentation.is_enabled():
+            st.caption("Instrumentação ativa" + (", com medição de memória." if config.INSTRUMENTATION_MEMORY else "."))
+        else:
+            st.caption("Instrumentação desativada (config.INSTRUMENTATION).")
+        only_session = st.checkbox("Apenas esta sessão", value=True, key="diagnostics_only_session")
+
+        records = instrumentation.get_records()
+        if only_session:
+            session_id = instrumentation.current_session_id()
+            records = [record for record in records if record.get("session") == session_id]
+        if not records:
+            st.caption("Nenhuma etapa medida.")
+            return
+
+        st.dataframe(instrumentation.summarize(records), hide_index=True, use_container_width=True)
+        recent = pd.DataFrame(records[::-1][:50])
+        columns = [col for col in ("stage", "parent", "wall_ms", "cpu_ms", "peak_memory_mb", "rows", "cache", "error")
+                   if col in recent.columns]
+        st.dataframe(recent[columns], hide_index=True, use_container_width=True)
+
+        st.download_button("Exportar JSON lines", instrumentation.records_to_jsonl(records),
+                           file_name="etapas.jsonl", mime="application/jsonl")
@@ -1,11 +1,31 @@
 # utils.py
 
+import numpy as np
 import pandas as pd
+import config
 
-def atualiza_cursos(UFPA_data: pd.DataFrame, municipio: str) -> list:
+def atualiza_cursos(ies_courses: pd.DataFrame, municipio: str) -> list:
     """
     Filtra e retorna uma lista ordenada de nomes de cursos para um dado município.
     """
-    cursos = UFPA_data.query("NOME_MUNIC_CURSO == @municipio")['NOME_CURSO'].unique().tolist()
+    cursos = ies_courses.query("NOME_MUNIC_CURSO == @municipio")['NOME_CURSO'].unique().tolist()
     cursos.sort()
-    return cursos
\ No newline at end of file
+    return cursos
+
+def answer_columns(n_positions: int) -> list:
+    """Nomes das colunas uint8 que guardam o gabarito decodificado, uma por posição."""
+    return [f"{config.ANSWER_COLUMN_PREFIX}{i:02d}" for i in range(n_positions)]
+
+def decode_answer_keys(marked_keys: pd.Series) -> np.ndarray:
+    """
+    Decodifica as strings de acertos (ex.: DS_VT_ACE_OCE) em uma matriz uint8
+    participantes × posições, com 1 onde o caractere é '1' e 0 nos demais casos
+    (inclusive posições além do fim de strings mais curtas).
+    """
+    keys = marked_keys.fillna("").astype(str)
+    width = int(keys.str.len().max()) if len(keys) else 0
+    if width == 0:
+        return np.zeros((len(keys), 0), dtype=np.uint8)
+    buffer = "".join(keys.str.ljust(width).tolist()).encode("latin-1")
+    chars = np.frombuffer(buffer, dtype=np.uint8).reshape(len(keys), width)
+    return (chars == ord("1")).astype(np.uint8)